@@ -48,15 +48,18 @@ INSTALLED_APPS = [
     'rest_framework',
     'drf_spectacular',
     'djoser',
+    'rest_framework_simplejwt.token_blacklist',
     'users',
     'produtos',
     'pedidos',
-    'moeda'
+    'moeda',
+    'idempotencia',
 ]
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT com a empresa e a carteira do usuário carregadas no mesmo JOIN
+        'users.authentication.JWTAuthenticationComEmpresa',
         'rest_framework.authentication.SessionAuthentication',
     ),
 }
@@ -108,6 +111,22 @@ DATABASES = {
     }
 }
 
+# Cache: em memória por processo; com REDIS_URL (requer o pacote redis) fica
+# compartilhado entre os processos do servidor.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -153,4 +172,29 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1), 
     'ROTATE_REFRESH_TOKENS': True,               
     'BLACKLIST_AFTER_ROTATION': True,            
-}
\ No newline at end of file
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers_jwt.TokenRefreshRevogavelSerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'users.serializers_jwt.TokenBlacklistRevogavelSerializer',
+}
+
+# Quantos jtis revogados cada processo guarda em memória (ver users.tokens)
+JWT_REVOGADOS_EM_MEMORIA = 10000
+
+# Tentativas de login aceitas (quantidade, janela em segundos) por email e por IP
+# antes de responder 429 (ver users.throttling)
+LOGIN_TENTATIVAS_POR_EMAIL = (5, 300)
+LOGIN_TENTATIVAS_POR_IP = (30, 60)
+
+# Tempo que a resposta de um Idempotency-Key fica disponível para retries
+IDEMPOTENCIA_TTL = timedelta(hours=24)
+
+# Recepção assíncrona de pedidos: com True todo POST em /api/pedidos/ vai para a
+# fila; com False só os que enviam o header "Prefer: respond-async".
+PEDIDOS_INTAKE_ASSINCRONO = os.getenv('PEDIDOS_INTAKE_ASSINCRONO', '0') == '1'
+PEDIDOS_FILA_MAX_TENTATIVAS = 3
+
+# Tempo máximo (segundos) que um dashboard da empresa fica em cache; alterações
+# nos pedidos, produtos e carteira da empresa invalidam antes disso.
+DASHBOARD_CACHE_TTL = 300
+
+# Segundos que o payload do /api/auth/users/me/ fica no cache (ver users.perfil_cache)
+ME_CACHE_TTL = 3600
@@ -8,6 +8,7 @@ from users.views import MeView, MotivacionalView # Added MotivacionalView
 from produtos.routers import router as produtos_router
 from users.views import CustomTokenObtainPairView
 from pedidos.routes import router  as pedidos_router
+from rest_framework_simplejwt.views import TokenBlacklistView
 
 
 urlpatterns = [
@@ -17,6 +18,7 @@ urlpatterns = [
     path('api/schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
     path('api/auth/users/me/', MeView.as_view(), name='user-me'),
     path('api/auth/jwt/create/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/auth/jwt/blacklist/', TokenBlacklistView.as_view(), name='token_blacklist'), # logout: revoga o refresh
     path('api/motivacional/', MotivacionalView.as_view(), name='motivacional-phrases'), # Added MotivacionalView path
     # Auth via Djoser
     path('api/auth/', include('djoser.urls')),
@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import ChaveIdempotencia
+
+
+@admin.register(ChaveIdempotencia)
+class ChaveIdempotenciaAdmin(admin.ModelAdmin):
+    list_display = ('chave', 'escopo', 'usuario', 'status_code', 'criado_em', 'expira_em')
+    list_filter = ('escopo', 'status_code')
+    search_fields = ('chave', 'usuario__email')
+    readonly_fields = ('usuario', 'escopo', 'chave', 'impressao', 'status_code', 'resposta', 'criado_em', 'expira_em')
@@ -0,0 +1,83 @@
+import hashlib
+import json
+from functools import wraps
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import ChaveIdempotencia
+
+HEADER = 'Idempotency-Key'
+
+
+def _impressao(request):
+    corpo = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(corpo.encode()).hexdigest()
+
+
+def idempotente(escopo):
+    """
+    Decorator para handlers de POST (APIView/ViewSet) que aceita o header
+    Idempotency-Key. A primeira requisição com a chave executa o handler e grava
+    a resposta; os retries recebem a resposta gravada sem tocar no banco de novo.
+
+    A chave é reservada na mesma transação do handler: um retry concorrente fica
+    esperando a primeira requisição terminar e então recebe a resposta dela.
+    Respostas 5xx não são gravadas, para que o cliente possa tentar de novo.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            chave = request.headers.get(HEADER)
+            if not chave or not request.user.is_authenticated:
+                return handler(view, request, *args, **kwargs)
+
+            if len(chave) > 255:
+                return Response(
+                    {"detail": f"{HEADER} deve ter no máximo 255 caracteres."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            impressao = _impressao(request)
+            agora = timezone.now()
+            expira_em = agora + settings.IDEMPOTENCIA_TTL
+
+            with transaction.atomic():
+                registro, criado = ChaveIdempotencia.objects.select_for_update().get_or_create(
+                    usuario=request.user,
+                    escopo=escopo,
+                    chave=chave,
+                    defaults={'impressao': impressao, 'expira_em': expira_em},
+                )
+
+                if not criado and registro.expira_em > agora:
+                    if registro.impressao != impressao:
+                        return Response(
+                            {"detail": f"{HEADER} já utilizada com outro conteúdo."},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        )
+                    return Response(
+                        registro.resposta,
+                        status=registro.status_code,
+                        headers={'Idempotent-Replayed': 'true'},
+                    )
+
+                try:
+                    response = handler(view, request, *args, **kwargs)
+                except Exception as exc:
+                    response = view.handle_exception(exc)
+
+                if response.status_code >= 500:
+                    registro.delete()
+                    return response
+
+                registro.impressao = impressao
+                registro.status_code = response.status_code
+                registro.resposta = response.data
+                registro.expira_em = expira_em
+                registro.save(update_fields=['impressao', 'status_code', 'resposta', 'expira_em'])
+
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from idempotencia.models import ChaveIdempotencia
+
+
+class Command(BaseCommand):
+    help = "Remove em lotes as chaves de idempotência expiradas (rodar periodicamente, ex: cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=5000, help="Quantidade de linhas removidas por DELETE.")
+
+    def handle(self, *args, **options):
+        agora = timezone.now()
+        removidas = 0
+        while True:
+            ids = list(
+                ChaveIdempotencia.objects.filter(expira_em__lte=agora)
+                .values_list("pk", flat=True)[:options["lote"]]
+            )
+            if not ids:
+                break
+            removidas += ChaveIdempotencia.objects.filter(pk__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f"{removidas} chave(s) expirada(s) removida(s)."))
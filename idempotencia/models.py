@@ -0,0 +1,28 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from users.models import User
+
+
+class ChaveIdempotencia(models.Model):
+    """
+    Resposta já produzida para um Idempotency-Key. Um retry com a mesma chave
+    recebe a resposta gravada, sem executar a operação de novo.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    escopo = models.CharField(max_length=50)  # endpoint protegido, ex: "pedidos.create"
+    chave = models.CharField(max_length=255)
+    impressao = models.CharField(max_length=64)  # sha256 do corpo da requisição original
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    resposta = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    expira_em = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Chave de idempotência"
+        verbose_name_plural = "Chaves de idempotência"
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'escopo', 'chave'], name='idempotencia_chave_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.escopo} - {self.chave}"
@@ -0,0 +1,79 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from moeda.models import Transacao
+from pedidos.models import Pedido
+from produtos.models import Produto
+from users.models import Empresa
+from .models import ChaveIdempotencia
+
+User = get_user_model()
+
+
+class IdempotencyKeyTest(APITestCase):
+    def setUp(self):
+        self.dono = User.objects.create_user(email="empresa@teste.com", password="123", name="Empresa", usertype=2)
+        self.empresa = Empresa.objects.create(user=self.dono)
+        self.comprador = User.objects.create_user(email="comprador@teste.com", password="123", name="Comprador")
+        self.produto = Produto.objects.create(
+            empresa=self.empresa, nome="Bolo", descricao="Bolo de cenoura",
+            preco=Decimal("12.00"), quantidade=10, imagem="produtos/bolo.jpg",
+        )
+        self.dados_pedido = {"itens": [{"produto_id": self.produto.id, "quantidade": 3}]}
+
+    def test_retry_de_pedido_retorna_resposta_gravada(self):
+        self.client.force_authenticate(user=self.comprador)
+        url = reverse("pedidos-list")
+
+        primeira = self.client.post(url, self.dados_pedido, format="json", HTTP_IDEMPOTENCY_KEY="pedido-1")
+        with self.assertNumQueries(3):  # SAVEPOINT, SELECT FOR UPDATE da chave, RELEASE
+            retry = self.client.post(url, self.dados_pedido, format="json", HTTP_IDEMPOTENCY_KEY="pedido-1")
+
+        self.assertEqual(primeira.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.data["id"], primeira.data["id"])
+        self.assertEqual(Pedido.objects.count(), 1)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.quantidade, 7)
+
+    def test_mesma_chave_com_outro_conteudo(self):
+        self.client.force_authenticate(user=self.comprador)
+        url = reverse("pedidos-list")
+        self.client.post(url, self.dados_pedido, format="json", HTTP_IDEMPOTENCY_KEY="pedido-1")
+
+        outro = {"itens": [{"produto_id": self.produto.id, "quantidade": 1}]}
+        response = self.client.post(url, outro, format="json", HTTP_IDEMPOTENCY_KEY="pedido-1")
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Pedido.objects.count(), 1)
+
+    def test_chave_expirada_executa_de_novo(self):
+        self.client.force_authenticate(user=self.comprador)
+        url = reverse("pedidos-list")
+        self.client.post(url, self.dados_pedido, format="json", HTTP_IDEMPOTENCY_KEY="pedido-1")
+        ChaveIdempotencia.objects.update(expira_em=timezone.now() - timedelta(seconds=1))
+
+        response = self.client.post(url, self.dados_pedido, format="json", HTTP_IDEMPOTENCY_KEY="pedido-1")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Pedido.objects.count(), 2)
+        self.assertEqual(ChaveIdempotencia.objects.count(), 1)
+
+    def test_retry_de_transacao_na_carteira(self):
+        self.client.force_authenticate(user=User.objects.get(pk=self.dono.pk))
+        url = reverse("carteira-empresa")
+        data = {"valor": "50.00", "tipo_ativo": "BRL", "tipo_operacao": "DEPOSITO"}
+
+        primeira = self.client.post(url, data, format="json", HTTP_IDEMPOTENCY_KEY="deposito-1")
+        retry = self.client.post(url, data, format="json", HTTP_IDEMPOTENCY_KEY="deposito-1")
+
+        self.assertEqual(primeira.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, primeira.data)
+        self.assertEqual(Transacao.objects.count(), 1)
+        self.empresa.carteira.refresh_from_db()
+        self.assertEqual(self.empresa.carteira.saldo_dinheiro, Decimal("50.00"))
@@ -2,11 +2,13 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics, permissions
 from rest_framework.permissions import IsAuthenticated
-from .models import Carteira, Transacao
+from .models import Transacao
 from .serializers import CarteiraSerializer, TransacaoSerializer, TransacaoInputSerializer
 from drf_spectacular.utils import extend_schema
 from django.core.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
+from idempotencia.decorators import idempotente
+from users.authentication import empresa_do_usuario
 
 
 class IsOwnerOfCarteira(permissions.BasePermission):
@@ -15,13 +17,10 @@ class IsOwnerOfCarteira(permissions.BasePermission):
     Para os casos em que a carteira é implicitamente do usuário (GET/POST em /carteira/, GET em /carteira/transacoes/).
     """
     def has_permission(self, request, view):
-        try:
-            # Check if the user has an associated carteira.
-            # This covers all cases where the carteira is implicitly tied to the user.
-            _ = request.user.empresa.carteira 
-            return True 
-        except (AttributeError, Carteira.DoesNotExist):
-            return False
+        # A empresa e a carteira já vêm com o usuário autenticado por JWT (ver
+        # users.authentication); a view usa as mesmas instâncias, sem nova query.
+        empresa = empresa_do_usuario(request.user)
+        return empresa is not None and hasattr(empresa, 'carteira')
 
 
 class CarteiraEmpresaView(APIView):
@@ -60,6 +59,7 @@ class CarteiraEmpresaView(APIView):
             404: {"description": "Nenhuma empresa ou carteira associada a este usuário."}
         }
     )
+    @idempotente("carteira.post")
     def post(self, request, *args, **kwargs):
         user = request.user
         try:
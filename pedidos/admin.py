@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Pedido, ItemPedido
+from .models import Pedido, ItemPedido, FilaPedido, VendaDiaria
 from produtos.models import Produto
 from users.models import User
 
@@ -43,12 +43,6 @@ class PedidoAdmin(admin.ModelAdmin):
         })
     )
 
-    # Recalcula o total quando itens são salvos
-    def save_formset(self, request, form, formset, change):
-        instances = formset.save()
-        form.instance.atualizar_total()
-        return instances
-
     def save_model(self, request, obj, form, change):
         if not change:
             obj.created_by = request.user
@@ -80,3 +74,20 @@ class ItemPedidoAdmin(admin.ModelAdmin):
             obj.created_by = request.user
         obj.updated_by = request.user
         super().save_model(request, obj, form, change)
+
+
+
+@admin.register(FilaPedido)
+class FilaPedidoAdmin(admin.ModelAdmin):
+    list_display = ("id", "pedido", "status", "tentativas", "created_at", "processado_em")
+    list_filter = ("status",)
+    search_fields = ("pedido__id",)
+    readonly_fields = ("pedido", "itens", "tentativas", "erro", "created_at", "processado_em")
+
+
+@admin.register(VendaDiaria)
+class VendaDiariaAdmin(admin.ModelAdmin):
+    list_display = ("empresa", "dia", "total", "pedidos", "itens")
+    list_filter = ("dia",)
+    search_fields = ("empresa__user__name",)
+    readonly_fields = ("empresa", "dia", "total", "pedidos", "itens")
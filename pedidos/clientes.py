@@ -0,0 +1,68 @@
+"""
+Clientes recorrentes e coortes por empresa, calculados em lote.
+
+O comando calcular_clientes_empresas (agendado, ex.: toda noite) regrava duas
+tabelas pequenas a partir dos pedidos pago/concluido: ClienteEmpresa (um resumo
+por cliente e empresa) e RetencaoCoorte (a matriz de retenção). O endpoint de
+coortes só lê essas tabelas, sem juntar os pedidos de cada cliente a cada
+requisição. Tudo é agregado no banco com dois INSERT ... SELECT.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import ClienteEmpresa, Pedido, RetencaoCoorte, VendaDiaria
+
+
+def _sql_mes(coluna):
+    """Primeiro dia do mês local de um timestamptz (parâmetro: fuso)."""
+    return f"date_trunc('month', {coluna} AT TIME ZONE %s)::date"
+
+
+def calcular_clientes(empresa_ids=None):
+    """
+    Recalcula ClienteEmpresa e RetencaoCoorte de todas as empresas ou só de
+    `empresa_ids`, numa transação (quem lê vê os números antigos até o fim).
+    Retorna (clientes, linhas da matriz).
+    """
+    pedidos = connection.ops.quote_name(Pedido._meta.db_table)
+    clientes = connection.ops.quote_name(ClienteEmpresa._meta.db_table)
+    retencao = connection.ops.quote_name(RetencaoCoorte._meta.db_table)
+    fuso = VendaDiaria.fuso()
+
+    filtro, params_filtro = "p.status = ANY(%s)", [list(VendaDiaria.STATUS_VENDA)]
+    escopo, params_escopo = "", []
+    if empresa_ids is not None:
+        filtro += " AND p.empresa_id = ANY(%s)"
+        params_filtro.append(list(empresa_ids))
+        escopo, params_escopo = "WHERE empresa_id = ANY(%s)", [list(empresa_ids)]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {retencao} {escopo}", params_escopo)
+        cursor.execute(f"DELETE FROM {clientes} {escopo}", params_escopo)
+
+        cursor.execute(f"""
+            INSERT INTO {clientes}
+                (empresa_id, usuario_id, primeira_compra, ultima_compra, pedidos, valor_total, coorte)
+            SELECT p.empresa_id, p.usuario_id, MIN(p.created_at), MAX(p.created_at), COUNT(*),
+                   SUM(p.valor_total), {_sql_mes("MIN(p.created_at)")}
+            FROM {pedidos} p
+            WHERE {filtro}
+            GROUP BY p.empresa_id, p.usuario_id
+        """, [fuso] + params_filtro)
+        total_clientes = cursor.rowcount
+
+        # mês de cada pedido relativo à coorte do cliente: 0 = mês da primeira compra
+        cursor.execute(f"""
+            INSERT INTO {retencao} (empresa_id, coorte, mes, clientes, receita, calculado_em)
+            SELECT p.empresa_id, c.coorte, m.mes, COUNT(DISTINCT p.usuario_id), SUM(p.valor_total), %s
+            FROM {pedidos} p
+            JOIN {clientes} c ON c.empresa_id = p.empresa_id AND c.usuario_id = p.usuario_id
+            CROSS JOIN LATERAL (
+                SELECT (
+                    12 * (EXTRACT(YEAR FROM {_sql_mes("p.created_at")}) - EXTRACT(YEAR FROM c.coorte))
+                    + EXTRACT(MONTH FROM {_sql_mes("p.created_at")}) - EXTRACT(MONTH FROM c.coorte)
+                )::int AS mes
+            ) m
+            WHERE {filtro}
+            GROUP BY p.empresa_id, c.coorte, m.mes
+        """, [timezone.now(), fuso, fuso] + params_filtro)
+        return total_clientes, cursor.rowcount
@@ -0,0 +1,53 @@
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import Pedido
+
+COLUNAS = [
+    ("pedido_id", "id"),
+    ("criado_em", "created_at"),
+    ("status", "status"),
+    ("valor_total", "valor_total"),
+    ("comprador", "usuario__name"),
+    ("email_comprador", "usuario__email"),
+    ("descricao", "descricao"),
+    ("item_id", "itens__id"),
+    ("produto_id", "itens__produto_id"),
+    ("produto", "itens__produto__nome"),
+    ("quantidade", "itens__quantidade"),
+    ("preco_unitario", "itens__preco_unitario"),
+]
+
+
+def linhas_pedidos(empresa, chunk_size=2000):
+    """
+    Uma linha por item (pedidos sem itens aparecem uma vez, com os campos do
+    item vazios), lida com cursor no servidor: só `chunk_size` linhas ficam em
+    memória, qualquer que seja o tamanho do histórico.
+    """
+    return (
+        Pedido.objects.filter(empresa=empresa)
+        .order_by("id", "itens__id")
+        .values_list(*[campo for _, campo in COLUNAS])
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class _Eco:
+    """Arquivo falso: o csv.writer devolve a linha formatada em vez de gravar."""
+
+    def write(self, valor):
+        return valor
+
+
+def exportar_csv(linhas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([nome for nome, _ in COLUNAS])
+    for linha in linhas:
+        yield escritor.writerow(linha)
+
+
+def exportar_ndjson(linhas):
+    nomes = [nome for nome, _ in COLUNAS]
+    for linha in linhas:
+        yield json.dumps(dict(zip(nomes, linha)), cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from .janelas import inicio_do_dia
+from .models import Pedido
+
+
+def _data(valor, nome):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValidationError({nome: "Use o formato AAAA-MM-DD."})
+
+
+class PedidoFiltroBackend(BaseFilterBackend):
+    """
+    Filtros da listagem de pedidos:
+    ?status=pago,concluido  ?data_inicio=2025-01-01  ?data_fim=2025-01-31
+    ?cliente=<nome ou email>  ?valor_minimo=100
+
+    As datas viram um intervalo semiaberto em created_at (ver pedidos.janelas),
+    para que o índice (empresa, status, created_at) possa ser usado.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        if params.get("status"):
+            status = [s for s in params["status"].split(",") if s]
+            validos = dict(Pedido.STATUS_CHOICES)
+            invalidos = [s for s in status if s not in validos]
+            if invalidos:
+                raise ValidationError({"status": f"Status inválido: {', '.join(invalidos)}."})
+            queryset = queryset.filter(status__in=status)
+
+        if params.get("data_inicio"):
+            queryset = queryset.filter(created_at__gte=inicio_do_dia(_data(params["data_inicio"], "data_inicio")))
+
+        if params.get("data_fim"):
+            dia_seguinte = _data(params["data_fim"], "data_fim") + timedelta(days=1)
+            queryset = queryset.filter(created_at__lt=inicio_do_dia(dia_seguinte))
+
+        if params.get("cliente"):
+            cliente = params["cliente"].strip()
+            queryset = queryset.filter(Q(usuario__name__icontains=cliente) | Q(usuario__email__icontains=cliente))
+
+        if params.get("valor_minimo"):
+            try:
+                valor_minimo = Decimal(params["valor_minimo"])
+            except InvalidOperation:
+                raise ValidationError({"valor_minimo": "Informe um número."})
+            queryset = queryset.filter(valor_total__gte=valor_minimo)
+
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        def parametro(nome, descricao, tipo="string", formato=None):
+            schema = {"type": tipo}
+            if formato:
+                schema["format"] = formato
+            return {"name": nome, "required": False, "in": "query", "description": descricao, "schema": schema}
+
+        return [
+            parametro("status", "Um ou mais status separados por vírgula."),
+            parametro("data_inicio", "Pedidos criados a partir deste dia (inclusive).", formato="date"),
+            parametro("data_fim", "Pedidos criados até este dia (inclusive).", formato="date"),
+            parametro("cliente", "Parte do nome ou do e-mail do comprador."),
+            parametro("valor_minimo", "Valor total mínimo do pedido.", tipo="number"),
+        ]
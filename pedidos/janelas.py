@@ -0,0 +1,29 @@
+"""
+Janelas de vendas: períodos de calendário no fuso do projeto convertidos em
+intervalos semiabertos de created_at (>= meia-noite do primeiro dia e < meia-noite
+do dia seguinte ao último).
+
+Com USE_TZ, created_at__date e created_at__date__range convertem o fuso de cada
+linha antes de comparar, e nenhum índice em created_at pode ser usado. Os
+intervalos daqui comparam a coluna direto com dois instantes, o que vira range
+scan nos índices de Pedido (pedido_empresa_status_idx, pedido_vendas_idx).
+"""
+from datetime import datetime, time, timedelta
+from django.db.models import Q
+from django.utils import timezone
+
+
+def inicio_do_dia(dia):
+    """Meia-noite do dia no fuso do projeto, como datetime aware."""
+    return timezone.make_aware(datetime.combine(dia, time.min), timezone.get_default_timezone())
+
+
+def intervalo(inicio, fim):
+    """(início, fim) aware do período de `inicio` a `fim`, ambos inclusivos; o fim é exclusivo."""
+    return inicio_do_dia(inicio), inicio_do_dia(fim + timedelta(days=1))
+
+
+def no_periodo(inicio, fim, campo="created_at"):
+    """Q com `campo` dentro do período de calendário de `inicio` a `fim` (inclusivos)."""
+    de, ate = intervalo(inicio, fim)
+    return Q(**{f"{campo}__gte": de, f"{campo}__lt": ate})
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from pedidos.clientes import calcular_clientes
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula os clientes recorrentes (ClienteEmpresa) e a matriz de retenção por "
+        "coorte (RetencaoCoorte) a partir dos pedidos pago/concluido. Feito para rodar "
+        "periodicamente (cron); o endpoint de coortes mostra o último cálculo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--empresa", type=int, action="append", dest="empresas",
+            help="Calcula só esta empresa (pode repetir). Sem a opção, todas.",
+        )
+
+    def handle(self, *args, **options):
+        clientes, linhas = calcular_clientes(options["empresas"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{clientes} cliente(s) e {linhas} linha(s) da matriz de retenção gravados."
+        ))
@@ -0,0 +1,53 @@
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from pedidos.services import processar_lote_fila
+
+
+class Command(BaseCommand):
+    help = (
+        "Processa a fila de pedidos assíncronos com um pool local de workers. "
+        "Cada worker reivindica as entradas com SKIP LOCKED, uma transação por "
+        "entrada, então várias instâncias do comando podem rodar ao mesmo tempo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Threads processando a fila.")
+        parser.add_argument("--lote", type=int, default=20, help="Entradas processadas por rodada de cada worker.")
+        parser.add_argument(
+            "--continuo", action="store_true",
+            help="Fica rodando e consultando a fila; sem esta opção sai quando a fila esvazia.",
+        )
+        parser.add_argument("--intervalo", type=float, default=1.0, help="Segundos de espera com a fila vazia.")
+
+    def handle(self, *args, **options):
+        processados = [0]
+        trava = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    total = processar_lote_fila(lote=options["lote"])
+                    with trava:
+                        processados[0] += total
+                    if total:
+                        continue
+                    if not options["continuo"]:
+                        return
+                    time.sleep(options["intervalo"])
+            finally:
+                connection.close()
+
+        inicio = time.perf_counter()
+        workers = [threading.Thread(target=worker, daemon=True) for _ in range(options["workers"])]
+        for t in workers:
+            t.start()
+        try:
+            for t in workers:
+                t.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Interrompido; entradas em andamento serão desfeitas e voltam para a fila.")
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f"{processados[0]} pedido(s) processado(s) em {segundos:.2f}s."))
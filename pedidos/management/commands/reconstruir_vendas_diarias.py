@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from pedidos.models import VendaDiaria
+from pedidos.reconstrucao import reconstruir_em_paralelo
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula a tabela VendaDiaria (e as vendas por produto) a partir dos pedidos "
+        "pago/concluido. Use depois de cargas feitas direto no banco, para reparar "
+        "divergências ou quando a regra dos números mudar. Com --processos, reconstrói "
+        "empresa por empresa em paralelo e pode ser retomado com --execucao."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--empresa", type=int, action="append", dest="empresas",
+            help="Reconstrói só esta empresa (pode repetir). Sem a opção, todas.",
+        )
+        parser.add_argument(
+            "--processos", type=int, default=0,
+            help="Processos em paralelo, uma transação por empresa. Sem a opção, um único comando SQL.",
+        )
+        parser.add_argument("--lote", type=int, default=50, help="Empresas por tarefa de cada processo.")
+        parser.add_argument(
+            "--execucao",
+            help="Nome da execução com --processos; repita o mesmo nome para retomar uma execução interrompida.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["processos"]:
+            dias = VendaDiaria.reconstruir(options["empresas"])
+            self.stdout.write(self.style.SUCCESS(f"{dias} dia(s) de vendas gravados."))
+            return
+
+        execucao = options["execucao"] or timezone.now().strftime("reconstrucao-%Y%m%d-%H%M%S")
+        self.stdout.write(f"Execução {execucao} (use --execucao {execucao} para retomar).")
+        progresso = {"empresas": 0, "dias": 0, "segundos": 0}
+        for progresso in reconstruir_em_paralelo(
+            execucao, options["processos"], options["lote"], options["empresas"]
+        ):
+            self.stdout.write(
+                f"{progresso['empresas']}/{progresso['total']} empresa(s), {progresso['dias']} dia(s), "
+                f"{progresso['segundos']}s ({progresso['empresas_por_segundo']} empresas/s)"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{progresso['empresas']} empresa(s) reconstruídas, {progresso['dias']} dia(s) de vendas gravados "
+            f"em {progresso['segundos']}s."
+        ))
@@ -0,0 +1,58 @@
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from produtos.models import Produto
+from users.models import User, Empresa
+from pedidos.stress import disparar_pedidos_concorrentes
+
+
+class Command(BaseCommand):
+    help = (
+        "Dispara N pedidos concorrentes contra um único produto e verifica que o "
+        "estoque nunca fica negativo. Cria dados temporários e os remove ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pedidos", type=int, default=200, help="Total de pedidos disparados.")
+        parser.add_argument("--threads", type=int, default=16, help="Threads concorrentes.")
+        parser.add_argument("--estoque", type=int, default=50, help="Estoque inicial do produto.")
+
+    def handle(self, *args, **options):
+        sufixo = uuid.uuid4().hex[:8]
+        with transaction.atomic():
+            dono = User.objects.create_user(email=f"stress-{sufixo}@entrenos.local", name="Stress", usertype=2)
+            empresa = Empresa.objects.create(user=dono)
+            comprador = User.objects.create_user(email=f"stress-comprador-{sufixo}@entrenos.local", name="Comprador")
+            produto = Produto.objects.create(
+                empresa=empresa,
+                nome=f"Stress {sufixo}",
+                descricao="Produto temporário do teste de carga",
+                preco=1,
+                quantidade=options["estoque"],
+                imagem="produtos/stress.jpg",
+            )
+
+        try:
+            resultado = disparar_pedidos_concorrentes(
+                produto, comprador, options["pedidos"], threads=options["threads"]
+            )
+        finally:
+            comprador.delete()
+            dono.delete()
+
+        self.stdout.write(
+            f"{resultado['aceitos']} aceitos, {resultado['recusados']} recusados em "
+            f"{resultado['segundos']}s ({resultado['pedidos_por_segundo']} pedidos/s)"
+        )
+        for erro in resultado["erros"]:
+            self.stderr.write(erro)
+
+        # CommandError sai com status 1, para scripts e CI pegarem a falha
+        vendido_a_mais = resultado["unidades_vendidas"] - options["estoque"]
+        if resultado["estoque_final"] < 0 or vendido_a_mais > 0:
+            raise CommandError(
+                f"{vendido_a_mais} unidade(s) vendidas acima do estoque (estoque final {resultado['estoque_final']})."
+            )
+        if resultado["erros"]:
+            raise CommandError(f"{len(resultado['erros'])} pedido(s) falharam com erro inesperado.")
+        self.stdout.write(self.style.SUCCESS("Nenhuma venda acima do estoque."))
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum, DecimalField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from pedidos.models import Pedido, VendaDiaria, expressao_subtotal
+
+
+class Command(BaseCommand):
+    help = (
+        "Confere o valor_total gravado de cada pedido contra o SUM dos itens no banco, "
+        "em lotes por id. Com --corrigir, regrava os totais divergentes e reconstrói as "
+        "vendas diárias das empresas com vendas corrigidas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Pedidos verificados por query.")
+        parser.add_argument("--corrigir", action="store_true", help="Corrige os totais divergentes.")
+
+    def handle(self, *args, **options):
+        soma_itens = Coalesce(
+            Sum(expressao_subtotal("itens__")),
+            0,
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+        ultimo_id = 0
+        verificados = 0
+        divergentes = 0
+        empresas_com_venda_corrigida = set()
+
+        while True:
+            lote = list(
+                Pedido.objects.filter(pk__gt=ultimo_id)
+                .order_by("pk")
+                .annotate(soma_itens=soma_itens)
+                .values_list("pk", "valor_total", "soma_itens")[:options["lote"]]
+            )
+            if not lote:
+                break
+            ultimo_id = lote[-1][0]
+            verificados += len(lote)
+
+            errados = [pk for pk, gravado, calculado in lote if gravado != calculado]
+            if not errados:
+                continue
+            divergentes += len(errados)
+            for pk, gravado, calculado in lote:
+                if pk in errados:
+                    self.stdout.write(f"Pedido #{pk}: gravado {gravado}, itens somam {calculado}")
+            if options["corrigir"]:
+                Pedido.objects.filter(pk__in=errados).update(
+                    valor_total=Pedido.total_dos_itens(), updated_at=timezone.now()
+                )
+                empresas_com_venda_corrigida.update(
+                    Pedido.objects.filter(pk__in=errados, status__in=VendaDiaria.STATUS_VENDA)
+                    .values_list("empresa_id", flat=True)
+                )
+
+        # não dá para saber se a VendaDiaria seguiu o total errado ou o certo (depende
+        # de como ele divergiu), então as empresas afetadas são recalculadas dos pedidos
+        if empresas_com_venda_corrigida:
+            VendaDiaria.reconstruir(sorted(empresas_com_venda_corrigida))
+            self.stdout.write(
+                f"Vendas diárias reconstruídas de {len(empresas_com_venda_corrigida)} empresa(s)."
+            )
+
+        mensagem = f"{verificados} pedido(s) verificados, {divergentes} divergente(s)"
+        if divergentes and options["corrigir"]:
+            mensagem += " corrigido(s)"
+        self.stdout.write(self.style.SUCCESS(mensagem + "."))
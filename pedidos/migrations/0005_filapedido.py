@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0004_pedido_descricao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilaPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('itens', models.JSONField()),
+                ('status', models.CharField(choices=[('aguardando', 'Aguardando'), ('concluido', 'Concluído'), ('falhou', 'Falhou')], default='aguardando', max_length=20)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('erro', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processado_em', models.DateTimeField(blank=True, null=True)),
+                ('pedido', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fila', to='pedidos.pedido')),
+            ],
+            options={
+                'verbose_name': 'Pedido na fila',
+                'verbose_name_plural': 'Fila de pedidos',
+                'indexes': [models.Index(condition=models.Q(('status', 'aguardando')), fields=['id'], name='fila_pedido_aguardando_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0005_filapedido'),
+        ('users', '0004_alter_empresa_meta'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['empresa', '-created_at', '-id'], name='pedido_empresa_recentes_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0006_pedido_empresa_recentes_idx'),
+        ('users', '0004_alter_empresa_meta'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pedido',
+            name='empresa',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='users.empresa'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['empresa', 'status', 'created_at'], include=('valor_total',), name='pedido_empresa_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(condition=models.Q(('status__in', ['pago', 'concluido'])), fields=['empresa', 'created_at'], include=('valor_total',), name='pedido_vendas_idx'),
+        ),
+    ]
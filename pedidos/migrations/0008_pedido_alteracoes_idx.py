@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0007_pedido_filtros_idx'),
+        ('users', '0004_alter_empresa_meta'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['empresa', 'updated_at', 'id'], name='pedido_alteracoes_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def popular_vendas_diarias(apps, schema_editor):
+    """Carga inicial da VendaDiaria com o histórico de pedidos pago/concluido."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO pedidos_vendadiaria (empresa_id, dia, total, pedidos, itens)
+            SELECT p.empresa_id, (p.created_at AT TIME ZONE %s)::date AS dia,
+                   SUM(p.valor_total), COUNT(*), COALESCE(SUM(i.unidades), 0)
+            FROM pedidos_pedido p
+            LEFT JOIN LATERAL (
+                SELECT SUM(quantidade) AS unidades FROM pedidos_itempedido WHERE pedido_id = p.id
+            ) i ON true
+            WHERE p.status IN ('pago', 'concluido')
+            GROUP BY p.empresa_id, dia
+            """,
+            [settings.TIME_ZONE],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0008_pedido_alteracoes_idx'),
+        ('users', '0004_alter_empresa_meta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('pedidos', models.IntegerField(default=0)),
+                ('itens', models.IntegerField(default=0, help_text='Unidades vendidas (soma das quantidades).')),
+                ('empresa', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='vendas_diarias', to='users.empresa')),
+            ],
+            options={
+                'verbose_name': 'Venda diária',
+                'verbose_name_plural': 'Vendas diárias',
+                'constraints': [models.UniqueConstraint(fields=('empresa', 'dia'), name='venda_diaria_empresa_dia_uniq')],
+            },
+        ),
+        migrations.RunPython(popular_vendas_diarias, migrations.RunPython.noop),
+    ]
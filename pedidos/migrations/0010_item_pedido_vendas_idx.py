@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0009_vendadiaria'),
+        ('produtos', '0002_produto_empresa'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='itempedido',
+            name='pedido',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='itens', to='pedidos.pedido'),
+        ),
+        migrations.AddIndex(
+            model_name='itempedido',
+            index=models.Index(fields=['pedido'], include=('produto', 'quantidade'), name='item_pedido_vendas_idx'),
+        ),
+    ]
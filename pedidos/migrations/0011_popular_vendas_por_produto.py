@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:09
+
+from django.conf import settings
+from django.db import migrations
+
+
+def popular_vendas_por_produto(apps, schema_editor):
+    """Carga inicial das vendas por produto (diárias e contadores) com o histórico de pedidos pago/concluido."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO produtos_produtovendadiaria (produto_id, empresa_id, dia, unidades, receita)
+            SELECT i.produto_id, p.empresa_id, (p.created_at AT TIME ZONE %s)::date AS dia,
+                   SUM(i.quantidade), SUM(i.quantidade * i.preco_unitario)
+            FROM pedidos_pedido p
+            JOIN pedidos_itempedido i ON i.pedido_id = p.id
+            WHERE p.status IN ('pago', 'concluido')
+            GROUP BY i.produto_id, p.empresa_id, dia
+            """,
+            [settings.TIME_ZONE],
+        )
+        cursor.execute(
+            """
+            UPDATE produtos_produto pr SET unidades_vendidas = t.unidades, receita_total = t.receita
+            FROM (
+                SELECT produto_id, SUM(unidades) AS unidades, SUM(receita) AS receita
+                FROM produtos_produtovendadiaria GROUP BY produto_id
+            ) t
+            WHERE pr.id = t.produto_id
+            """
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0010_item_pedido_vendas_idx'),
+        ('produtos', '0003_vendas_por_produto'),
+    ]
+
+    operations = [
+        migrations.RunPython(popular_vendas_por_produto, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0011_popular_vendas_por_produto'),
+        ('users', '0005_empresa_contadores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconstrucaoEmpresa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('execucao', models.CharField(max_length=64)),
+                ('dias', models.IntegerField(default=0)),
+                ('concluida_em', models.DateTimeField(auto_now_add=True)),
+                ('empresa', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.empresa')),
+            ],
+            options={
+                'verbose_name': 'Reconstrução de empresa',
+                'verbose_name_plural': 'Reconstruções de empresas',
+                'constraints': [models.UniqueConstraint(fields=('execucao', 'empresa'), name='reconstrucao_execucao_empresa_uniq')],
+            },
+        ),
+    ]
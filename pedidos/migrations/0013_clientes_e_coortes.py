@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0012_reconstrucaoempresa'),
+        ('users', '0005_empresa_contadores'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClienteEmpresa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('primeira_compra', models.DateTimeField()),
+                ('ultima_compra', models.DateTimeField()),
+                ('pedidos', models.IntegerField()),
+                ('valor_total', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('coorte', models.DateField(help_text='Primeiro dia do mês da primeira compra.')),
+                ('empresa', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='clientes', to='users.empresa')),
+                ('usuario', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Cliente da empresa',
+                'verbose_name_plural': 'Clientes das empresas',
+                'indexes': [models.Index(fields=['empresa', '-valor_total'], name='cliente_empresa_valor_idx')],
+                'constraints': [models.UniqueConstraint(fields=('empresa', 'usuario'), name='cliente_empresa_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RetencaoCoorte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('coorte', models.DateField()),
+                ('mes', models.IntegerField(help_text='Meses desde a coorte (0 = o próprio mês).')),
+                ('clientes', models.IntegerField()),
+                ('receita', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('calculado_em', models.DateTimeField()),
+                ('empresa', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.empresa')),
+            ],
+            options={
+                'verbose_name': 'Retenção de coorte',
+                'verbose_name_plural': 'Retenção de coortes',
+                'constraints': [models.UniqueConstraint(fields=('empresa', 'coorte', 'mes'), name='retencao_coorte_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Todo INSERT/UPDATE do pedido grava o id da transação (xid8, sem wraparound).
+# Feito no banco para valer também nos UPDATEs em SQL (somar_ao_total,
+# transicionar_status, queryset.update).
+CRIAR_TRIGGER = """
+    CREATE FUNCTION pedido_xid_alteracao() RETURNS trigger AS $$
+    BEGIN
+        NEW.xid_alteracao := pg_current_xact_id()::text::bigint;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER pedido_xid_alteracao
+        BEFORE INSERT OR UPDATE ON pedidos_pedido
+        FOR EACH ROW EXECUTE FUNCTION pedido_xid_alteracao();
+
+    UPDATE pedidos_pedido SET xid_alteracao = 0;
+"""
+
+REMOVER_TRIGGER = """
+    DROP TRIGGER IF EXISTS pedido_xid_alteracao ON pedidos_pedido;
+    DROP FUNCTION IF EXISTS pedido_xid_alteracao();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0013_clientes_e_coortes'),
+        ('users', '0006_indice_tokens_expirados'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='pedido',
+            name='pedido_alteracoes_idx',
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='xid_alteracao',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(CRIAR_TRIGGER, REMOVER_TRIGGER),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['empresa', 'xid_alteracao', 'id'], name='pedido_alteracoes_idx'),
+        ),
+    ]
@@ -1,7 +1,11 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from users.models import User, BaseModel
-from produtos.models import Produto
+from produtos.models import Produto, ProdutoVendaDiaria
 from users.models import Empresa
+from users import dashboard_cache
 
 
 class Pedido(BaseModel):
@@ -13,29 +17,193 @@ class Pedido(BaseModel):
         ("concluido", "Concluído"),
     ]
 
+    # status de destino -> status de origem permitidos
+    TRANSICOES = {
+        "processando": ["pendente"],
+        "pago": ["processando"],
+        "concluido": ["pago"],
+        "cancelado": ["pendente", "processando", "pago", "concluido"],
+    }
+
     usuario = models.ForeignKey(User, on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pendente")
     descricao = models.TextField(null=True, blank=True)
-    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=False, blank=False)
+    # sem o índice simples do FK: os índices compostos abaixo começam por empresa
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=False, blank=False, db_index=False)
     valor_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # id da transação que gravou o pedido por último, preenchido no banco pelo
+    # trigger pedido_xid_alteracao em todo INSERT/UPDATE; é o cursor do feed de
+    # alterações (ver pedidos.pagination.PedidoAlteracoesPagination)
+    xid_alteracao = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # listagem paginada por keyset (ver pedidos.pagination)
+            models.Index(fields=["empresa", "-created_at", "-id"], name="pedido_empresa_recentes_idx"),
+            # filtros por status e período (listagem e dashboards); valor_total no
+            # INCLUDE permite somar o faturamento só com index-only scan
+            models.Index(
+                fields=["empresa", "status", "created_at"],
+                include=["valor_total"],
+                name="pedido_empresa_status_idx",
+            ),
+            # vendas efetivas (pago/concluido), que é o que os dashboards somam
+            models.Index(
+                fields=["empresa", "created_at"],
+                include=["valor_total"],
+                condition=models.Q(status__in=["pago", "concluido"]),
+                name="pedido_vendas_idx",
+            ),
+            # feed de alterações por keyset em (xid_alteracao, id) (ver PedidoViewSet.alteracoes)
+            models.Index(fields=["empresa", "xid_alteracao", "id"], name="pedido_alteracoes_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # status gravado no banco, para saber ao salvar se o pedido entrou ou saiu das vendas
+        if "status" in field_names:
+            instance._status_gravado = instance.status
+        return instance
+
+    def save(self, *args, **kwargs):
+        # valor_total é mantido por deltas no banco (ver ItemPedido.save); um save
+        # completo de uma instância carregada antes desses deltas gravaria um total
+        # velho. Em updates ele só é gravado quando vier em update_fields.
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != "valor_total"
+            ]
+
+        status_anterior = None
+        if not self._state.adding:
+            if not hasattr(self, "_status_gravado"):
+                self._status_gravado = Pedido.objects.filter(pk=self.pk).values_list("status", flat=True).first()
+            status_anterior = self._status_gravado
+        update_fields = kwargs.get("update_fields")
+
+        super().save(*args, **kwargs)
+
+        if update_fields is not None and "status" not in update_fields:
+            return
+        era_venda = status_anterior in VendaDiaria.STATUS_VENDA
+        e_venda = self.status in VendaDiaria.STATUS_VENDA
+        if era_venda != e_venda:
+            VendaDiaria.registrar_pedidos([self.pk], 1 if e_venda else -1)
+        self._status_gravado = self.status
+
+    @classmethod
+    def transicao_permitida(cls, origem, destino):
+        return origem == destino or origem in cls.TRANSICOES.get(destino, [])
+
+    @staticmethod
+    def somar_ao_total(pedido_id, delta, delta_itens=0, produto_id=None):
+        """
+        Aplica um delta ao valor_total direto no banco (valor_total = valor_total + delta).
+        Se o pedido já conta como venda, a VendaDiaria do dia dele recebe o mesmo
+        delta (e `delta_itens` unidades) no mesmo comando, assim como os contadores
+        de vendas de `produto_id`, quando informado.
+        """
+        if not delta and not delta_itens:
+            return
+        pedidos = connection.ops.quote_name(Pedido._meta.db_table)
+        params = [delta, timezone.now(), pedido_id, VendaDiaria.fuso(), list(VendaDiaria.STATUS_VENDA)]
+        sql = f"""
+            WITH p AS (
+                UPDATE {pedidos} SET valor_total = valor_total + %s, updated_at = %s
+                WHERE id = %s
+                RETURNING empresa_id, created_at, status
+            ),
+            venda AS (
+                SELECT empresa_id, {VendaDiaria.sql_dia("created_at")} AS dia
+                FROM p {VendaDiaria.sql_travar("p.empresa_id")}
+                WHERE status = ANY(%s)
+            )
+        """
+        upsert_empresa = VendaDiaria.sql_upsert("SELECT empresa_id, dia, %s, 0, %s FROM venda")
+        if produto_id is None:
+            sql += upsert_empresa
+            params += [delta, delta_itens]
+        else:
+            sql += f""",
+            empresa_dia AS ({upsert_empresa}),
+            produto_dia AS ({VendaDiaria.sql_upsert_produtos("SELECT %s, empresa_id, dia, %s, %s FROM venda")})
+            {VendaDiaria.sql_somar_nos_produtos("SELECT %s AS produto_id, %s AS unidades, %s AS receita FROM venda")}
+            """
+            params += [
+                delta, delta_itens,
+                produto_id, delta_itens, delta,
+                produto_id, delta_itens, delta,
+            ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    @staticmethod
+    def total_dos_itens():
+        """Subquery com a soma dos subtotais dos itens do pedido (OuterRef('pk'))."""
+        soma = (
+            ItemPedido.objects.filter(pedido=OuterRef("pk"))
+            .values("pedido")
+            .annotate(total=Sum(expressao_subtotal()))
+            .values("total")
+        )
+        return Coalesce(Subquery(soma), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2))
 
     def atualizar_total(self):
-        valor_total = sum(item.subtotal() for item in self.itens.all())
-        self.valor_total = valor_total
-        self.save()
+        """
+        Recalcula o valor_total a partir dos itens com um SUM no banco. A
+        diferença entra pelo somar_ao_total, para a VendaDiaria (mantida pelos
+        deltas do valor_total) acompanhar.
+        """
+        with transaction.atomic():
+            gravado, calculado = (
+                Pedido.objects.select_for_update().filter(pk=self.pk)
+                .annotate(calculado=Pedido.total_dos_itens())
+                .values_list("valor_total", "calculado").get()
+            )
+            Pedido.somar_ao_total(self.pk, calculado - gravado)
+        self.refresh_from_db(fields=["valor_total"])
 
     def __str__(self):
         return f"Pedido #{self.id} - {self.usuario}"
 
 
+def expressao_subtotal(prefixo=""):
+    """quantidade * preco_unitario do item; `prefixo` para usar a partir do pedido ("itens__")."""
+    return ExpressionWrapper(
+        F(f"{prefixo}quantidade") * F(f"{prefixo}preco_unitario"),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
 
 
 class ItemPedido(BaseModel):
-    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name="itens")
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name="itens", db_index=False)
     produto = models.ForeignKey(Produto, on_delete=models.CASCADE)
     quantidade = models.PositiveIntegerField()
     preco_unitario = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # substitui o índice simples do FK: as agregações de vendas por produto
+            # (join a partir dos pedidos do período) leem produto e quantidade do
+            # próprio índice
+            models.Index(fields=["pedido"], include=["produto", "quantidade"], name="item_pedido_vendas_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # guarda o que já está somado no pedido (e nas vendas do produto), para
+        # aplicar só a diferença ao salvar
+        if {"pedido_id", "produto_id", "quantidade", "preco_unitario"} <= set(field_names):
+            instance._total_aplicado = (
+                instance.pedido_id, instance.subtotal(), instance.quantidade, instance.produto_id
+            )
+        return instance
+
     def subtotal(self):
         return self.quantidade * self.preco_unitario
 
@@ -48,12 +216,348 @@ class ItemPedido(BaseModel):
             self.preco_unitario = self.produto.preco
 
         # Se o pedido ainda não tem empresa, define automaticamente
-        if self.pedido.empresa is None:
-            self.pedido.empresa = self.produto.empresa
+        if self.pedido.empresa_id is None:
+            self.pedido.empresa_id = self.produto.empresa_id
             self.pedido.save()
 
         # Se tentar adicionar item de outra empresa → ERRO
-        if self.pedido.empresa != self.produto.empresa:
+        if self.pedido.empresa_id != self.produto.empresa_id:
             raise ValueError("Todos os itens do pedido devem ser da mesma empresa.")
 
-        super().save(*args, **kwargs)
\ No newline at end of file
+        if not self._state.adding and not hasattr(self, "_total_aplicado"):
+            antigo = ItemPedido.objects.filter(pk=self.pk).values_list(
+                "pedido_id", "quantidade", "preco_unitario", "produto_id"
+            ).first()
+            if antigo:
+                self._total_aplicado = (antigo[0], antigo[1] * antigo[2], antigo[1], antigo[3])
+
+        super().save(*args, **kwargs)
+
+        # Atualiza o total do pedido com a diferença, sem reler os outros itens
+        pedido_anterior, subtotal_anterior, quantidade_anterior, produto_anterior = getattr(
+            self, "_total_aplicado", (None, 0, 0, None)
+        )
+        if (pedido_anterior, produto_anterior) == (self.pedido_id, self.produto_id):
+            Pedido.somar_ao_total(
+                self.pedido_id, self.subtotal() - subtotal_anterior,
+                self.quantidade - quantidade_anterior, self.produto_id,
+            )
+        else:
+            if pedido_anterior is not None:
+                Pedido.somar_ao_total(pedido_anterior, -subtotal_anterior, -quantidade_anterior, produto_anterior)
+            Pedido.somar_ao_total(self.pedido_id, self.subtotal(), self.quantidade, self.produto_id)
+        self._total_aplicado = (self.pedido_id, self.subtotal(), self.quantidade, self.produto_id)
+
+
+class FilaPedido(models.Model):
+    """
+    Entrada da fila de pedidos assíncronos: o POST grava o pedido pendente e o
+    payload dos itens aqui, e o comando processar_fila_pedidos faz o checkout.
+    """
+    STATUS_CHOICES = [
+        ("aguardando", "Aguardando"),
+        ("concluido", "Concluído"),
+        ("falhou", "Falhou"),
+    ]
+
+    pedido = models.OneToOneField(Pedido, on_delete=models.CASCADE, related_name="fila")
+    itens = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="aguardando")
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    erro = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Pedido na fila"
+        verbose_name_plural = "Fila de pedidos"
+        indexes = [
+            # só as entradas aguardando são varridas pelos workers
+            models.Index(fields=["id"], name="fila_pedido_aguardando_idx", condition=models.Q(status="aguardando")),
+        ]
+
+    def __str__(self):
+        return f"Fila do pedido #{self.pedido_id} ({self.status})"
+
+
+class VendaDiaria(models.Model):
+    """
+    Vendas (pedidos pago/concluido) de uma empresa por dia, no fuso do projeto e
+    pela data de criação do pedido, como os dashboards sempre contaram. É mantida
+    por deltas quando um pedido entra ou sai das vendas ou tem itens alterados
+    (ver Pedido.save, Pedido.somar_ao_total e services.transicionar_status); o
+    comando reconstruir_vendas_diarias recalcula a partir dos pedidos.
+
+    Os mesmos eventos mantêm as vendas por produto: ProdutoVendaDiaria e os
+    contadores Produto.unidades_vendidas/receita_total.
+    """
+    STATUS_VENDA = ("pago", "concluido")
+    # primeira chave dos advisory locks por empresa (a segunda é o id da empresa)
+    TRAVA = 5644
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="vendas_diarias", db_index=False)
+    dia = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    pedidos = models.IntegerField(default=0)
+    itens = models.IntegerField(default=0, help_text="Unidades vendidas (soma das quantidades).")
+
+    class Meta:
+        verbose_name = "Venda diária"
+        verbose_name_plural = "Vendas diárias"
+        constraints = [
+            models.UniqueConstraint(fields=["empresa", "dia"], name="venda_diaria_empresa_dia_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.empresa_id} {self.dia}: {self.total}"
+
+    @staticmethod
+    def fuso():
+        return timezone.get_default_timezone_name()
+
+    @staticmethod
+    def sql_travar(coluna):
+        """
+        Trecho de FROM que pega a trava compartilhada (advisory lock da transação)
+        da empresa de cada linha. Os deltas passam por ela antes de gravar; a
+        reconstrução de uma empresa pega a mesma trava exclusiva (ver reconstruir).
+        """
+        return f"CROSS JOIN LATERAL (SELECT pg_advisory_xact_lock_shared({VendaDiaria.TRAVA}, {coluna}::int)) trava"
+
+    @staticmethod
+    def sql_dia(coluna):
+        """Dia local de um timestamptz; recebe o fuso como parâmetro (ver fuso())."""
+        return f"({coluna} AT TIME ZONE %s)::date"
+
+    @staticmethod
+    def sql_upsert(select):
+        """
+        INSERT das linhas de `select` (empresa_id, dia, total, pedidos, itens),
+        somando aos contadores quando o dia da empresa já existe.
+        """
+        tabela = connection.ops.quote_name(VendaDiaria._meta.db_table)
+        return f"""
+            INSERT INTO {tabela} (empresa_id, dia, total, pedidos, itens)
+            {select}
+            ON CONFLICT (empresa_id, dia) DO UPDATE SET
+                total = {tabela}.total + EXCLUDED.total,
+                pedidos = {tabela}.pedidos + EXCLUDED.pedidos,
+                itens = {tabela}.itens + EXCLUDED.itens
+        """
+
+    @staticmethod
+    def sql_vendas_dos_pedidos(filtro):
+        """
+        SELECT com as vendas agregadas por empresa e dia dos pedidos que passam
+        em `filtro` (condição SQL sobre o alias p). Parâmetros: fuso, depois os do filtro.
+        """
+        pedidos = connection.ops.quote_name(Pedido._meta.db_table)
+        itens = connection.ops.quote_name(ItemPedido._meta.db_table)
+        return f"""
+            SELECT p.empresa_id, {VendaDiaria.sql_dia("p.created_at")} AS dia,
+                   SUM(p.valor_total) AS total, COUNT(*) AS pedidos, COALESCE(SUM(i.unidades), 0) AS itens
+            FROM {pedidos} p
+            LEFT JOIN LATERAL (
+                SELECT SUM(quantidade) AS unidades FROM {itens} WHERE pedido_id = p.id
+            ) i ON true
+            WHERE {filtro}
+            GROUP BY p.empresa_id, dia
+        """
+
+    @staticmethod
+    def sql_vendas_por_produto(filtro):
+        """
+        SELECT com unidades e receita por produto e dia dos pedidos que passam em
+        `filtro` (alias p). Parâmetros: fuso, depois os do filtro.
+        """
+        pedidos = connection.ops.quote_name(Pedido._meta.db_table)
+        itens = connection.ops.quote_name(ItemPedido._meta.db_table)
+        return f"""
+            SELECT i.produto_id, p.empresa_id, {VendaDiaria.sql_dia("p.created_at")} AS dia,
+                   SUM(i.quantidade) AS unidades, SUM(i.quantidade * i.preco_unitario) AS receita
+            FROM {pedidos} p
+            JOIN {itens} i ON i.pedido_id = p.id
+            WHERE {filtro}
+            GROUP BY i.produto_id, p.empresa_id, dia
+        """
+
+    @staticmethod
+    def sql_upsert_produtos(select):
+        """INSERT das linhas de `select` (produto_id, empresa_id, dia, unidades, receita), somando no conflito."""
+        tabela = connection.ops.quote_name(ProdutoVendaDiaria._meta.db_table)
+        return f"""
+            INSERT INTO {tabela} (produto_id, empresa_id, dia, unidades, receita)
+            {select}
+            ON CONFLICT (produto_id, dia) DO UPDATE SET
+                unidades = {tabela}.unidades + EXCLUDED.unidades,
+                receita = {tabela}.receita + EXCLUDED.receita
+        """
+
+    @staticmethod
+    def sql_somar_nos_produtos(select):
+        """UPDATE que soma as linhas de `select` (produto_id, unidades, receita) aos contadores do Produto."""
+        produtos = connection.ops.quote_name(Produto._meta.db_table)
+        return f"""
+            UPDATE {produtos} SET
+                unidades_vendidas = {produtos}.unidades_vendidas + t.unidades,
+                receita_total = {produtos}.receita_total + t.receita
+            FROM ({select}) t
+            WHERE {produtos}.id = t.produto_id
+        """
+
+    @classmethod
+    def registrar_pedidos(cls, pedido_ids, sinal):
+        """Soma (sinal=1) ou tira (sinal=-1) as vendas dos pedidos dos seus dias e produtos."""
+        if not pedido_ids:
+            return
+        pedido_ids = list(pedido_ids)
+        select = cls.sql_vendas_dos_pedidos("p.id = ANY(%s)")
+        select = f"""
+            SELECT v.empresa_id, v.dia, %s * v.total, %s * v.pedidos, %s * v.itens
+            FROM ({select}) v {cls.sql_travar("v.empresa_id")}
+        """
+        por_produto = f"""
+            WITH vendas AS (
+                SELECT v.produto_id, v.empresa_id, v.dia, %s * v.unidades AS unidades, %s * v.receita AS receita
+                FROM ({cls.sql_vendas_por_produto("p.id = ANY(%s)")}) v {cls.sql_travar("v.empresa_id")}
+            ),
+            diario AS ({cls.sql_upsert_produtos("SELECT produto_id, empresa_id, dia, unidades, receita FROM vendas")})
+            {cls.sql_somar_nos_produtos(
+                "SELECT produto_id, SUM(unidades) AS unidades, SUM(receita) AS receita FROM vendas GROUP BY produto_id"
+            )}
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(cls.sql_upsert(select), [sinal, sinal, sinal, cls.fuso(), pedido_ids])
+            cursor.execute(por_produto, [sinal, sinal, cls.fuso(), pedido_ids])
+
+    @classmethod
+    def reconstruir(cls, empresa_ids=None):
+        """
+        Recalcula as vendas diárias a partir dos pedidos (de todas as empresas ou
+        só de `empresa_ids`). Durante a reconstrução os deltas concorrentes esperam
+        e entram depois, sem se perder: a reconstrução completa trava as tabelas
+        para escrita; a de algumas empresas pega a trava exclusiva de cada uma
+        (ver sql_travar), então empresas diferentes podem ser reconstruídas em paralelo.
+        Retorna o número de dias gravados.
+        """
+        tabela = connection.ops.quote_name(cls._meta.db_table)
+        tabela_produtos = connection.ops.quote_name(ProdutoVendaDiaria._meta.db_table)
+        produtos = connection.ops.quote_name(Produto._meta.db_table)
+        filtro = "p.status = ANY(%s)"
+        params = [cls.fuso(), list(cls.STATUS_VENDA)]
+        escopo, params_escopo = "", []
+        if empresa_ids is not None:
+            filtro += " AND p.empresa_id = ANY(%s)"
+            params.append(list(empresa_ids))
+            escopo, params_escopo = "WHERE empresa_id = ANY(%s)", [list(empresa_ids)]
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if empresa_ids is None:
+                cursor.execute(f"LOCK TABLE {tabela}, {tabela_produtos} IN SHARE ROW EXCLUSIVE MODE")
+            else:
+                # sempre na mesma ordem, para duas reconstruções não se travarem
+                cursor.execute(
+                    f"SELECT pg_advisory_xact_lock({cls.TRAVA}, id::int) FROM (SELECT unnest(%s) AS id ORDER BY 1) ids",
+                    [sorted(empresa_ids)],
+                )
+            cursor.execute(f"DELETE FROM {tabela} {escopo}", params_escopo)
+            cursor.execute(cls.sql_upsert(cls.sql_vendas_dos_pedidos(filtro)), params)
+            dias = cursor.rowcount
+
+            cursor.execute(f"DELETE FROM {tabela_produtos} {escopo}", params_escopo)
+            cursor.execute(cls.sql_upsert_produtos(cls.sql_vendas_por_produto(filtro)), params)
+            # contadores do produto = soma dos seus dias
+            cursor.execute(f"""
+                UPDATE {produtos} pr SET
+                    unidades_vendidas = COALESCE(t.unidades, 0),
+                    receita_total = COALESCE(t.receita, 0)
+                FROM (
+                    SELECT b.id, SUM(v.unidades) AS unidades, SUM(v.receita) AS receita
+                    FROM {produtos} b
+                    LEFT JOIN {tabela_produtos} v ON v.produto_id = b.id
+                    {escopo.replace("empresa_id", "b.empresa_id")}
+                    GROUP BY b.id
+                ) t
+                WHERE pr.id = t.id
+            """, params_escopo)
+
+        if empresa_ids is None:
+            dashboard_cache.invalidar_todas()
+        else:
+            dashboard_cache.invalidar(*empresa_ids)
+        return dias
+
+
+class ReconstrucaoEmpresa(models.Model):
+    """
+    Empresa já reconstruída numa execução do comando reconstruir_vendas_diarias
+    com --processos. Gravada na mesma transação da reconstrução da empresa, é o
+    que permite retomar uma execução interrompida (--execucao) sem refazer nada.
+    """
+    execucao = models.CharField(max_length=64)
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="+", db_index=False)
+    dias = models.IntegerField(default=0)
+    concluida_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Reconstrução de empresa"
+        verbose_name_plural = "Reconstruções de empresas"
+        constraints = [
+            models.UniqueConstraint(fields=["execucao", "empresa"], name="reconstrucao_execucao_empresa_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.execucao}: empresa #{self.empresa_id}"
+
+
+class ClienteEmpresa(models.Model):
+    """
+    Resumo das compras (pedidos pago/concluido) de um cliente numa empresa,
+    calculado em lote por calcular_clientes_empresas (ver pedidos.clientes).
+    A coorte é o mês da primeira compra, no fuso do projeto.
+    """
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="clientes", db_index=False)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+", db_index=False)
+    primeira_compra = models.DateTimeField()
+    ultima_compra = models.DateTimeField()
+    pedidos = models.IntegerField()
+    valor_total = models.DecimalField(max_digits=14, decimal_places=2)
+    coorte = models.DateField(help_text="Primeiro dia do mês da primeira compra.")
+
+    class Meta:
+        verbose_name = "Cliente da empresa"
+        verbose_name_plural = "Clientes das empresas"
+        constraints = [
+            models.UniqueConstraint(fields=["empresa", "usuario"], name="cliente_empresa_uniq"),
+        ]
+        indexes = [
+            # clientes que mais compraram na empresa
+            models.Index(fields=["empresa", "-valor_total"], name="cliente_empresa_valor_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} na empresa {self.empresa_id}: {self.pedidos} pedido(s)"
+
+
+class RetencaoCoorte(models.Model):
+    """
+    Clientes de uma coorte (mês da primeira compra) que compraram `mes` meses
+    depois dela, e quanto gastaram. Uma linha por empresa, coorte e mês: é a
+    matriz de retenção já pronta para o endpoint de coortes.
+    """
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="+", db_index=False)
+    coorte = models.DateField()
+    mes = models.IntegerField(help_text="Meses desde a coorte (0 = o próprio mês).")
+    clientes = models.IntegerField()
+    receita = models.DecimalField(max_digits=14, decimal_places=2)
+    calculado_em = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Retenção de coorte"
+        verbose_name_plural = "Retenção de coortes"
+        constraints = [
+            models.UniqueConstraint(fields=["empresa", "coorte", "mes"], name="retencao_coorte_uniq"),
+        ]
+
+    def __str__(self):
+        return f"Empresa {self.empresa_id}, coorte {self.coorte:%Y-%m}, mês {self.mes}: {self.clientes}"
@@ -0,0 +1,178 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def codificar_cursor(momento, pk):
+    """Cursor opaco a partir de um par (datetime, id)."""
+    bruto = json.dumps([momento.isoformat(), pk])
+    return base64.urlsafe_b64encode(bruto.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    try:
+        momento, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(momento), int(pk)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValidationError({"cursor": "Cursor inválido."})
+
+
+def codificar_cursor_feed(xid, pk):
+    """Cursor opaco do feed de alterações a partir de um par (xid_alteracao, id)."""
+    return base64.urlsafe_b64encode(json.dumps([xid, pk]).encode()).decode()
+
+
+def decodificar_cursor_feed(cursor):
+    try:
+        xid, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(xid, int):
+            raise TypeError
+        return xid, int(pk)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValidationError({"since": "Cursor inválido."})
+
+
+# transações com id abaixo deste já terminaram (commit ou rollback); nenhuma
+# gravação nova pode aparecer com um xid menor
+XMIN_DO_SNAPSHOT = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+
+class PedidoCursorPagination(BasePagination):
+    """
+    Paginação por keyset em (created_at, id), do mais recente para o mais antigo.
+    Cada página é um range scan no índice (empresa, -created_at, -id) a partir do
+    último pedido da página anterior, então a página 1000 custa o mesmo que a 1.
+    """
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        try:
+            tamanho = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(tamanho, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        tamanho = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            momento, pk = decodificar_cursor(cursor)
+            # equivalente a (created_at, id) < (momento, pk), escrito de forma que o
+            # Postgres use o índice como range em created_at
+            queryset = queryset.filter(
+                Q(created_at__lt=momento) | Q(id__lt=pk),
+                created_at__lte=momento,
+            )
+
+        pagina = list(queryset.order_by('-created_at', '-id')[:tamanho + 1])
+        self.proximo_cursor = None
+        if len(pagina) > tamanho:
+            pagina = pagina[:tamanho]
+            ultimo = pagina[-1]
+            self.proximo_cursor = codificar_cursor(ultimo.created_at, ultimo.pk)
+        return pagina
+
+    def get_next_link(self):
+        if self.proximo_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.proximo_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor devolvido no campo "next" da página anterior.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Pedidos por página (máximo {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class PedidoAlteracoesPagination(PedidoCursorPagination):
+    """
+    Feed de alterações: pedidos em ordem crescente de (xid_alteracao, id) a
+    partir do cursor `since`. A resposta sempre traz o cursor para a próxima
+    consulta (o mesmo, se nada mudou), então o cliente só busca o que mudou
+    desde a última.
+
+    A ordem é a da transação que gravou o pedido, não a do relógio: só entram
+    pedidos gravados por transações mais antigas que a mais antiga ainda em
+    andamento. Um pedido gravado por uma transação longa (um lote da fila, por
+    exemplo) segura o feed até o commit dela, em vez de aparecer atrás de um
+    cursor que já passou e ficar de fora.
+    """
+    cursor_query_param = 'since'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        tamanho = self.get_page_size(request)
+
+        queryset = queryset.filter(xid_alteracao__lt=RawSQL(XMIN_DO_SNAPSHOT, []))
+        self.cursor = request.query_params.get(self.cursor_query_param)
+        if self.cursor:
+            xid, pk = decodificar_cursor_feed(self.cursor)
+            # (xid_alteracao, id) > (xid, pk), com range em xid_alteracao no índice
+            queryset = queryset.filter(
+                Q(xid_alteracao__gt=xid) | Q(id__gt=pk),
+                xid_alteracao__gte=xid,
+            )
+
+        pagina = list(queryset.order_by('xid_alteracao', 'id')[:tamanho + 1])
+        self.tem_mais = len(pagina) > tamanho
+        pagina = pagina[:tamanho]
+        if pagina:
+            self.cursor = codificar_cursor_feed(pagina[-1].xid_alteracao, pagina[-1].pk)
+        return pagina
+
+    def get_paginated_response(self, data):
+        return Response({'since': self.cursor, 'tem_mais': self.tem_mais, 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results', 'tem_mais'],
+            'properties': {
+                'since': {'type': 'string', 'nullable': True},
+                'tem_mais': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        parametros = super().get_schema_operation_parameters(view)
+        parametros[0]['description'] = 'Cursor "since" devolvido pela consulta anterior; sem ele o feed começa do início.'
+        return parametros
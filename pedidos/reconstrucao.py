@@ -0,0 +1,84 @@
+"""
+Reconstrução das vendas diárias em paralelo (reconstruir_vendas_diarias --processos).
+
+As empresas pendentes são divididas em lotes entre processos, cada um com sua
+própria conexão. Cada empresa é reconstruída numa transação própria com
+VendaDiaria.reconstruir([id]), que trava só a empresa (e não as tabelas), e
+fica registrada em ReconstrucaoEmpresa na mesma transação; uma execução
+interrompida é retomada pelo nome, pulando as empresas já registradas.
+
+Os models são importados dentro das funções: com o start method spawn o
+processo filho importa este módulo antes do django.setup().
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import django
+from django.db import connections, transaction
+
+
+def _iniciar_processo():
+    django.setup()
+
+
+def reconstruir_lote(execucao, empresa_ids):
+    """Reconstrói as empresas do lote, uma transação por empresa. Retorna (empresas, dias)."""
+    from .models import ReconstrucaoEmpresa, VendaDiaria
+
+    dias = 0
+    for empresa_id in empresa_ids:
+        with transaction.atomic():
+            dias_empresa = VendaDiaria.reconstruir([empresa_id])
+            ReconstrucaoEmpresa.objects.create(execucao=execucao, empresa_id=empresa_id, dias=dias_empresa)
+        dias += dias_empresa
+    return len(empresa_ids), dias
+
+
+def reconstruir_em_paralelo(execucao, processos, lote=50, empresa_ids=None):
+    """
+    Reconstrói as empresas (todas ou `empresa_ids`) ainda não registradas em
+    `execucao`, em lotes de `lote` empresas distribuídos entre `processos`
+    processos (com 1, tudo roda neste processo). É um gerador: a cada lote
+    concluído produz o progresso {"empresas", "total", "dias", "segundos",
+    "empresas_por_segundo"}. Ao terminar sem erro, apaga os registros da execução.
+    """
+    from users import dashboard_cache
+    from users.models import Empresa
+    from .models import ReconstrucaoEmpresa
+
+    registro = ReconstrucaoEmpresa.objects.filter(execucao=execucao)
+    pendentes = Empresa.objects.exclude(pk__in=registro.values("empresa_id"))
+    if empresa_ids is not None:
+        pendentes = pendentes.filter(pk__in=empresa_ids)
+    ids = list(pendentes.order_by("pk").values_list("pk", flat=True))
+    lotes = [ids[i:i + lote] for i in range(0, len(ids), lote)]
+
+    progresso = {"empresas": 0, "total": len(ids), "dias": 0}
+    inicio = time.perf_counter()
+
+    def avancar(empresas, dias):
+        segundos = time.perf_counter() - inicio
+        progresso["empresas"] += empresas
+        progresso["dias"] += dias
+        progresso["segundos"] = round(segundos, 1)
+        progresso["empresas_por_segundo"] = round(progresso["empresas"] / segundos, 1) if segundos else None
+        return dict(progresso)
+
+    if processos <= 1:
+        for ids_do_lote in lotes:
+            yield avancar(*reconstruir_lote(execucao, ids_do_lote))
+    else:
+        # os filhos não podem herdar (e depois fechar) as conexões deste processo
+        connections.close_all()
+        pool = ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo)
+        try:
+            futuros = [pool.submit(reconstruir_lote, execucao, ids_do_lote) for ids_do_lote in lotes]
+            for futuro in as_completed(futuros):
+                yield avancar(*futuro.result())
+        except BaseException:
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+        pool.shutdown()
+
+    registro.delete()
+    # o cache dos processos filhos pode não ser o deste (ex.: LocMemCache)
+    dashboard_cache.invalidar_todas()
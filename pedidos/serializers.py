@@ -1,17 +1,17 @@
 from rest_framework import serializers
 from .models import Pedido, ItemPedido
-from produtos.models import Produto
 from produtos.serializer import ProdutoSerializer
-from users.models import User
+from .services import criar_pedido, enfileirar_pedido
 
 
 class ItemPedidoSerializer(serializers.ModelSerializer):
     produto = ProdutoSerializer(read_only=True)
+    produto_id = serializers.IntegerField(write_only=True)
     subtotal = serializers.SerializerMethodField()
 
     class Meta:
         model = ItemPedido
-        fields = ["id", "produto", "quantidade", "preco_unitario", "subtotal"]
+        fields = ["id", "produto", "produto_id", "quantidade", "preco_unitario", "subtotal"]
         read_only_fields = ["id", "preco_unitario", "subtotal"]
 
     def get_subtotal(self, obj):
@@ -35,63 +35,50 @@ class PedidoSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         itens_data = validated_data.pop("itens")
-        pedido = Pedido.objects.create(**validated_data)
-
-        valor_total = 0
-        empresa_do_pedido = None
-
-        for item_data in itens_data:
-
-            # Produto real do banco
-            produto = Produto.objects.get(id=item_data["produto"].id)
-
-            # Verifica empresa do produto
-            produto_empresa = produto.created_by.empresa if hasattr(produto.created_by, "empresa") else None
-            
-            if produto_empresa is None:
-                raise serializers.ValidationError(
-                    f"O produto '{produto.nome}' não possui empresa vinculada."
-                )
-
-            # Configura empresa do pedido automaticamente
-            if empresa_do_pedido is None:
-                empresa_do_pedido = produto_empresa
-                pedido.empresa = empresa_do_pedido
-                pedido.save()
-            else:
-                if empresa_do_pedido != produto_empresa:
-                    raise serializers.ValidationError(
-                        "Todos os produtos do pedido devem ser da mesma empresa."
-                    )
-
-            quantidade = item_data["quantidade"]
-            preco_unitario = produto.preco
-
-            # Criar item
-            ItemPedido.objects.create(
-                pedido=pedido,
-                produto=produto,
-                quantidade=quantidade,
-                preco_unitario=preco_unitario
+        return criar_pedido(itens_data=itens_data, **validated_data)
+
+    def enfileirar(self):
+        """Versão assíncrona do save(): grava o pedido pendente e o coloca na fila."""
+        validated_data = dict(self.validated_data)
+        itens_data = validated_data.pop("itens")
+        self.instance = enfileirar_pedido(itens_data=itens_data, **validated_data)
+        return self.instance
+
+
+class PedidoUpdateStatusSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Pedido
+        fields = ["status", "descricao"]
+
+    def validate_status(self, value):
+        if self.instance and not Pedido.transicao_permitida(self.instance.status, value):
+            raise serializers.ValidationError(
+                f"Transição de status inválida: {self.instance.status} → {value}."
             )
+        return value
 
-            # Atualiza estoque
-            produto.quantidade -= quantidade
-            if produto.quantidade < 0:
-                raise serializers.ValidationError(
-                    f"Estoque insuficiente para o produto {produto.nome}."
-                )
-            produto.save()
 
-            valor_total += quantidade * preco_unitario
+class PedidoTransicaoSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    status = serializers.ChoiceField(choices=list(Pedido.TRANSICOES))
 
-        pedido.valor_total = valor_total
-        pedido.save()
 
-        return pedido
+class PedidoTransicaoMovidoSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    de = serializers.CharField()
+    para = serializers.CharField()
 
 
-class PedidoUpdateStatusSerializer(serializers.ModelSerializer):
+class PedidoTransicaoResultadoSerializer(serializers.Serializer):
+    movidos = PedidoTransicaoMovidoSerializer(many=True)
+    ignorados = serializers.ListField(child=serializers.IntegerField())
+
+
+class PedidoSituacaoSerializer(serializers.ModelSerializer):
+    fila_status = serializers.CharField(source="fila.status", read_only=True, default=None)
+    fila_erro = serializers.CharField(source="fila.erro", read_only=True, default=None)
+
     class Meta:
         model = Pedido
-        fields = ["status", "descricao"]
+        fields = ["id", "status", "valor_total", "fila_status", "fila_erro"]
+        read_only_fields = fields
@@ -0,0 +1,240 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+from produtos.estoque import reservar_estoque, EstoqueInsuficiente
+from produtos.models import Produto
+from users import dashboard_cache
+from .models import Pedido, ItemPedido, FilaPedido, VendaDiaria
+
+
+def agrupar_quantidades(itens_data):
+    """Soma as quantidades por produto (o mesmo produto pode vir em várias linhas)."""
+    quantidades = {}
+    for item_data in itens_data:
+        produto_id = item_data["produto_id"]
+        quantidades[produto_id] = quantidades.get(produto_id, 0) + item_data["quantidade"]
+    return quantidades
+
+
+def validar_produtos(quantidades, empresas_por_produto):
+    """
+    Confere se todos os produtos existem e são da mesma empresa.
+    `empresas_por_produto` é um dict {produto_id: empresa_id}. Retorna a empresa.
+    """
+    nao_encontrados = [str(produto_id) for produto_id in quantidades if produto_id not in empresas_por_produto]
+    if nao_encontrados:
+        raise serializers.ValidationError(
+            f"Produto(s) não encontrado(s): {', '.join(nao_encontrados)}."
+        )
+
+    empresas = set(empresas_por_produto.values())
+    if len(empresas) > 1:
+        raise serializers.ValidationError(
+            "Todos os produtos do pedido devem ser da mesma empresa."
+        )
+    return empresas.pop()
+
+
+def reservar_itens(usuario, itens_data):
+    """
+    Trava e reserva o estoque de todos os produtos de uma vez (ver
+    produtos.estoque.reservar_estoque) e monta os ItemPedido ainda não salvos.
+    Retorna (itens, empresa_id). Deve rodar dentro da transação do pedido.
+    """
+    if not itens_data:
+        raise serializers.ValidationError("O pedido deve conter ao menos um item.")
+
+    quantidades = agrupar_quantidades(itens_data)
+    try:
+        produtos = reservar_estoque(quantidades)
+    except EstoqueInsuficiente as e:
+        raise serializers.ValidationError(e.messages)
+
+    empresa_id = validar_produtos(
+        quantidades, {produto_id: produto.empresa_id for produto_id, produto in produtos.items()}
+    )
+
+    itens = []
+    for item_data in itens_data:
+        produto = produtos[item_data["produto_id"]]
+        itens.append(ItemPedido(
+            produto=produto,
+            quantidade=item_data["quantidade"],
+            preco_unitario=produto.preco,
+            created_by=usuario,
+            updated_by=usuario,
+        ))
+    return itens, empresa_id
+
+
+def gravar_itens(pedido, itens):
+    for item in itens:
+        item.pedido = pedido
+    ItemPedido.objects.bulk_create(itens)
+
+
+@transaction.atomic
+def criar_pedido(usuario, itens_data, **dados_pedido):
+    """
+    Checkout em lote: reserva o estoque, grava o pedido já com o valor_total e
+    cria os itens com bulk_create. O número de queries não cresce com o tamanho
+    do carrinho. Qualquer falha desfaz o pedido inteiro, inclusive a reserva.
+    """
+    itens, empresa_id = reservar_itens(usuario, itens_data)
+
+    pedido = Pedido.objects.create(
+        usuario=usuario,
+        empresa_id=empresa_id,
+        valor_total=sum(item.subtotal() for item in itens),
+        created_by=usuario,
+        updated_by=usuario,
+        **dados_pedido,
+    )
+    gravar_itens(pedido, itens)
+
+    return pedido
+
+
+@transaction.atomic
+def enfileirar_pedido(usuario, itens_data, **dados_pedido):
+    """
+    Recepção assíncrona: valida só o que é barato (produtos existem e são da
+    mesma empresa), grava o pedido como pendente e o payload na FilaPedido.
+    O estoque é reservado depois, pelo worker (processar_lote_fila).
+    """
+    if not itens_data:
+        raise serializers.ValidationError("O pedido deve conter ao menos um item.")
+
+    quantidades = agrupar_quantidades(itens_data)
+    empresa_id = validar_produtos(
+        quantidades,
+        dict(Produto.objects.filter(pk__in=quantidades.keys()).values_list("pk", "empresa_id")),
+    )
+
+    pedido = Pedido.objects.create(
+        usuario=usuario,
+        empresa_id=empresa_id,
+        status="pendente",
+        created_by=usuario,
+        updated_by=usuario,
+        **dados_pedido,
+    )
+    FilaPedido.objects.create(
+        pedido=pedido,
+        itens=[{"produto_id": i["produto_id"], "quantidade": i["quantidade"]} for i in itens_data],
+    )
+    return pedido
+
+
+def _mensagem_erro(erro):
+    if isinstance(erro.detail, (list, tuple)):
+        return " ".join(str(detalhe) for detalhe in erro.detail)
+    return str(erro.detail)
+
+
+def processar_entrada_fila(entrada):
+    """
+    Faz o checkout de uma entrada da fila. Sucesso: itens criados, estoque
+    reservado e pedido em "processando". Falta de estoque ou produto inválido:
+    pedido "cancelado" e o motivo fica em entrada.erro. Erros inesperados são
+    tentados de novo até PEDIDOS_FILA_MAX_TENTATIVAS.
+    """
+    pedido = entrada.pedido
+    agora = timezone.now()
+    entrada.tentativas += 1
+    try:
+        with transaction.atomic():
+            itens, empresa_id = reservar_itens(pedido.usuario, entrada.itens)
+            if empresa_id != pedido.empresa_id:
+                raise serializers.ValidationError("Todos os produtos do pedido devem ser da mesma empresa.")
+            gravar_itens(pedido, itens)
+            pedido.valor_total = sum(item.subtotal() for item in itens)
+            pedido.status = "processando"
+            pedido.save(update_fields=["valor_total", "status", "updated_at"])
+        entrada.status = "concluido"
+        entrada.erro = ""
+    except serializers.ValidationError as e:
+        entrada.status = "falhou"
+        entrada.erro = _mensagem_erro(e)
+        pedido.status = "cancelado"
+        pedido.save(update_fields=["status", "updated_at"])
+    except Exception as e:
+        entrada.erro = repr(e)
+        if entrada.tentativas >= settings.PEDIDOS_FILA_MAX_TENTATIVAS:
+            entrada.status = "falhou"
+            pedido.status = "cancelado"
+            pedido.save(update_fields=["status", "updated_at"])
+    entrada.processado_em = agora
+    entrada.save(update_fields=["status", "erro", "tentativas", "processado_em"])
+
+
+def processar_lote_fila(lote=20):
+    """
+    Processa até `lote` entradas aguardando, cada uma na sua própria transação:
+    a entrada é reivindicada com FOR UPDATE SKIP LOCKED (vários workers podem
+    rodar em paralelo sem pegar a mesma) e as travas de estoque que ela pega
+    duram só até o commit dela. Assim um worker não segura os produtos do
+    outro pelo lote inteiro, nem dois workers se travam pegando produtos em
+    ordens cruzadas. Se o worker morrer no meio, só a entrada em andamento é
+    desfeita e volta a ficar disponível. Retorna quantas foram processadas.
+    """
+    vistas = []
+    while len(vistas) < lote:
+        with transaction.atomic():
+            entrada = (
+                FilaPedido.objects.select_for_update(skip_locked=True, of=("self",))
+                .filter(status="aguardando")
+                .exclude(pk__in=vistas)  # a que falhou e será tentada de novo fica para o próximo lote
+                .select_related("pedido__usuario")
+                .order_by("id")
+                .first()
+            )
+            if entrada is None:
+                break
+            processar_entrada_fila(entrada)
+        vistas.append(entrada.pk)
+    return len(vistas)
+
+
+@transaction.atomic
+def transicionar_status(empresa, ids, destino, usuario=None):
+    """
+    Move em lote os pedidos `ids` da empresa para `destino`, respeitando
+    Pedido.TRANSICOES. É um único UPDATE: só as linhas cujo status atual é uma
+    origem permitida são alteradas, e o RETURNING devolve o status anterior de
+    cada uma. Os pedidos que entram ou saem das vendas são levados para a
+    VendaDiaria na mesma transação. Retorna uma lista de (id, status_anterior)
+    das linhas movidas.
+    """
+    origens = Pedido.TRANSICOES.get(destino)
+    if not origens:
+        raise serializers.ValidationError(f"Status de destino inválido: {destino}.")
+
+    tabela = connection.ops.quote_name(Pedido._meta.db_table)
+    sql = f"""
+        WITH alvo AS (
+            SELECT id, status FROM {tabela}
+            WHERE empresa_id = %s AND id = ANY(%s) AND status = ANY(%s)
+            FOR UPDATE
+        )
+        UPDATE {tabela} AS p
+        SET status = %s, updated_at = %s, updated_by_id = %s
+        FROM alvo
+        WHERE p.id = alvo.id
+        RETURNING p.id, alvo.status
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            empresa.pk, list(ids), origens,
+            destino, timezone.now(), getattr(usuario, "pk", None),
+        ])
+        movidos = cursor.fetchall()
+
+    e_venda = destino in VendaDiaria.STATUS_VENDA
+    mudaram = [pk for pk, anterior in movidos if (anterior in VendaDiaria.STATUS_VENDA) != e_venda]
+    VendaDiaria.registrar_pedidos(mudaram, 1 if e_venda else -1)
+    # o UPDATE em SQL não dispara os signals que invalidam o cache dos dashboards
+    if movidos:
+        dashboard_cache.invalidar(empresa.pk)
+    return movidos
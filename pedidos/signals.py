@@ -0,0 +1,45 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+from produtos.models import Produto
+from users.models import Empresa
+from .models import Pedido, ItemPedido, VendaDiaria
+
+
+def _removido_por(origin, modelo):
+    return isinstance(origin, modelo) or (isinstance(origin, QuerySet) and origin.model is modelo)
+
+
+@receiver(post_delete, sender=ItemPedido)
+def descontar_item_removido(sender, instance, origin=None, **kwargs):
+    """
+    Tira o subtotal do item removido do valor_total do pedido. Só quando a
+    remoção começou pelo item ou pelo produto (o pedido continua existindo);
+    quando vem do produto, as vendas do produto saem junto com ele. Em cascades
+    de pedido, usuário ou empresa o pedido inteiro sai da VendaDiaria no
+    pre_delete dele, e refazer o delta aqui regravaria as vendas diárias de uma
+    empresa que pode estar sendo apagada.
+    """
+    if origin is not None and not (_removido_por(origin, ItemPedido) or _removido_por(origin, Produto)):
+        return
+    pedido_id, subtotal, quantidade, produto_id = getattr(
+        instance, "_total_aplicado",
+        (instance.pedido_id, instance.subtotal(), instance.quantidade, instance.produto_id),
+    )
+    if _removido_por(origin, Produto):
+        produto_id = None
+    Pedido.somar_ao_total(pedido_id, -subtotal, -quantidade, produto_id)
+
+
+@receiver(pre_delete, sender=Pedido)
+def descontar_venda_removida(sender, instance, origin=None, **kwargs):
+    """
+    Pedido pago/concluido apagado sai da VendaDiaria, venha a remoção de onde
+    vier (do pedido ou do cascade do comprador). Roda antes do delete porque os
+    itens (as unidades) ainda precisam estar lá. Quando é a empresa que está
+    sendo apagada não há o que ajustar: as vendas diárias dela saem junto.
+    """
+    status = getattr(instance, "_status_gravado", instance.status)
+    if _removido_por(origin, Empresa) or status not in VendaDiaria.STATUS_VENDA:
+        return
+    VendaDiaria.registrar_pedidos([instance.pk], -1)
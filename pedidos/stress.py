@@ -0,0 +1,60 @@
+import threading
+import time
+from django.db import connection
+from django.db.models import Sum
+from rest_framework import serializers
+from produtos.models import Produto
+from .models import ItemPedido
+from .services import criar_pedido
+
+
+def disparar_pedidos_concorrentes(produto, usuario, total_pedidos, threads=8, quantidade=1):
+    """
+    Dispara `total_pedidos` checkouts concorrentes contra um único produto,
+    distribuídos entre `threads` threads (cada uma com sua própria conexão).
+
+    Retorna um dict com os pedidos aceitos/recusados, o tempo total, a vazão
+    (pedidos por segundo) e o estoque final lido do banco, para provar que não
+    houve venda acima do estoque.
+    """
+    restantes = [total_pedidos]
+    resultado = {"aceitos": 0, "recusados": 0, "erros": []}
+    trava = threading.Lock()
+    itens_data = [{"produto_id": produto.id, "quantidade": quantidade}]
+
+    def trabalhador():
+        try:
+            while True:
+                with trava:
+                    if restantes[0] == 0:
+                        return
+                    restantes[0] -= 1
+                try:
+                    criar_pedido(usuario=usuario, itens_data=itens_data)
+                    chave = "aceitos"
+                except serializers.ValidationError:
+                    chave = "recusados"
+                except Exception as e:
+                    with trava:
+                        resultado["erros"].append(repr(e))
+                    continue
+                with trava:
+                    resultado[chave] += 1
+        finally:
+            connection.close()
+
+    inicio = time.perf_counter()
+    workers = [threading.Thread(target=trabalhador) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    segundos = time.perf_counter() - inicio
+
+    resultado["segundos"] = round(segundos, 3)
+    resultado["pedidos_por_segundo"] = round(total_pedidos / segundos, 1) if segundos else None
+    resultado["estoque_final"] = Produto.objects.get(pk=produto.pk).quantidade
+    resultado["unidades_vendidas"] = ItemPedido.objects.filter(produto=produto).aggregate(
+        total=Sum("quantidade")
+    )["total"] or 0
+    return resultado
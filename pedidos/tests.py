@@ -1,3 +1,827 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import Sum
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+from django.test import TransactionTestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
+from produtos.models import Produto, ProdutoVendaDiaria
+from users.models import Empresa, CategoriaChoices
+from .janelas import no_periodo
+from .models import Pedido, ItemPedido, ReconstrucaoEmpresa, VendaDiaria
+from . import services
+from .services import criar_pedido, processar_lote_fila, transicionar_status
+from .stress import disparar_pedidos_concorrentes
 
-# Create your tests here.
+User = get_user_model()
+
+
+class PedidoTestMixin:
+    """Cria uma empresa, um comprador e produtos para os testes de pedido."""
+
+    def criar_empresa(self, email="empresa@teste.com"):
+        dono = User.objects.create_user(email=email, password="123", name="Empresa Teste", usertype=2)
+        return Empresa.objects.create(user=dono, categoria=CategoriaChoices.ALIMENTACAO)
+
+    def criar_produto(self, empresa, nome="Produto", preco="10.00", quantidade=100):
+        return Produto.objects.create(
+            empresa=empresa,
+            created_by=empresa.user,
+            updated_by=empresa.user,
+            nome=nome,
+            descricao="Descrição",
+            preco=Decimal(preco),
+            quantidade=quantidade,
+            imagem="produtos/teste.jpg",
+        )
+
+
+class CheckoutEmLoteTest(PedidoTestMixin, APITestCase):
+    def setUp(self):
+        self.empresa = self.criar_empresa()
+        self.comprador = User.objects.create_user(email="comprador@teste.com", password="123", name="Comprador")
+        self.produtos = [
+            self.criar_produto(self.empresa, nome=f"Produto {i}", preco="2.50", quantidade=10)
+            for i in range(30)
+        ]
+        self.url = reverse("pedidos-list")
+
+    def test_checkout_cria_itens_baixa_estoque_e_calcula_total(self):
+        self.client.force_authenticate(user=self.comprador)
+        data = {
+            "descricao": "Entrega rápida",
+            "itens": [
+                {"produto_id": self.produtos[0].id, "quantidade": 2},
+                {"produto_id": self.produtos[1].id, "quantidade": 4},
+            ],
+        }
+
+        response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        pedido = Pedido.objects.get(id=response.data["id"])
+        self.assertEqual(pedido.empresa, self.empresa)
+        self.assertEqual(pedido.valor_total, Decimal("15.00"))
+        self.assertEqual(pedido.itens.count(), 2)
+        self.produtos[0].refresh_from_db()
+        self.produtos[1].refresh_from_db()
+        self.assertEqual(self.produtos[0].quantidade, 8)
+        self.assertEqual(self.produtos[1].quantidade, 6)
+
+    def test_estoque_insuficiente_desfaz_pedido_inteiro(self):
+        itens = [
+            {"produto_id": self.produtos[0].id, "quantidade": 5},
+            {"produto_id": self.produtos[1].id, "quantidade": 11},
+        ]
+
+        self.client.force_authenticate(user=self.comprador)
+        response = self.client.post(self.url, {"itens": itens}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Produto 1", str(response.data))
+        self.assertFalse(Pedido.objects.exists())
+        self.assertFalse(ItemPedido.objects.exists())
+        self.produtos[0].refresh_from_db()
+        self.assertEqual(self.produtos[0].quantidade, 10)
+
+    def test_produtos_de_empresas_diferentes(self):
+        outra_empresa = self.criar_empresa(email="outra@teste.com")
+        outro_produto = self.criar_produto(outra_empresa)
+        itens = [
+            {"produto_id": self.produtos[0].id, "quantidade": 1},
+            {"produto_id": outro_produto.id, "quantidade": 1},
+        ]
+
+        self.client.force_authenticate(user=self.comprador)
+        response = self.client.post(self.url, {"itens": itens}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Pedido.objects.exists())
+
+    def test_numero_de_queries_nao_cresce_com_o_carrinho(self):
+        carrinho_pequeno = [{"produto_id": self.produtos[0].id, "quantidade": 1}]
+        carrinho_grande = [{"produto_id": p.id, "quantidade": 1} for p in self.produtos]
+
+        # SELECT FOR UPDATE, UPDATE do estoque, INSERT do pedido, contador da empresa,
+        # INSERT dos itens + SAVEPOINT/RELEASE
+        with self.assertNumQueries(9):
+            criar_pedido(usuario=self.comprador, itens_data=carrinho_pequeno)
+        with self.assertNumQueries(9):
+            pedido = criar_pedido(usuario=self.comprador, itens_data=carrinho_grande)
+
+        self.assertEqual(pedido.itens.count(), 30)
+        self.assertEqual(pedido.valor_total, Decimal("75.00"))
+
+
+class ReservaEstoqueConcorrenteTest(PedidoTestMixin, TransactionTestCase):
+    def test_pedidos_concorrentes_nao_vendem_acima_do_estoque(self):
+        """Dispara mais pedidos do que o estoque em várias threads: nenhum pode sobrar."""
+        empresa = self.criar_empresa()
+        comprador = User.objects.create_user(email="comprador@teste.com", password="123", name="Comprador")
+        produto = self.criar_produto(empresa, quantidade=20)
+
+        resultado = disparar_pedidos_concorrentes(produto, comprador, total_pedidos=60, threads=8)
+
+        self.assertEqual(resultado["erros"], [])
+        self.assertEqual(resultado["aceitos"], 20)
+        self.assertEqual(resultado["recusados"], 40)
+        self.assertEqual(resultado["estoque_final"], 0)
+        self.assertEqual(resultado["unidades_vendidas"], 20)
+        self.assertEqual(Pedido.objects.count(), 20)
+
+    def test_comando_falha_com_venda_acima_do_estoque_ou_erro(self):
+        resultado = {
+            "aceitos": 6, "recusados": 0, "segundos": 0.1, "pedidos_por_segundo": 60,
+            "erros": [], "estoque_final": -1, "unidades_vendidas": 6,
+        }
+        with mock.patch("pedidos.management.commands.stress_estoque.disparar_pedidos_concorrentes", return_value=resultado):
+            with self.assertRaisesMessage(CommandError, "1 unidade(s) vendidas acima do estoque"):
+                call_command("stress_estoque", "--estoque", "5", stdout=StringIO(), stderr=StringIO())
+
+            resultado.update(estoque_final=0, unidades_vendidas=5, erros=["OperationalError: deadlock"])
+            with self.assertRaisesMessage(CommandError, "1 pedido(s) falharam"):
+                call_command("stress_estoque", "--estoque", "5", stdout=StringIO(), stderr=StringIO())
+
+            resultado.update(erros=[])
+            call_command("stress_estoque", "--estoque", "5", stdout=StringIO(), stderr=StringIO())
+        self.assertFalse(Produto.objects.exists())  # dados temporários removidos
+
+
+class IntakeAssincronoTest(PedidoTestMixin, APITestCase):
+    def setUp(self):
+        self.empresa = self.criar_empresa()
+        self.comprador = User.objects.create_user(email="comprador@teste.com", password="123", name="Comprador")
+        self.produto = self.criar_produto(self.empresa, preco="4.00", quantidade=5)
+        self.client.force_authenticate(user=self.comprador)
+        self.url = reverse("pedidos-list")
+
+    def enfileirar(self, quantidade):
+        data = {"itens": [{"produto_id": self.produto.id, "quantidade": quantidade}]}
+        return self.client.post(self.url, data, format="json", HTTP_PREFER="respond-async")
+
+    def test_post_assincrono_responde_202_sem_tocar_no_estoque(self):
+        response = self.enfileirar(2)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], "pendente")
+        self.assertEqual(response.data["fila_status"], "aguardando")
+        self.assertFalse(ItemPedido.objects.exists())
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.quantidade, 5)
+
+    def test_worker_processa_fila_e_cliente_acompanha(self):
+        aceito = self.enfileirar(2).data["id"]
+        recusado = self.enfileirar(4).data["id"]
+
+        self.assertEqual(processar_lote_fila(lote=10), 2)
+
+        situacao = self.client.get(reverse("pedidos-situacao", args=[aceito]))
+        self.assertEqual(situacao.data["status"], "processando")
+        self.assertEqual(situacao.data["fila_status"], "concluido")
+        self.assertEqual(Pedido.objects.get(id=aceito).valor_total, Decimal("8.00"))
+
+        situacao = self.client.get(reverse("pedidos-situacao", args=[recusado]))
+        self.assertEqual(situacao.data["status"], "cancelado")
+        self.assertEqual(situacao.data["fila_status"], "falhou")
+        self.assertIn("Estoque insuficiente", situacao.data["fila_erro"])
+
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.quantidade, 3)
+        self.assertEqual(processar_lote_fila(lote=10), 0)
+
+
+    def test_erro_inesperado_nao_desfaz_as_outras_entradas(self):
+        com_erro = self.enfileirar(1).data["id"]
+        aceito = self.enfileirar(2).data["id"]
+
+        reservar = services.reservar_itens
+        chamadas = []
+
+        def falhar_na_primeira(*args, **kwargs):
+            chamadas.append(1)
+            if len(chamadas) == 1:
+                raise RuntimeError("conexão caiu")
+            return reservar(*args, **kwargs)
+
+        with mock.patch("pedidos.services.reservar_itens", side_effect=falhar_na_primeira):
+            self.assertEqual(processar_lote_fila(lote=10), 2)
+
+        # a entrada com erro fica para o próximo lote, sem gastar as tentativas agora
+        fila = Pedido.objects.get(id=com_erro).fila
+        self.assertEqual((fila.status, fila.tentativas), ("aguardando", 1))
+        self.assertEqual(Pedido.objects.get(id=aceito).status, "processando")
+
+        self.assertEqual(processar_lote_fila(lote=10), 1)
+        self.assertEqual(Pedido.objects.get(id=com_erro).status, "processando")
+
+
+class PedidoListagemTest(PedidoTestMixin, APITestCase):
+    def setUp(self):
+        self.empresa = self.criar_empresa()
+        self.comprador = User.objects.create_user(email="comprador@teste.com", password="123", name="Comprador")
+        self.produtos = [self.criar_produto(self.empresa, nome=f"Produto {i}") for i in range(3)]
+        self.client.force_authenticate(user=User.objects.get(pk=self.empresa.user.pk))
+        self.url = reverse("pedidos-list")
+
+    def criar_pedidos(self, total):
+        itens = [{"produto_id": p.id, "quantidade": 1} for p in self.produtos]
+        return [criar_pedido(usuario=self.comprador, itens_data=itens) for _ in range(total)]
+
+    def test_numero_de_queries_constante(self):
+        self.criar_pedidos(2)
+        self.client.force_authenticate(user=User.objects.get(pk=self.empresa.user.pk))
+        with self.assertNumQueries(3):  # empresa, pedidos + comprador, itens + produtos
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data["results"]), 2)
+
+        self.criar_pedidos(20)
+        self.client.force_authenticate(user=User.objects.get(pk=self.empresa.user.pk))
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data["results"]), 22)
+        self.assertEqual(response.data["results"][0]["comprador"], "Comprador")
+        self.assertEqual(len(response.data["results"][0]["itens"]), 3)
+
+    def test_cursor_percorre_todos_os_pedidos_sem_repetir(self):
+        pedidos = self.criar_pedidos(7)
+        # empates em created_at são desempatados pelo id
+        Pedido.objects.filter(id__in=[p.id for p in pedidos[2:5]]).update(created_at=pedidos[2].created_at)
+
+        vistos = []
+        url = f"{self.url}?page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            vistos += [pedido["id"] for pedido in response.data["results"]]
+            url = response.data["next"]
+
+        esperado = list(Pedido.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(vistos, esperado)
+
+    def test_cursor_invalido(self):
+        response = self.client.get(f"{self.url}?cursor=nao-e-um-cursor")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FeedAlteracoesTest(PedidoTestMixin, APITransactionTestCase):
+    """Transacional: o feed só enxerga pedidos de transações que já terminaram."""
+
+    def setUp(self):
+        self.empresa = self.criar_empresa()
+        comprador = User.objects.create_user(email="comprador@teste.com", password="123", name="Comprador")
+        produto = self.criar_produto(self.empresa)
+        self.itens = [{"produto_id": produto.id, "quantidade": 1}]
+        self.pedidos = [criar_pedido(usuario=comprador, itens_data=self.itens) for _ in range(5)]
+        self.client.force_authenticate(user=User.objects.get(pk=self.empresa.user.pk))
+        self.url = reverse("pedidos-alteracoes")
+
+    def consultar(self, since=None, **params):
+        if since:
+            params["since"] = since
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_so_devolve_o_que_mudou_desde_o_cursor(self):
+        primeira = self.consultar(page_size=3)
+        self.assertTrue(primeira["tem_mais"])
+        segunda = self.consultar(primeira["since"], page_size=3)
+        self.assertFalse(segunda["tem_mais"])
+        vistos = [p["id"] for p in primeira["results"] + segunda["results"]]
+        self.assertEqual(vistos, [p.id for p in self.pedidos])
+
+        vazia = self.consultar(segunda["since"])
+        self.assertEqual(vazia["results"], [])
+        self.assertEqual(vazia["since"], segunda["since"])
+
+        transicionar_status(self.empresa, [self.pedidos[1].id], "processando")
+        mudou = self.consultar(vazia["since"])
+        self.assertEqual([p["id"] for p in mudou["results"]], [self.pedidos[1].id])
+        self.assertEqual(mudou["results"][0]["status"], "processando")
+        self.assertEqual(len(mudou["results"][0]["itens"]), 1)
+
+    def test_transacao_longa_segura_o_feed_ate_o_commit(self):
+        since = self.consultar()["since"]
+
+        # outra conexão altera um pedido e fica com a transação aberta (um lote lento)
+        lenta = connections.create_connection("default")
+        try:
+            with lenta.cursor() as cursor:
+                cursor.execute("BEGIN")
+                cursor.execute(
+                    "UPDATE pedidos_pedido SET descricao = 'lenta', updated_at = now() WHERE id = %s",
+                    [self.pedidos[0].id],
+                )
+                # alteração posterior, já com commit: não pode passar na frente da lenta
+                transicionar_status(self.empresa, [self.pedidos[3].id], "processando")
+                self.assertEqual(self.consultar(since)["results"], [])
+
+                cursor.execute("COMMIT")
+        finally:
+            lenta.close()
+
+        mudou = self.consultar(since)
+        self.assertEqual([p["id"] for p in mudou["results"]], [self.pedidos[0].id, self.pedidos[3].id])
+        self.assertEqual(self.consultar(mudou["since"])["results"], [])
+
+    def test_cursor_invalido(self):
+        response = self.client.get(self.url, {"since": "nao-e-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ValorTotalIncrementalTest(PedidoTestMixin, APITestCase):
+    def setUp(self):
+        self.empresa = self.criar_empresa()
+        self.comprador = User.objects.create_user(email="comprador@teste.com", password="123", name="Comprador")
+        self.bolo = self.criar_produto(self.empresa, nome="Bolo", preco="10.00")
+        self.torta = self.criar_produto(self.empresa, nome="Torta", preco="7.50")
+        self.pedido = criar_pedido(usuario=self.comprador, itens_data=[{"produto_id": self.bolo.id, "quantidade": 2}])
+
+    def total(self):
+        return Pedido.objects.get(pk=self.pedido.pk).valor_total
+
+    def test_criar_alterar_e_remover_item_aplicam_delta(self):
+        item = ItemPedido.objects.create(pedido=self.pedido, produto=self.torta, quantidade=2)
+        self.assertEqual(self.total(), Decimal("35.00"))
+
+        item = ItemPedido.objects.select_related("pedido", "produto").get(pk=item.pk)
+        item.quantidade = 4
+        with self.assertNumQueries(2):  # UPDATE do item, UPDATE do total
+            item.save()
+        self.assertEqual(self.total(), Decimal("50.00"))
+
+        item.delete()
+        self.assertEqual(self.total(), Decimal("20.00"))
+
+    def test_save_de_instancia_antiga_nao_sobrescreve_total(self):
+        antigo = Pedido.objects.get(pk=self.pedido.pk)
+        ItemPedido.objects.create(pedido=self.pedido, produto=self.torta, quantidade=2)
+
+        antigo.descricao = "Sem glúten"
+        antigo.save()
+
+        self.assertEqual(self.total(), Decimal("35.00"))
+
+    def test_comando_verifica_e_corrige_totais(self):
+        Pedido.objects.filter(pk=self.pedido.pk).update(valor_total=Decimal("1.00"))
+        saida = StringIO()
+
+        call_command("verificar_totais_pedidos", "--lote", "1", stdout=saida)
+        self.assertIn("1 divergente", saida.getvalue())
+        self.assertEqual(self.total(), Decimal("1.00"))
+
+        call_command("verificar_totais_pedidos", "--corrigir", stdout=saida)
+        self.assertEqual(self.total(), Decimal("20.00"))
+
+    def test_correcao_de_pedido_pago_acerta_a_venda_diaria(self):
+        transicionar_status(self.empresa, [self.pedido.pk], "processando")
+        transicionar_status(self.empresa, [self.pedido.pk], "pago")
+        dia = timezone.localdate()
+
+        def venda_do_dia():
+            return VendaDiaria.objects.get(empresa=self.empresa, dia=dia).total
+
+        # total divergente por fora dos deltas: a VendaDiaria ficou com o valor certo
+        Pedido.objects.filter(pk=self.pedido.pk).update(valor_total=Decimal("1.00"))
+        call_command("verificar_totais_pedidos", "--corrigir", stdout=StringIO())
+        self.assertEqual(self.total(), Decimal("20.00"))
+        self.assertEqual(venda_do_dia(), Decimal("20.00"))
+
+        # divergência que a VendaDiaria acompanhou (delta aplicado só no total)
+        Pedido.somar_ao_total(self.pedido.pk, Decimal("5.00"))
+        self.assertEqual(venda_do_dia(), Decimal("25.00"))
+        call_command("verificar_totais_pedidos", "--corrigir", stdout=StringIO())
+        self.assertEqual(self.total(), Decimal("20.00"))
+        self.assertEqual(venda_do_dia(), Decimal("20.00"))
+
+        Pedido.somar_ao_total(self.pedido.pk, Decimal("5.00"))
+        self.pedido.atualizar_total()
+        self.assertEqual(self.pedido.valor_total, Decimal("20.00"))
+        self.assertEqual(venda_do_dia(), Decimal("20.00"))
+
+
+class TransicaoStatusTest(PedidoTestMixin, APITestCase):
+    def setUp(self):
+        self.empresa = self.criar_empresa()
+        self.comprador = User.objects.create_user(email="comprador@teste.com", password="123", name="Comprador")
+        produto = self.criar_produto(self.empresa)
+        itens = [{"produto_id": produto.id, "quantidade": 1}]
+        self.pedidos = [criar_pedido(usuario=self.comprador, itens_data=itens) for _ in range(4)]
+        Pedido.objects.filter(pk=self.pedidos[2].pk).update(status="pago")
+        Pedido.objects.filter(pk=self.pedidos[3].pk).update(status="cancelado")
+        self.client.force_authenticate(user=User.objects.get(pk=self.empresa.user.pk))
+
+    def test_transicao_em_lote_move_so_os_permitidos(self):
+        url = reverse("pedidos-transicionar-status")
+        ids = [p.id for p in self.pedidos] + [999999]
+
+        response = self.client.post(url, {"ids": ids, "status": "processando"}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        movidos = {m["id"]: m["de"] for m in response.data["movidos"]}
+        self.assertEqual(movidos, {self.pedidos[0].id: "pendente", self.pedidos[1].id: "pendente"})
+        self.assertEqual(response.data["ignorados"], sorted([self.pedidos[2].id, self.pedidos[3].id, 999999]))
+        self.assertEqual(Pedido.objects.filter(status="processando").count(), 2)
+
+    def test_cancelamento_aceita_qualquer_origem(self):
+        url = reverse("pedidos-transicionar-status")
+        ids = [p.id for p in self.pedidos]
+
+        response = self.client.post(url, {"ids": ids, "status": "cancelado"}, format="json")
+
+        self.assertEqual(len(response.data["movidos"]), 3)
+        self.assertEqual(Pedido.objects.filter(status="cancelado").count(), 4)
+
+    def test_atualizacao_individual_respeita_transicoes(self):
+        url = reverse("pedidos-atualizar-status-descricao", args=[self.pedidos[0].id])
+
+        response = self.client.patch(url, {"status": "concluido"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.patch(url, {"status": "processando"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class VendaDiariaTest(PedidoTestMixin, APITestCase):
+    def setUp(self):
+        self.empresa = self.criar_empresa()
+        self.comprador = User.objects.create_user(email="comprador@teste.com", password="123", name="Comprador")
+        self.bolo = self.criar_produto(self.empresa, nome="Bolo", preco="10.00")
+        self.torta = self.criar_produto(self.empresa, nome="Torta", preco="5.00")
+        self.hoje = timezone.localdate()
+
+    def vender(self, **quantidades):
+        itens = [{"produto_id": getattr(self, nome).id, "quantidade": q} for nome, q in quantidades.items()]
+        pedido = criar_pedido(usuario=self.comprador, itens_data=itens)
+        transicionar_status(self.empresa, [pedido.id], "processando")
+        transicionar_status(self.empresa, [pedido.id], "pago")
+        return pedido
+
+    def venda_de_hoje(self):
+        venda = VendaDiaria.objects.filter(empresa=self.empresa, dia=self.hoje).first()
+        return venda and (venda.total, venda.pedidos, venda.itens)
+
+    def vendas_dos_produtos(self):
+        """{nome: (unidades, receita)} dos contadores, conferidos com a soma dos dias."""
+        contadores = {
+            p.nome: (p.unidades_vendidas, p.receita_total)
+            for p in Produto.objects.filter(empresa=self.empresa)
+        }
+        for produto in Produto.objects.filter(empresa=self.empresa):
+            dias = produto.vendas_diarias.aggregate(unidades=Sum("unidades"), receita=Sum("receita"))
+            self.assertEqual(
+                (dias["unidades"] or 0, dias["receita"] or Decimal("0")), contadores[produto.nome], produto.nome
+            )
+        return contadores
+
+    def test_entrar_e_sair_das_vendas(self):
+        pedido = self.vender(bolo=2, torta=1)
+        outro = self.vender(torta=3)
+        self.assertEqual(self.venda_de_hoje(), (Decimal("40.00"), 2, 6))
+
+        transicionar_status(self.empresa, [pedido.id], "concluido")  # continua sendo venda
+        self.assertEqual(self.venda_de_hoje(), (Decimal("40.00"), 2, 6))
+
+        transicionar_status(self.empresa, [outro.id], "cancelado")
+        self.assertEqual(self.venda_de_hoje(), (Decimal("25.00"), 1, 3))
+        self.assertEqual(self.vendas_dos_produtos(), {
+            "Bolo": (2, Decimal("20.00")),
+            "Torta": (1, Decimal("5.00")),
+        })
+
+    def test_save_do_pedido_e_itens_de_pedido_pago(self):
+        pedido = criar_pedido(usuario=self.comprador, itens_data=[{"produto_id": self.bolo.id, "quantidade": 1}])
+        pedido = Pedido.objects.get(pk=pedido.pk)
+        pedido.status = "processando"
+        pedido.save()
+        self.assertIsNone(self.venda_de_hoje())
+        pedido.status = "pago"
+        pedido.save()
+        self.assertEqual(self.venda_de_hoje(), (Decimal("10.00"), 1, 1))
+
+        item = ItemPedido.objects.create(pedido=pedido, produto=self.torta, quantidade=2)
+        self.assertEqual(self.venda_de_hoje(), (Decimal("20.00"), 1, 3))
+        item = ItemPedido.objects.select_related("pedido", "produto").get(pk=item.pk)
+        item.quantidade = 1
+        item.save()
+        self.assertEqual(self.venda_de_hoje(), (Decimal("15.00"), 1, 2))
+        self.assertEqual(self.vendas_dos_produtos(), {
+            "Bolo": (1, Decimal("10.00")),
+            "Torta": (1, Decimal("5.00")),
+        })
+
+        # trocar o produto do item move a venda de um produto para o outro
+        item.produto = self.bolo
+        item.save()
+        self.assertEqual(self.vendas_dos_produtos(), {
+            "Bolo": (2, Decimal("15.00")),
+            "Torta": (0, Decimal("0.00")),
+        })
+        item.produto = self.torta
+        item.save()
+        item.delete()
+        self.assertEqual(self.venda_de_hoje(), (Decimal("10.00"), 1, 1))
+
+        Pedido.objects.get(pk=pedido.pk).delete()
+        self.assertEqual(self.venda_de_hoje(), (Decimal("0.00"), 0, 0))
+        self.assertEqual(self.vendas_dos_produtos(), {
+            "Bolo": (0, Decimal("0.00")),
+            "Torta": (0, Decimal("0.00")),
+        })
+
+    def test_apagar_produto_vendido(self):
+        self.vender(bolo=1, torta=2)
+        self.torta.delete()
+        self.assertEqual(self.venda_de_hoje(), (Decimal("10.00"), 1, 1))
+        self.assertEqual(self.vendas_dos_produtos(), {"Bolo": (1, Decimal("10.00"))})
+
+    def test_save_do_produto_nao_sobrescreve_contadores(self):
+        carregado = Produto.objects.get(pk=self.bolo.pk)
+        self.vender(bolo=3)
+
+        carregado.preco = Decimal("12.00")
+        carregado.save()
+        self.client.force_authenticate(user=self.empresa.user)
+        response = self.client.patch(
+            reverse("produtos-detail", args=[self.torta.pk]), {"quantidade": 80}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(Produto.objects.get(pk=self.bolo.pk).preco, Decimal("12.00"))
+        self.assertEqual(self.vendas_dos_produtos(), {
+            "Bolo": (3, Decimal("30.00")),
+            "Torta": (0, Decimal("0.00")),
+        })
+
+    def apagar_com_vendas(self, objeto):
+        self.vender(bolo=1, torta=2)
+        objeto.delete()
+        # as FKs das vendas diárias são conferidas só no commit; força a conferência aqui
+        connection.check_constraints()
+        self.assertFalse(VendaDiaria.objects.exists())
+        self.assertFalse(ProdutoVendaDiaria.objects.exists())
+        self.assertFalse(Pedido.objects.exists())
+
+    def test_apagar_empresa_com_vendas(self):
+        self.apagar_com_vendas(self.empresa)
+
+    def test_apagar_dono_da_empresa_com_vendas(self):
+        self.apagar_com_vendas(self.empresa.user)
+
+    def test_apagar_comprador(self):
+        outro = User.objects.create_user(email="outro@teste.com", password="123", name="Outro")
+        self.vender(bolo=1)
+        pedido = criar_pedido(usuario=outro, itens_data=[{"produto_id": self.torta.id, "quantidade": 2}])
+        transicionar_status(self.empresa, [pedido.id], "processando")
+        transicionar_status(self.empresa, [pedido.id], "pago")
+        self.assertEqual(self.venda_de_hoje(), (Decimal("20.00"), 2, 3))
+
+        outro.delete()
+        connection.check_constraints()
+        self.assertEqual(self.venda_de_hoje(), (Decimal("10.00"), 1, 1))
+        self.assertEqual(self.vendas_dos_produtos(), {
+            "Bolo": (1, Decimal("10.00")),
+            "Torta": (0, Decimal("0.00")),
+        })
+
+        self.comprador.delete()
+        self.assertEqual(self.venda_de_hoje(), (Decimal("0.00"), 0, 0))
+        self.assertEqual(self.vendas_dos_produtos(), {
+            "Bolo": (0, Decimal("0.00")),
+            "Torta": (0, Decimal("0.00")),
+        })
+
+    def test_reconstruir(self):
+        self.vender(bolo=1)
+        ontem = self.vender(torta=2)
+        Pedido.objects.filter(pk=ontem.pk).update(created_at=timezone.now() - timedelta(days=1))
+        VendaDiaria.objects.update(total=0, pedidos=0, itens=0)
+
+        call_command("reconstruir_vendas_diarias", stdout=StringIO())
+
+        vendas = dict(VendaDiaria.objects.values_list("dia", "total"))
+        self.assertEqual(vendas, {
+            self.hoje: Decimal("10.00"),
+            self.hoje - timedelta(days=1): Decimal("10.00"),
+        })
+        self.assertEqual(self.vendas_dos_produtos(), {
+            "Bolo": (1, Decimal("10.00")),
+            "Torta": (2, Decimal("10.00")),
+        })
+        self.assertEqual(
+            ProdutoVendaDiaria.objects.get(produto=self.torta).dia, self.hoje - timedelta(days=1)
+        )
+
+    def test_analytics_mais_vendidos(self):
+        self.vender(bolo=1, torta=3)
+        antigo = self.vender(bolo=5)
+        Pedido.objects.filter(pk=antigo.pk).update(created_at=timezone.now() - timedelta(days=10))
+        VendaDiaria.reconstruir()
+        self.client.force_authenticate(user=User.objects.get(pk=self.empresa.user.pk))
+        url = reverse("produtos-analytics")
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["produto_mais_vendido"], "Bolo")
+        self.assertEqual(
+            [(p["nome"], p["unidades"], p["receita"]) for p in response.data["mais_vendidos"]],
+            [("Bolo", 6, "60.00"), ("Torta", 3, "15.00")],
+        )
+
+        response = self.client.get(url, {"dias": 7, "limite": 1})
+        self.assertEqual(response.data["produto_mais_vendido"], "Torta")
+        self.assertEqual(len(response.data["mais_vendidos"]), 1)
+
+        response = self.client.get(url, {"dias": "0"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+    def test_reconstrucao_retomada_pula_empresas_concluidas(self):
+        outra = self.criar_empresa(email="outra@teste.com")
+        doce = self.criar_produto(outra, nome="Doce", preco="3.00")
+        pedido = criar_pedido(usuario=self.comprador, itens_data=[{"produto_id": doce.id, "quantidade": 2}])
+        transicionar_status(outra, [pedido.id], "processando")
+        transicionar_status(outra, [pedido.id], "pago")
+        self.vender(bolo=1)
+        VendaDiaria.objects.update(total=0, pedidos=0, itens=0)
+        # execução interrompida depois de concluir self.empresa
+        ReconstrucaoEmpresa.objects.create(execucao="teste", empresa=self.empresa)
+
+        saida = StringIO()
+        call_command("reconstruir_vendas_diarias", processos=1, lote=1, execucao="teste", stdout=saida)
+
+        totais = dict(VendaDiaria.objects.values_list("empresa_id", "total"))
+        self.assertEqual(totais, {self.empresa.pk: Decimal("0.00"), outra.pk: Decimal("6.00")})
+        self.assertIn("1/1 empresa(s)", saida.getvalue())
+        self.assertFalse(ReconstrucaoEmpresa.objects.exists())
+
+
+class ReconstrucaoParalelaTest(PedidoTestMixin, TransactionTestCase):
+    def test_processos_reconstroem_todas_as_empresas(self):
+        comprador = User.objects.create_user(email="comprador@teste.com", password="123", name="Comprador")
+        esperado = {}
+        for i in range(4):
+            empresa = self.criar_empresa(email=f"empresa{i}@teste.com")
+            produto = self.criar_produto(empresa, preco="2.00")
+            pedido = criar_pedido(usuario=comprador, itens_data=[{"produto_id": produto.id, "quantidade": i + 1}])
+            transicionar_status(empresa, [pedido.id], "processando")
+            transicionar_status(empresa, [pedido.id], "pago")
+            esperado[empresa.pk] = Decimal(2 * (i + 1))
+        VendaDiaria.objects.all().delete()
+
+        call_command("reconstruir_vendas_diarias", processos=2, lote=1, stdout=StringIO())
+
+        self.assertEqual(dict(VendaDiaria.objects.values_list("empresa_id", "total")), esperado)
+        self.assertEqual(
+            dict(Produto.objects.values_list("empresa_id", "unidades_vendidas")),
+            {empresa_id: int(total / 2) for empresa_id, total in esperado.items()},
+        )
+
+class ExportacaoPedidosTest(PedidoTestMixin, APITestCase):
+    def setUp(self):
+        self.empresa = self.criar_empresa()
+        comprador = User.objects.create_user(email="comprador@teste.com", password="123", name="Comprador")
+        bolo = self.criar_produto(self.empresa, nome="Bolo", preco="10.00")
+        torta = self.criar_produto(self.empresa, nome="Torta", preco="7.50")
+        itens = [{"produto_id": bolo.id, "quantidade": 1}, {"produto_id": torta.id, "quantidade": 2}]
+        self.pedidos = [criar_pedido(usuario=comprador, itens_data=itens) for _ in range(3)]
+        self.client.force_authenticate(user=User.objects.get(pk=self.empresa.user.pk))
+        self.url = reverse("pedidos-export")
+
+    def test_exporta_csv_com_uma_linha_por_item(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        linhas = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(linhas[0].split(",")[:3], ["pedido_id", "criado_em", "status"])
+        self.assertEqual(len(linhas), 1 + 6)
+        self.assertIn("Torta", linhas[2])
+
+    def test_exporta_ndjson(self):
+        response = self.client.get(self.url, {"formato": "ndjson"})
+
+        registros = [json.loads(linha) for linha in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(len(registros), 6)
+        self.assertEqual(registros[0]["pedido_id"], self.pedidos[0].id)
+        self.assertEqual(registros[1]["preco_unitario"], "7.50")
+
+    def test_formato_invalido(self):
+        response = self.client.get(self.url, {"formato": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FiltroPedidosTest(PedidoTestMixin, APITestCase):
+    def setUp(self):
+        self.empresa = self.criar_empresa()
+        ana = User.objects.create_user(email="ana@teste.com", password="123", name="Ana Souza")
+        bruno = User.objects.create_user(email="bruno@exemplo.com", password="123", name="Bruno")
+        produto = self.criar_produto(self.empresa, preco="10.00")
+        self.barato = criar_pedido(usuario=ana, itens_data=[{"produto_id": produto.id, "quantidade": 1}])
+        self.caro = criar_pedido(usuario=bruno, itens_data=[{"produto_id": produto.id, "quantidade": 10}])
+        self.antigo = criar_pedido(usuario=bruno, itens_data=[{"produto_id": produto.id, "quantidade": 2}])
+        Pedido.objects.filter(pk=self.caro.pk).update(status="pago")
+        Pedido.objects.filter(pk=self.antigo.pk).update(created_at=timezone.now() - timedelta(days=10))
+        self.client.force_authenticate(user=User.objects.get(pk=self.empresa.user.pk))
+        self.url = reverse("pedidos-list")
+
+    def ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {pedido["id"] for pedido in response.data["results"]}
+
+    def test_filtros(self):
+        hoje = timezone.localdate().isoformat()
+        self.assertEqual(self.ids(status="pago"), {self.caro.id})
+        self.assertEqual(self.ids(status="pendente,pago"), {self.barato.id, self.caro.id, self.antigo.id})
+        self.assertEqual(self.ids(data_inicio=hoje, data_fim=hoje), {self.barato.id, self.caro.id})
+        self.assertEqual(self.ids(cliente="souza"), {self.barato.id})
+        self.assertEqual(self.ids(cliente="exemplo.com"), {self.caro.id, self.antigo.id})
+        self.assertEqual(self.ids(valor_minimo="20"), {self.caro.id, self.antigo.id})
+        self.assertEqual(self.ids(cliente="bruno", data_inicio=hoje), {self.caro.id})
+
+    def test_parametros_invalidos(self):
+        for params in ({"status": "entregue"}, {"data_inicio": "01/02/2025"}, {"valor_minimo": "muito"}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class PlanoIndicesPedidoTest(APITestCase):
+    """Confere no EXPLAIN que os filtros usam os índices compostos/parciais de Pedido."""
+
+    @classmethod
+    def setUpTestData(cls):
+        donos = User.objects.bulk_create(
+            User(email=f"empresa{i}@teste.com", name=f"Empresa {i}", usertype=2) for i in range(10)
+        )
+        cls.empresas = Empresa.objects.bulk_create(Empresa(user=dono) for dono in donos)
+        comprador = User.objects.create_user(email="comprador@teste.com", password="123", name="Comprador")
+        status_ciclo = [codigo for codigo, _ in Pedido.STATUS_CHOICES]
+        Pedido.objects.bulk_create(
+            (
+                Pedido(
+                    usuario=comprador,
+                    empresa=empresa,
+                    status=status_ciclo[i % len(status_ciclo)],
+                    valor_total=Decimal(i % 200),
+                )
+                for i in range(4000)
+                for empresa in cls.empresas
+            ),
+            batch_size=5000,
+        )
+        tabela = connection.ops.quote_name(Pedido._meta.db_table)
+        with connection.cursor() as cursor:
+            # espalha os pedidos pelo último ano, na ordem em que foram inseridos
+            cursor.execute(
+                f"UPDATE {tabela} SET created_at = now() - "
+                f"((SELECT max(id) FROM {tabela}) - id) * interval '13 minutes'"
+            )
+            cursor.execute(f"ANALYZE {tabela}")
+
+    def test_status_e_periodo_usam_indice_composto(self):
+        inicio = timezone.now() - timedelta(days=30)
+        plano = Pedido.objects.filter(
+            empresa=self.empresas[0], status="pendente", created_at__gte=inicio
+        ).explain()
+        self.assertIn("pedido_empresa_status_idx", plano)
+
+    def test_soma_de_vendas_usa_indice_parcial(self):
+        inicio = timezone.now() - timedelta(days=30)
+        plano = Pedido.objects.filter(
+            empresa=self.empresas[0], status__in=["pago", "concluido"], created_at__gte=inicio
+        ).values("empresa").annotate(total=Sum("valor_total")).values("total").explain()
+        self.assertIn("pedido_vendas_idx", plano)
+        self.assertNotIn("Seq Scan", plano)
+
+    def condicoes_de_indice(self, queryset):
+        plano = queryset.values("empresa").annotate(total=Sum("valor_total")).values("total").explain()
+        return plano, " ".join(linha for linha in plano.splitlines() if "Index Cond" in linha)
+
+    def test_janela_de_vendas_vira_range_no_indice(self):
+        hoje = timezone.localdate()
+        vendas = Pedido.objects.filter(empresa=self.empresas[0], status__in=["pago", "concluido"])
+
+        plano, condicoes = self.condicoes_de_indice(vendas.filter(no_periodo(hoje - timedelta(days=6), hoje)))
+        self.assertIn("pedido_vendas_idx", plano)
+        self.assertIn("created_at >=", condicoes)
+        self.assertIn("created_at <", condicoes)
+
+        # regressão: created_at__date converte o fuso linha a linha e o índice não filtra a data
+        _, condicoes = self.condicoes_de_indice(
+            vendas.filter(created_at__date__range=[hoje - timedelta(days=6), hoje])
+        )
+        self.assertNotIn("created_at", condicoes)
+
+    def test_feed_de_alteracoes_usa_indice(self):
+        plano = Pedido.objects.filter(
+            empresa=self.empresas[0], xid_alteracao__gte=0
+        ).order_by("xid_alteracao", "id")[:51].explain()
+        self.assertIn("pedido_alteracoes_idx", plano)
@@ -1,9 +1,23 @@
-from rest_framework import viewsets, mixins
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from drf_spectacular.utils import extend_schema
-from .models import Pedido
-from .serializers import PedidoSerializer, PedidoUpdateStatusSerializer
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from .models import Pedido, ItemPedido
+from .filtros import PedidoFiltroBackend
+from .pagination import PedidoCursorPagination, PedidoAlteracoesPagination
+from .serializers import (
+    PedidoSerializer,
+    PedidoUpdateStatusSerializer,
+    PedidoSituacaoSerializer,
+    PedidoTransicaoSerializer,
+    PedidoTransicaoResultadoSerializer,
+)
+from .services import transicionar_status
+from .exportacao import linhas_pedidos, exportar_csv, exportar_ndjson
+from idempotencia.decorators import idempotente
 
 class PedidoViewSet(mixins.CreateModelMixin,
                    mixins.RetrieveModelMixin,
@@ -11,12 +25,67 @@ class PedidoViewSet(mixins.CreateModelMixin,
                    viewsets.GenericViewSet):
     queryset = Pedido.objects.all()
     serializer_class = PedidoSerializer
+    pagination_class = PedidoCursorPagination
+    filter_backends = [PedidoFiltroBackend]
 
     def get_queryset(self):
         usuario = self.request.user
-        empresa = usuario.empresa
-        a = Pedido.objects.filter(empresa=empresa)
-        return a
+        if self.action == 'situacao':
+            # o comprador acompanha os próprios pedidos
+            return Pedido.objects.filter(usuario=usuario).select_related('fila')
+        if not hasattr(usuario, 'empresa'):
+            return Pedido.objects.none()
+
+        # Tudo o que o PedidoSerializer lê (comprador, itens, produto e o envelope
+        # do produto) vem em 3 queries, qualquer que seja o número de pedidos.
+        itens = ItemPedido.objects.select_related(
+            'produto__created_by', 'produto__updated_by'
+        ).order_by('id')
+        return Pedido.objects.filter(empresa=usuario.empresa).select_related('usuario').prefetch_related(
+            Prefetch('itens', queryset=itens)
+        )
+
+    def intake_assincrono(self, request):
+        if settings.PEDIDOS_INTAKE_ASSINCRONO:
+            return True
+        return 'respond-async' in request.headers.get('Prefer', '')
+
+    @extend_schema(
+        responses={201: PedidoSerializer, 202: PedidoSituacaoSerializer},
+        description=(
+            "Cria um pedido. Com o header \"Prefer: respond-async\" o pedido é só "
+            "enfileirado e a resposta é 202; acompanhe por /pedidos/{id}/situacao/."
+        ),
+    )
+    @idempotente("pedidos.create")
+    def create(self, request, *args, **kwargs):
+        if not self.intake_assincrono(request):
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        pedido = serializer.enfileirar()
+        return Response(PedidoSituacaoSerializer(pedido).data, status=status.HTTP_202_ACCEPTED)
+
+    @extend_schema(
+        responses={200: PedidoSituacaoSerializer},
+        description="Situação de um pedido do usuário autenticado (útil para pedidos enfileirados).",
+    )
+    @action(detail=True, methods=['get'])
+    def situacao(self, request, pk=None):
+        pedido = self.get_object()
+        return Response(PedidoSituacaoSerializer(pedido).data)
+
+    @extend_schema(
+        description=(
+            "Feed de alterações dos pedidos da empresa: devolve só os pedidos (com itens) "
+            "criados ou alterados depois do cursor \"since\". Guarde o \"since\" da resposta "
+            "e envie na próxima consulta; enquanto \"tem_mais\" for true, consulte de novo."
+        ),
+    )
+    @action(detail=False, methods=['get'], pagination_class=PedidoAlteracoesPagination, filter_backends=[])
+    def alteracoes(self, request):
+        return self.list(request)
 
     @extend_schema(
         request=PedidoUpdateStatusSerializer,
@@ -31,3 +100,53 @@ class PedidoViewSet(mixins.CreateModelMixin,
             serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=400)
+
+    @extend_schema(
+        request=PedidoTransicaoSerializer,
+        responses={200: PedidoTransicaoResultadoSerializer},
+        description=(
+            "Move vários pedidos para um status de uma vez. Transições permitidas: "
+            "pendente → processando → pago → concluido, e qualquer uma → cancelado. "
+            "Pedidos que não estão num status de origem válido são ignorados."
+        ),
+    )
+    @action(detail=False, methods=['post'], url_path='transicionar-status', url_name='transicionar-status')
+    def transicionar_status_em_lote(self, request):
+        serializer = PedidoTransicaoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if not hasattr(request.user, 'empresa'):
+            return Response({"error": "Empresa não encontrada."}, status=404)
+
+        destino = serializer.validated_data['status']
+        ids = set(serializer.validated_data['ids'])
+        movidos = transicionar_status(request.user.empresa, ids, destino, usuario=request.user)
+
+        resultado = {
+            "movidos": [{"id": pk, "de": anterior, "para": destino} for pk, anterior in movidos],
+            "ignorados": sorted(ids - {pk for pk, _ in movidos}),
+        }
+        return Response(PedidoTransicaoResultadoSerializer(resultado).data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('formato', str, enum=['csv', 'ndjson'], description="Formato do arquivo (padrão: csv)."),
+        ],
+        responses={(200, 'text/csv'): str, (200, 'application/x-ndjson'): str},
+        description="Exporta todo o histórico de pedidos e itens da empresa, em streaming.",
+    )
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        if not hasattr(request.user, 'empresa'):
+            return Response({"error": "Empresa não encontrada."}, status=404)
+
+        formato = request.query_params.get('formato', 'csv')
+        linhas = linhas_pedidos(request.user.empresa)
+        if formato == 'csv':
+            response = StreamingHttpResponse(exportar_csv(linhas), content_type='text/csv; charset=utf-8')
+        elif formato == 'ndjson':
+            response = StreamingHttpResponse(exportar_ndjson(linhas), content_type='application/x-ndjson')
+        else:
+            return Response({"formato": "Use csv ou ndjson."}, status=400)
+
+        response['Content-Disposition'] = f'attachment; filename="pedidos.{formato}"'
+        return response
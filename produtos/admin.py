@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Produto
+from .models import Produto, ProdutoVendaDiaria
 
 @admin.register(Produto)
 class ProdutoAdmin(admin.ModelAdmin):
@@ -52,3 +52,11 @@ class ProdutoAdmin(admin.ModelAdmin):
             obj.created_by = request.user
         obj.updated_by = request.user
         super().save_model(request, obj, form, change)
+
+
+@admin.register(ProdutoVendaDiaria)
+class ProdutoVendaDiariaAdmin(admin.ModelAdmin):
+    list_display = ("produto", "empresa", "dia", "unidades", "receita")
+    list_filter = ("dia",)
+    search_fields = ("produto__nome",)
+    readonly_fields = ("produto", "empresa", "dia", "unidades", "receita")
@@ -0,0 +1,56 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, When, Value, F, PositiveIntegerField
+from .models import Produto
+
+
+class EstoqueInsuficiente(ValidationError):
+    """Levantada quando algum produto não tem quantidade suficiente para a reserva."""
+
+
+@transaction.atomic
+def reservar_estoque(quantidades):
+    """
+    Reserva (baixa) o estoque de vários produtos de forma segura para concorrência.
+
+    `quantidades` é um dict {produto_id: quantidade}. As linhas são travadas com
+    SELECT ... FOR UPDATE sempre na mesma ordem (por id), o que evita deadlock entre
+    checkouts que disputam os mesmos produtos. A verificação acontece com os valores
+    travados, antes de qualquer escrita, e a baixa é um único UPDATE condicional.
+
+    Deve ser chamada dentro da transação do pedido: se algo falhar depois, a
+    reserva é desfeita junto. Retorna os produtos travados, indexados por id.
+    """
+    produtos = {
+        produto.pk: produto
+        for produto in Produto.objects.select_for_update().filter(pk__in=quantidades.keys()).order_by("pk")
+    }
+
+    sem_estoque = [
+        produto.nome
+        for produto_id, produto in produtos.items()
+        if produto.quantidade < quantidades[produto_id]
+    ]
+    if sem_estoque:
+        raise EstoqueInsuficiente(f"Estoque insuficiente para o produto {', '.join(sem_estoque)}.")
+
+    if not produtos:
+        return produtos
+
+    reserva_por_produto = Case(
+        *[When(pk=produto_id, then=Value(quantidades[produto_id])) for produto_id in produtos],
+        output_field=PositiveIntegerField(),
+    )
+    atualizados = Produto.objects.filter(
+        pk__in=produtos.keys(),
+        quantidade__gte=reserva_por_produto,
+    ).update(quantidade=F("quantidade") - reserva_por_produto)
+
+    # Com as linhas travadas isso não deveria acontecer; se acontecer, nada é gravado.
+    if atualizados != len(produtos):
+        raise EstoqueInsuficiente("Estoque insuficiente para um ou mais produtos.")
+
+    for produto_id, produto in produtos.items():
+        produto.quantidade -= quantidades[produto_id]
+
+    return produtos
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produtos', '0002_produto_empresa'),
+        ('users', '0004_alter_empresa_meta'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProdutoVendaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('unidades', models.IntegerField(default=0)),
+                ('receita', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Venda diária de produto',
+                'verbose_name_plural': 'Vendas diárias de produtos',
+            },
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='receita_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='unidades_vendidas',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['empresa', '-unidades_vendidas', 'id'], name='produto_mais_vendidos_idx'),
+        ),
+        migrations.AddField(
+            model_name='produtovendadiaria',
+            name='empresa',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.empresa'),
+        ),
+        migrations.AddField(
+            model_name='produtovendadiaria',
+            name='produto',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='vendas_diarias', to='produtos.produto'),
+        ),
+        migrations.AddIndex(
+            model_name='produtovendadiaria',
+            index=models.Index(fields=['empresa', 'dia'], include=('produto', 'unidades', 'receita'), name='produto_venda_empresa_dia_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='produtovendadiaria',
+            constraint=models.UniqueConstraint(fields=('produto', 'dia'), name='produto_venda_diaria_uniq'),
+        ),
+    ]
@@ -9,6 +9,58 @@ class Produto(BaseModel):
     preco = models.DecimalField(max_digits=10, decimal_places=2)
     quantidade = models.PositiveIntegerField()
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="produtos")
+    # vendas de todos os tempos (pedidos pago/concluido), mantidas por deltas
+    # junto com a ProdutoVendaDiaria (ver pedidos.models.VendaDiaria)
+    unidades_vendidas = models.IntegerField(default=0)
+    receita_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    CONTADORES = ("unidades_vendidas", "receita_total")
+
+    class Meta:
+        indexes = [
+            # ranking de mais vendidos da empresa
+            models.Index(fields=["empresa", "-unidades_vendidas", "id"], name="produto_mais_vendidos_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # os contadores de vendas só mudam por deltas no banco; o save de uma
+        # instância carregada antes (serializer, admin) não pode gravar por cima deles
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CONTADORES
+            ]
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.nome
+
+
+class ProdutoVendaDiaria(models.Model):
+    """
+    Unidades e receita de um produto por dia (mesmo dia da VendaDiaria: data de
+    criação do pedido no fuso do projeto). Serve as janelas móveis (últimos 7,
+    30 dias...) e os rankings por período sem agrupar os itens dos pedidos.
+    """
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name="vendas_diarias", db_index=False)
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="+", db_index=False)
+    dia = models.DateField()
+    unidades = models.IntegerField(default=0)
+    receita = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Venda diária de produto"
+        verbose_name_plural = "Vendas diárias de produtos"
+        constraints = [
+            models.UniqueConstraint(fields=["produto", "dia"], name="produto_venda_diaria_uniq"),
+        ]
+        indexes = [
+            # ranking por período: varre só os dias da janela da empresa
+            models.Index(
+                fields=["empresa", "dia"], include=["produto", "unidades", "receita"],
+                name="produto_venda_empresa_dia_idx",
+            ),
+        ]
 
     def __str__(self):
-        return self.nome
\ No newline at end of file
+        return f"{self.produto_id} {self.dia}: {self.unidades}"
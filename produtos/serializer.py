@@ -44,8 +44,16 @@ class ProdutoMinimalSerializer(serializers.ModelSerializer):
 
 
 
+class ProdutoMaisVendidoSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    nome = serializers.CharField()
+    unidades = serializers.IntegerField()
+    receita = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
 class ProdutoAnalyticsSerializer(serializers.Serializer):
     total_produtos = serializers.IntegerField()
     estoque_baixo = serializers.IntegerField()
     produto_mais_vendido = serializers.CharField(allow_null=True, allow_blank=True, required=False)
+    mais_vendidos = ProdutoMaisVendidoSerializer(many=True)
 
@@ -0,0 +1,42 @@
+"""
+Leitura das vendas por produto. Os números são mantidos por deltas junto com a
+VendaDiaria (ver pedidos.models): os contadores do Produto têm o acumulado e a
+ProdutoVendaDiaria tem um registro por produto e dia com venda.
+"""
+from django.db.models import Sum
+from .models import Produto, ProdutoVendaDiaria
+
+
+def mais_vendidos(empresa, limite=5, inicio=None, fim=None):
+    """
+    Produtos da empresa com mais unidades vendidas, do maior para o menor.
+    Sem período, lê os contadores do Produto (índice produto_mais_vendidos_idx);
+    com `inicio`/`fim` (datas inclusivas), soma os dias da ProdutoVendaDiaria.
+    Retorna [{"id", "nome", "unidades", "receita"}], só com produtos que venderam.
+    """
+    if inicio is None and fim is None:
+        produtos = (
+            Produto.objects.filter(empresa=empresa, unidades_vendidas__gt=0)
+            .order_by("-unidades_vendidas", "id")
+            .values("id", "nome", "unidades_vendidas", "receita_total")[:limite]
+        )
+        return [
+            {"id": p["id"], "nome": p["nome"], "unidades": p["unidades_vendidas"], "receita": p["receita_total"]}
+            for p in produtos
+        ]
+
+    dias = ProdutoVendaDiaria.objects.filter(empresa=empresa)
+    if inicio is not None:
+        dias = dias.filter(dia__gte=inicio)
+    if fim is not None:
+        dias = dias.filter(dia__lte=fim)
+    produtos = (
+        dias.values("produto_id", "produto__nome")
+        .annotate(vendidas=Sum("unidades"), faturado=Sum("receita"))
+        .filter(vendidas__gt=0)
+        .order_by("-vendidas", "produto_id")[:limite]
+    )
+    return [
+        {"id": p["produto_id"], "nome": p["produto__nome"], "unidades": p["vendidas"], "receita": p["faturado"]}
+        for p in produtos
+    ]
@@ -1,4 +1,9 @@
+from datetime import timedelta
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import viewsets, permissions
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from .models import Produto
 from .serializer import (
@@ -7,8 +12,12 @@ from .serializer import (
     ProdutoAnalyticsSerializer,
     ProdutoMinimalSerializer
 )
+from .vendas import mais_vendidos
 from rest_framework.decorators import action
 
+# maior ranking aceito em ?limite=
+MAX_MAIS_VENDIDOS = 50
+
 class ProdutoViewSet(viewsets.ModelViewSet):
     queryset = Produto.objects.all()
     permission_classes = [permissions.IsAuthenticated]
@@ -39,24 +48,46 @@ class ProdutoViewSet(viewsets.ModelViewSet):
         serializer = ProdutoSerializer(queryset, many=True, context={'request': request})
         return Response(serializer.data)
     
+    @extend_schema(
+        parameters=[
+            OpenApiParameter("dias", OpenApiTypes.INT, description="Ranking só dos últimos N dias (padrão: desde sempre)."),
+            OpenApiParameter("limite", OpenApiTypes.INT, description=f"Tamanho do ranking (máx. {MAX_MAIS_VENDIDOS})."),
+        ],
+        responses=ProdutoAnalyticsSerializer,
+    )
     @action(detail=False, methods=['get'], url_path='analytics')
     def analytics(self, request):
         user = request.user
 
         produtos = Produto.objects.none()
+        ranking = []
         if hasattr(user, 'empresa'):
             produtos = Produto.objects.filter(empresa=user.empresa)
+            dias = _inteiro_positivo(request.query_params, "dias")
+            limite = min(_inteiro_positivo(request.query_params, "limite") or 5, MAX_MAIS_VENDIDOS)
+            inicio = timezone.localdate() - timedelta(days=dias - 1) if dias else None
+            ranking = mais_vendidos(user.empresa, limite, inicio=inicio)
 
         estoque_baixo_qs = produtos.filter(quantidade__lt=5)
-        estoque_baixo = ProdutoMinimalSerializer(estoque_baixo_qs, many=True).data
-
-        produto_mais_vendido = None
 
         payload = {
             "total_produtos": produtos.count(),
             "estoque_baixo": estoque_baixo_qs.count(),
-            "produto_mais_vendido": None,
+            "produto_mais_vendido": ranking[0]["nome"] if ranking else None,
+            "mais_vendidos": ranking,
         }
 
         serializer = ProdutoAnalyticsSerializer(payload)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+def _inteiro_positivo(params, nome):
+    if not params.get(nome):
+        return None
+    try:
+        valor = int(params[nome])
+    except ValueError:
+        valor = 0
+    if valor < 1:
+        raise ValidationError({nome: "Informe um inteiro positivo."})
+    return valor
@@ -0,0 +1,57 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .models import Empresa
+
+
+class JWTAuthenticationComEmpresa(JWTAuthentication):
+    """
+    JWTAuthentication que carrega o usuário já com a empresa e a carteira, num
+    único JOIN. Views e permissões leem request.user.empresa e
+    request.user.empresa.carteira (ou testam hasattr) sem novas queries.
+
+    Os claims empresa_id, carteira_id e usertype do token (ver
+    CustomTokenObtainPairSerializer.get_token) são para o cliente; aqui a fonte
+    continua sendo o banco, para não confiar em vínculos que mudaram depois da
+    emissão do token.
+    """
+
+    def get_user(self, validated_token):
+        # mesmo fluxo do JWTAuthentication.get_user, com o select_related
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        try:
+            user = self.user_model.objects.select_related("empresa__carteira").get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+def empresa_do_usuario(user):
+    """
+    Empresa (com a carteira) do usuário da requisição, ou None. Com o
+    JWTAuthenticationComEmpresa ela já veio no JOIN e não há query; com outras
+    autenticações (sessão, force_authenticate) é uma query só.
+    """
+    if not user.is_authenticated:
+        return None
+    # na sessão o request.user é um SimpleLazyObject; o cache fica na instância de dentro
+    user = getattr(user, "_wrapped", user)
+    if type(user).empresa.is_cached(user):
+        return getattr(user, "empresa", None)
+    return Empresa.objects.select_related("carteira").filter(user=user).first()
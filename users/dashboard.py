@@ -0,0 +1,264 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db.models import Count, Func, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from pedidos.janelas import inicio_do_dia, no_periodo
+from pedidos.models import ClienteEmpresa, ItemPedido, Pedido, RetencaoCoorte, VendaDiaria
+from produtos.models import ProdutoVendaDiaria
+
+NOMES_DIAS = ["segunda", "terca", "quarta", "quinta", "sexta", "sabado", "domingo"]
+
+# maior janela aceita em ?inicio=&fim=
+MAX_DIAS_PERIODO = 366
+
+# datas aceitas em ?inicio=&fim= (fora disso não há vendas, e as contas de
+# calendário perto de date.min/date.max estouram)
+DATA_MINIMA = date(1900, 1, 1)
+DATA_MAXIMA = date(2999, 12, 31)
+
+# granularidades da série de vendas e o período padrão (em dias, até hoje) de cada uma
+GRANULARIDADES = {"hora": 1, "dia": 30, "semana": 84, "mes": 365}
+
+# mais pontos que isso numa série é erro do cliente (31 dias por hora cabem)
+MAX_PONTOS_SERIE = 750
+
+# coortes (meses) mostradas por padrão e no máximo no endpoint de coortes
+MESES_COORTES = 12
+MAX_MESES_COORTES = 36
+
+
+class TotalDoAgrupamento(Func):
+    """SUM(<agregado>) OVER (): total de todas as linhas do GROUP BY, calculado na mesma query."""
+    template = "SUM(%(expressions)s) OVER ()"
+    contains_over_clause = True
+    output_field = IntegerField()
+
+
+def semana_de(dia):
+    """(segunda, domingo) da semana do dia."""
+    inicio = dia - timedelta(days=dia.weekday())
+    return inicio, inicio + timedelta(days=6)
+
+
+def ler_periodo(params, padrao, max_dias=MAX_DIAS_PERIODO):
+    """
+    Lê ?inicio=AAAA-MM-DD&fim=AAAA-MM-DD (ambos inclusivos). Sem eles, usa o
+    período `padrao` (inicio, fim). Erros viram ValidationError (400); com
+    max_dias=None o tamanho do período não é limitado aqui.
+    """
+    if not params.get("inicio") and not params.get("fim"):
+        return padrao
+    try:
+        inicio = date.fromisoformat(params.get("inicio", ""))
+        fim = date.fromisoformat(params.get("fim", ""))
+    except ValueError:
+        raise ValidationError({"periodo": "Informe inicio e fim no formato AAAA-MM-DD."})
+    if fim < inicio:
+        raise ValidationError({"periodo": "fim deve ser igual ou posterior a inicio."})
+    if inicio < DATA_MINIMA or fim > DATA_MAXIMA:
+        raise ValidationError({"periodo": f"Use datas entre {DATA_MINIMA} e {DATA_MAXIMA}."})
+    if max_dias is not None and (fim - inicio).days >= max_dias:
+        raise ValidationError({"periodo": f"O período pode ter no máximo {max_dias} dias."})
+    return inicio, fim
+
+
+def vendas_por_dia(empresa, inicio, fim):
+    """
+    Total vendido em cada dia de `inicio` a `fim` (inclusive), lido da
+    VendaDiaria (uma linha por dia com venda). Dias sem venda entram com zero.
+    Retorna [(dia, total)].
+    """
+    totais = dict(
+        VendaDiaria.objects.filter(empresa=empresa, dia__range=[inicio, fim]).values_list("dia", "total")
+    )
+    dias = (inicio + timedelta(days=i) for i in range((fim - inicio).days + 1))
+    return [(dia, totais.get(dia, Decimal("0"))) for dia in dias]
+
+
+def vendas_do_dia(empresa, dia):
+    total = VendaDiaria.objects.filter(empresa=empresa, dia=dia).values_list("total", flat=True).first()
+    return total or Decimal("0")
+
+
+def vendas_da_semana_e_anterior(empresa, inicio_semana):
+    """
+    Total vendido na semana que começa em `inicio_semana` e na anterior, numa
+    única query sobre os 14 dias da VendaDiaria. Retorna (atual, anterior).
+    """
+    inicio_anterior = inicio_semana - timedelta(weeks=1)
+    fim_semana = inicio_semana + timedelta(days=6)
+    totais = VendaDiaria.objects.filter(
+        empresa=empresa,
+        dia__range=[inicio_anterior, fim_semana],
+    ).aggregate(
+        atual=Sum("total", filter=Q(dia__gte=inicio_semana)),
+        anterior=Sum("total", filter=Q(dia__lt=inicio_semana)),
+    )
+    return totais["atual"] or Decimal("0"), totais["anterior"] or Decimal("0")
+
+
+def produto_mais_vendido(empresa, inicio, fim):
+    """
+    Produto com mais unidades vendidas no período e a fatia dele no total de
+    unidades, numa query só sobre os dias da ProdutoVendaDiaria (o total vem de
+    uma window sobre o GROUP BY). Retorna None se nada foi vendido.
+    """
+    primeiro = (
+        ProdutoVendaDiaria.objects.filter(empresa=empresa, dia__range=[inicio, fim])
+        .values("produto_id", "produto__nome")
+        .annotate(vendidos=Sum("unidades"), vendidos_total=TotalDoAgrupamento(Sum("unidades")))
+        .order_by("-vendidos", "produto_id")
+        .first()
+    )
+    if not primeiro or not primeiro["vendidos_total"]:
+        return None
+    return {
+        "nome": primeiro["produto__nome"],
+        "quantidade": primeiro["vendidos"],
+        "porcentagem_total": round(primeiro["vendidos"] * 100 / primeiro["vendidos_total"], 2),
+    }
+
+
+def _meses_entre(inicio, fim):
+    return 12 * (fim.year - inicio.year) + fim.month - inicio.month
+
+
+def quantidade_de_pontos(inicio, fim, granularidade):
+    """Quantos pontos a série terá, calculado sem montar a lista (as horas ignoram o horário de verão)."""
+    if granularidade == "hora":
+        return ((fim - inicio).days + 1) * 24
+    if granularidade == "dia":
+        return (fim - inicio).days + 1
+    if granularidade == "semana":
+        return (fim - semana_de(inicio)[0]).days // 7 + 1
+    return _meses_entre(inicio, fim) + 1
+
+
+def _pontos_da_serie(inicio, fim, granularidade):
+    """Início de cada ponto da série (datetime aware para hora, date para o resto)."""
+    if granularidade == "hora":
+        primeiro, fim_exclusivo = inicio_do_dia(inicio), inicio_do_dia(fim + timedelta(days=1))
+        horas = int((fim_exclusivo - primeiro).total_seconds() // 3600)
+        return [timezone.localtime(primeiro + timedelta(hours=h)) for h in range(horas)]
+    if granularidade == "dia":
+        return [inicio + timedelta(days=i) for i in range((fim - inicio).days + 1)]
+    if granularidade == "semana":
+        primeiro = semana_de(inicio)[0]
+        return [primeiro + timedelta(weeks=i) for i in range((fim - primeiro).days // 7 + 1)]
+    pontos, mes = [], inicio.replace(day=1)
+    while mes <= fim:
+        pontos.append(mes)
+        mes = (mes + timedelta(days=32)).replace(day=1)
+    return pontos
+
+
+def serie_de_vendas(empresa, inicio, fim, granularidade):
+    """
+    Receita, pedidos e unidades vendidas de `inicio` a `fim` agrupados por hora,
+    dia, semana (segunda a domingo) ou mês, numa query agrupada. Dia, semana e
+    mês somam as linhas da VendaDiaria; hora agrupa os pedidos do período (no
+    índice pedido_vendas_idx). Pontos sem venda entram zerados; séries com mais
+    de MAX_PONTOS_SERIE pontos viram ValidationError.
+    Retorna [{"inicio", "receita", "pedidos", "unidades"}].
+    """
+    # confere o tamanho antes de montar os pontos: um período enorme não chega a alocar nada
+    if quantidade_de_pontos(inicio, fim, granularidade) > MAX_PONTOS_SERIE:
+        raise ValidationError({
+            "periodo": f"A série pode ter no máximo {MAX_PONTOS_SERIE} pontos; use uma granularidade maior."
+        })
+    pontos = _pontos_da_serie(inicio, fim, granularidade)
+
+    if granularidade == "hora":
+        unidades_do_pedido = (
+            ItemPedido.objects.filter(pedido=OuterRef("pk")).order_by()
+            .values("pedido").annotate(n=Sum("quantidade")).values("n")
+        )
+        linhas = (
+            Pedido.objects.filter(no_periodo(inicio, fim), empresa=empresa, status__in=VendaDiaria.STATUS_VENDA)
+            .annotate(ponto=Trunc("created_at", "hour", tzinfo=timezone.get_default_timezone()))
+            .values("ponto")
+            .annotate(
+                receita=Sum("valor_total"),
+                pedidos_no_ponto=Count("id"),
+                unidades=Sum(Coalesce(Subquery(unidades_do_pedido), 0)),
+            )
+            .values_list("ponto", "receita", "pedidos_no_ponto", "unidades")
+        )
+    else:
+        linhas = (
+            VendaDiaria.objects.filter(empresa=empresa, dia__range=[inicio, fim])
+            .annotate(ponto=Trunc("dia", {"dia": "day", "semana": "week", "mes": "month"}[granularidade]))
+            .values("ponto")
+            .annotate(receita=Sum("total"), pedidos_no_ponto=Sum("pedidos"), unidades=Sum("itens"))
+            .values_list("ponto", "receita", "pedidos_no_ponto", "unidades")
+        )
+
+    valores = {ponto: (receita, pedidos, unidades) for ponto, receita, pedidos, unidades in linhas}
+    vazio = (Decimal("0"), 0, 0)
+    return [
+        dict(zip(("inicio", "receita", "pedidos", "unidades"), (ponto, *valores.get(ponto, vazio))))
+        for ponto in pontos
+    ]
+
+
+def coortes_de_clientes(empresa, meses=MESES_COORTES):
+    """
+    Clientes recorrentes e a matriz de retenção das coortes dos últimos `meses`
+    meses (incluindo o atual), lidas das tabelas que calcular_clientes_empresas
+    grava. Cada coorte traz, para cada mês desde a primeira compra, a
+    porcentagem dos seus clientes que voltou a comprar e a receita do mês.
+    """
+    mes_atual = timezone.localdate().replace(day=1)
+    primeira_coorte = mes_atual
+    for _ in range(meses - 1):
+        primeira_coorte = (primeira_coorte - timedelta(days=1)).replace(day=1)
+
+    resumo = ClienteEmpresa.objects.filter(empresa=empresa).aggregate(
+        clientes=Count("id"), recorrentes=Count("id", filter=Q(pedidos__gt=1))
+    )
+    linhas = RetencaoCoorte.objects.filter(
+        empresa=empresa, coorte__gte=primeira_coorte
+    ).values_list("coorte", "mes", "clientes", "receita", "calculado_em")
+
+    matriz, calculado_em = {}, None
+    for coorte, mes, clientes, receita, calculado in linhas:
+        matriz.setdefault(coorte, {})[mes] = (clientes, receita)
+        calculado_em = max(calculado_em or calculado, calculado)
+
+    coortes = []
+    for coorte in sorted(matriz):
+        meses_da_coorte = matriz[coorte]
+        clientes = meses_da_coorte.get(0, (0, 0))[0]
+        valores = [meses_da_coorte.get(mes, (0, Decimal("0"))) for mes in range(_meses_entre(coorte, mes_atual) + 1)]
+        coortes.append({
+            "coorte": coorte,
+            "clientes": clientes,
+            "retencao": [round(n * 100 / clientes, 2) if clientes else 0 for n, _ in valores],
+            "receita": [receita for _, receita in valores],
+        })
+
+    melhores = (
+        ClienteEmpresa.objects.filter(empresa=empresa, pedidos__gt=1)
+        .select_related("usuario")
+        .order_by("-valor_total", "id")[:10]
+    )
+    return {
+        "calculado_em": calculado_em,
+        "clientes": resumo["clientes"],
+        "clientes_recorrentes": resumo["recorrentes"],
+        "taxa_recorrencia": round(resumo["recorrentes"] * 100 / resumo["clientes"], 2) if resumo["clientes"] else 0,
+        "coortes": coortes,
+        "melhores_clientes": [
+            {
+                "nome": cliente.usuario.name,
+                "email": cliente.usuario.email,
+                "pedidos": cliente.pedidos,
+                "valor_total": cliente.valor_total,
+                "primeira_compra": cliente.primeira_compra,
+                "ultima_compra": cliente.ultima_compra,
+            }
+            for cliente in melhores
+        ],
+    }
@@ -0,0 +1,60 @@
+"""
+Cache das respostas dos dashboards da empresa.
+
+Cada empresa tem uma versão no cache; ela entra em todas as chaves, então
+invalidar é só trocar a versão (as chaves antigas expiram sozinhas). A versão
+é trocada pelos signals de users.signals sempre que um Pedido, ItemPedido,
+Produto ou Carteira da empresa muda, e explicitamente pelos caminhos em lote
+que não disparam signals (ver pedidos.services.transicionar_status e
+VendaDiaria.reconstruir).
+"""
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+PREFIXO = "dashboard"
+VERSAO_GERAL = f"{PREFIXO}:versao"
+
+
+def _chave_versao(empresa_id):
+    return f"{PREFIXO}:versao:{empresa_id}"
+
+
+def _versoes(empresa_id):
+    """Versão geral + versão da empresa, numa ida ao cache (criando as que faltam)."""
+    chaves = [VERSAO_GERAL, _chave_versao(empresa_id)]
+    versoes = cache.get_many(chaves)
+    for chave in chaves:
+        if chave not in versoes:
+            cache.add(chave, uuid.uuid4().hex, None)
+            versoes[chave] = cache.get(chave)
+    return ":".join(versoes[chave] for chave in chaves)
+
+
+def invalidar(*empresa_ids):
+    """
+    Descarta os dashboards em cache das empresas quando a transação atual fizer
+    commit (antes disso outra requisição recalcularia com os dados antigos).
+    """
+    versoes = {_chave_versao(empresa_id): uuid.uuid4().hex for empresa_id in set(empresa_ids) if empresa_id}
+    if versoes:
+        transaction.on_commit(lambda: cache.set_many(versoes, None))
+
+
+def invalidar_todas():
+    """Descarta os dashboards de todas as empresas (também no commit)."""
+    transaction.on_commit(lambda: cache.set(VERSAO_GERAL, uuid.uuid4().hex, None))
+
+
+def em_cache(empresa_id, acao, janela, calcular):
+    """
+    Devolve os dados de `acao` para a empresa e a janela (ex.: o período do
+    dashboard), calculando com `calcular()` só quando não estão em cache.
+    """
+    chave = f"{PREFIXO}:{empresa_id}:{_versoes(empresa_id)}:{acao}:{janela}"
+    dados = cache.get(chave)
+    if dados is None:
+        dados = calcular()
+        cache.set(chave, dados, settings.DASHBOARD_CACHE_TTL)
+    return dados
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Apaga os refresh tokens já expirados (e as entradas deles na blacklist), em "
+        "lotes por id, para a tabela não crescer sem fim. Feito para rodar periodicamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=5000, help="Tokens apagados por transação.")
+
+    def handle(self, *args, **options):
+        # token expirado não passa na validação de qualquer jeito; a blacklist dele
+        # não serve para mais nada
+        agora = timezone.now()
+        apagados = 0
+
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    OutstandingToken.objects.filter(expires_at__lte=agora)
+                    .order_by("pk").values_list("pk", flat=True)[:options["lote"]]
+                )
+                if not ids:
+                    break
+                # o BlacklistedToken sai junto pelo cascade
+                OutstandingToken.objects.filter(pk__in=ids).delete()
+                apagados += len(ids)
+
+        self.stdout.write(self.style.SUCCESS(f"{apagados} token(s) expirado(s) apagado(s)."))
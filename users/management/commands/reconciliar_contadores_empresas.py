@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from pedidos.models import Pedido
+from produtos.models import Produto
+from users.models import Empresa
+
+
+def contagem(modelo):
+    """COUNT das linhas de `modelo` da empresa da linha externa."""
+    linhas = modelo.objects.filter(empresa=OuterRef("pk")).order_by().values("empresa")
+    return Coalesce(Subquery(linhas.annotate(n=Count("pk")).values("n")), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Confere Empresa.total_produtos/total_pedidos contra o COUNT das tabelas, em "
+        "lotes por id, e corrige os divergentes. Feito para rodar periodicamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=500, help="Empresas conferidas por transação.")
+
+    def handle(self, *args, **options):
+        ultimo_id = 0
+        verificadas = 0
+        corrigidas = 0
+
+        while True:
+            with transaction.atomic():
+                # trava as empresas do lote antes de contar: um produto/pedido criado
+                # em paralelo espera a trava para somar no contador e entra depois
+                ids = list(
+                    Empresa.objects.select_for_update().filter(pk__gt=ultimo_id)
+                    .order_by("pk").values_list("pk", flat=True)[:options["lote"]]
+                )
+                if not ids:
+                    break
+                ultimo_id = ids[-1]
+                verificadas += len(ids)
+
+                lote = (
+                    Empresa.objects.filter(pk__in=ids)
+                    .annotate(produtos_contados=contagem(Produto), pedidos_contados=contagem(Pedido))
+                    .values_list("pk", "total_produtos", "produtos_contados", "total_pedidos", "pedidos_contados")
+                )
+                for pk, total_produtos, produtos, total_pedidos, pedidos in lote:
+                    if (total_produtos, total_pedidos) == (produtos, pedidos):
+                        continue
+                    corrigidas += 1
+                    self.stdout.write(
+                        f"Empresa #{pk}: produtos {total_produtos} -> {produtos}, pedidos {total_pedidos} -> {pedidos}"
+                    )
+                    Empresa.objects.filter(pk=pk).update(total_produtos=produtos, total_pedidos=pedidos)
+
+        self.stdout.write(self.style.SUCCESS(f"{verificadas} empresa(s) verificadas, {corrigidas} corrigida(s)."))
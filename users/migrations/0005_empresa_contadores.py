@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:14
+
+from django.db import migrations, models
+
+
+def popular_contadores(apps, schema_editor):
+    """Carga inicial dos contadores com as contagens atuais."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE users_empresa e SET
+                total_produtos = (SELECT COUNT(*) FROM produtos_produto WHERE empresa_id = e.id),
+                total_pedidos = (SELECT COUNT(*) FROM pedidos_pedido WHERE empresa_id = e.id)
+            """
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_alter_empresa_meta'),
+        ('pedidos', '0011_popular_vendas_por_produto'),
+        ('produtos', '0003_vendas_por_produto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empresa',
+            name='total_pedidos',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='empresa',
+            name='total_produtos',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(popular_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Índice em expires_at da tabela de tokens do simplejwt, para o
+    podar_tokens_expirados achar cada lote sem varrer a tabela toda.
+    """
+
+    dependencies = [
+        ('users', '0005_empresa_contadores'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS token_outstanding_expira_idx "
+            "ON token_blacklist_outstandingtoken (expires_at)",
+            "DROP INDEX IF EXISTS token_outstanding_expira_idx",
+        ),
+    ]
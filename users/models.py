@@ -78,6 +78,21 @@ class Empresa(models.Model):
             MaxValueValidator(5)
         ]
     )
+    # contadores mantidos por users.signals; o comando reconciliar_contadores_empresas corrige desvios
+    total_produtos = models.IntegerField(default=0)
+    total_pedidos = models.IntegerField(default=0)
+
+    CONTADORES = ("total_produtos", "total_pedidos")
+
+    def save(self, *args, **kwargs):
+        # os contadores só mudam com UPDATE ... F(); o save de uma instância
+        # carregada antes não pode gravar por cima deles
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CONTADORES
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.name} - {self.get_categoria_display() if self.categoria else 'Sem categoria'}"
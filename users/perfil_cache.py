@@ -0,0 +1,51 @@
+"""
+Cache da resposta de /api/auth/users/me/ (MeView).
+
+Cada usuário tem uma versão no cache, com o instante em que foi criada; ela
+vira o ETag e o Last-Modified da resposta e entra na chave do payload, então
+invalidar é só trocar a versão. A versão é trocada pelos signals de
+users.signals quando o usuário, a empresa dele ou as fotos da empresa mudam.
+"""
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+PREFIXO = "me"
+
+
+def _chave_versao(user_id):
+    return f"{PREFIXO}:versao:{user_id}"
+
+
+def _nova_versao():
+    return f"{uuid.uuid4().hex}:{int(time.time())}"
+
+
+def versao(user_id):
+    """(token, timestamp) da versão atual do perfil do usuário, criando se faltar."""
+    chave = _chave_versao(user_id)
+    atual = cache.get(chave)
+    if atual is None:
+        cache.add(chave, _nova_versao(), None)
+        atual = cache.get(chave)
+    token, criada_em = atual.split(":")
+    return token, int(criada_em)
+
+
+def invalidar(*user_ids):
+    """Troca a versão dos usuários quando a transação atual fizer commit."""
+    versoes = {_chave_versao(user_id): _nova_versao() for user_id in set(user_ids) if user_id}
+    if versoes:
+        transaction.on_commit(lambda: cache.set_many(versoes, None))
+
+
+def em_cache(user_id, token, calcular):
+    """Payload do perfil na versão `token`, calculado com `calcular()` só se faltar."""
+    chave = f"{PREFIXO}:{user_id}:{token}"
+    dados = cache.get(chave)
+    if dados is None:
+        dados = calcular()
+        cache.set(chave, dados, settings.ME_CACHE_TTL)
+    return dados
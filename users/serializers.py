@@ -103,6 +103,7 @@ class MotivacionalSerializer(serializers.Serializer):
 
 
 from rest_framework import serializers
+from django.db.models import ImageField, FileField
 
 class BaseModelEnvelopeSerializer(serializers.ModelSerializer):
     criador_nome = serializers.SerializerMethodField()
@@ -134,7 +135,11 @@ class BaseModelEnvelopeSerializer(serializers.ModelSerializer):
             if f.name in base_fields:
                 continue
             # evita relações many-to-many ou reverse
-            if f.many_to_many or f.one_to_many:
+            if f.many_to_many or f.one_to_many or (f.is_relation and not f.concrete):
+                continue
+            # chaves estrangeiras retornam o id (evita query extra e objeto não serializável)
+            if f.is_relation:
+                result[f.name] = getattr(obj, f.attname, None)
                 continue
             value = getattr(obj, f.name)
             # se for ImageField ou FileField, retorna a URL
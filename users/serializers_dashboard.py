@@ -17,12 +17,60 @@ class DashboardStatsSerializer(serializers.Serializer):
     produto_mais_vendido = ProductStatsSerializer()
     media_diaria_semana = DailyAverageSerializer()
 
+class VendaDiaSerializer(serializers.Serializer):
+    data = serializers.DateField()
+    total = serializers.DecimalField(max_digits=12, decimal_places=2)
+
 class WeeklyDashboardStatsSerializer(serializers.Serializer):
+    periodo_inicio = serializers.DateField()
+    periodo_fim = serializers.DateField()
     total_venda_semana = serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True)
     produto_mais_vendido_semana = ProductStatsSerializer()
     meta_diaria = serializers.IntegerField() # Added this line
-    meta_semanal = serializers.IntegerField()
+    meta_semanal = serializers.IntegerField(help_text="Meta diária vezes os dias do período.")
     frases_dra_clara = serializers.ListField(child=serializers.CharField())
     alertas_inteligentes = serializers.ListField(child=serializers.CharField())
     vendas_por_dia_semana = serializers.DictField(child=serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True))
+    vendas_por_dia = VendaDiaSerializer(many=True)
+
+
+class PontoSerieVendasSerializer(serializers.Serializer):
+    inicio = serializers.CharField(help_text="Início do ponto: data (AAAA-MM-DD) ou, por hora, data e hora ISO 8601.")
+    receita = serializers.DecimalField(max_digits=14, decimal_places=2)
+    pedidos = serializers.IntegerField()
+    unidades = serializers.IntegerField()
+
+
+class SerieVendasSerializer(serializers.Serializer):
+    granularidade = serializers.CharField()
+    periodo_inicio = serializers.DateField()
+    periodo_fim = serializers.DateField()
+    pontos = PontoSerieVendasSerializer(many=True)
+
+
+class CoorteSerializer(serializers.Serializer):
+    coorte = serializers.DateField(help_text="Primeiro dia do mês da primeira compra.")
+    clientes = serializers.IntegerField()
+    retencao = serializers.ListField(
+        child=serializers.DecimalField(max_digits=5, decimal_places=2),
+        help_text="% dos clientes da coorte que compraram em cada mês, a partir do mês da coorte.",
+    )
+    receita = serializers.ListField(child=serializers.DecimalField(max_digits=14, decimal_places=2))
+
+
+class ClienteRecorrenteSerializer(serializers.Serializer):
+    nome = serializers.CharField()
+    email = serializers.EmailField()
+    pedidos = serializers.IntegerField()
+    valor_total = serializers.DecimalField(max_digits=14, decimal_places=2)
+    primeira_compra = serializers.DateTimeField()
+    ultima_compra = serializers.DateTimeField()
+
 
+class CoortesClientesSerializer(serializers.Serializer):
+    calculado_em = serializers.DateTimeField(allow_null=True)
+    clientes = serializers.IntegerField()
+    clientes_recorrentes = serializers.IntegerField()
+    taxa_recorrencia = serializers.DecimalField(max_digits=5, decimal_places=2)
+    coortes = CoorteSerializer(many=True)
+    melhores_clientes = ClienteRecorrenteSerializer(many=True)
@@ -1,10 +1,34 @@
-from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.models import update_last_login
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import (
+    TokenBlacklistSerializer,
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
 from django.utils.translation import gettext_lazy as _
 from .models import User
+from .tokens import RefreshTokenRevogavel
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Login por email e senha com as mensagens do projeto. O usuário é buscado
+    e a senha conferida uma única vez; os tokens são emitidos aqui mesmo, sem
+    passar pelo validate() do simplejwt, que chamaria authenticate() e faria
+    de novo a query e o hash da senha (a parte mais cara do login).
+    """
+    token_class = RefreshTokenRevogavel
+
+    @classmethod
+    def get_token(cls, user):
+        # vínculos do usuário no token, para o cliente não precisar de outra chamada
+        token = super().get_token(user)
+        empresa = getattr(user, "empresa", None)
+        token["usertype"] = user.usertype
+        token["empresa_id"] = empresa.pk if empresa else None
+        token["carteira_id"] = getattr(getattr(empresa, "carteira", None), "pk", None)
+        return token
+
     def validate(self, attrs):
             email = attrs.get("email")
             password = attrs.get("password")
@@ -13,18 +37,33 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             if email =='':
                 raise serializers.ValidationError({"detail": _("email não preenchido")})
             try:
-                user = User.objects.get(email=email)
+                user = User.objects.select_related("empresa__carteira").get(email=email)
             except User.DoesNotExist:
                 raise serializers.ValidationError({"detail": _("Email ou Senha incorreta.")})
 
             if not user.check_password(password):
                 raise serializers.ValidationError({"detail": _("Email ou Senha incorreta.")})
-            
+
 
 
             if not user.is_active:
                 raise serializers.ValidationError({"detail": _("Esta conta está inativa. Contate o suporte.")})
 
-            # Autentica normalmente após passar pelas verificações
-            data = super().validate(attrs)
-            return data
\ No newline at end of file
+            # Emite os tokens com o usuário já verificado (o que o super().validate faria)
+            self.user = user
+            refresh = self.get_token(user)
+            data = {"refresh": str(refresh), "access": str(refresh.access_token)}
+
+            if api_settings.UPDATE_LAST_LOGIN:
+                update_last_login(None, user)
+
+            return data
+
+
+class TokenRefreshRevogavelSerializer(TokenRefreshSerializer):
+    # rotação com a blacklist enxuta de users.tokens
+    token_class = RefreshTokenRevogavel
+
+
+class TokenBlacklistRevogavelSerializer(TokenBlacklistSerializer):
+    token_class = RefreshTokenRevogavel
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from . import dashboard_cache, perfil_cache
+from .models import Empresa
+
+# contador da Empresa que cada modelo mantém
+CONTADOR_DO_MODELO = {"Produto": "total_produtos", "Pedido": "total_pedidos"}
+
+
+def _somar_ao_contador(instance, delta):
+    campo = CONTADOR_DO_MODELO[type(instance).__name__]
+    Empresa.objects.filter(pk=instance.empresa_id).update(**{campo: F(campo) + delta})
+
+
+@receiver(post_save, sender="pedidos.Pedido")
+@receiver(post_save, sender="produtos.Produto")
+def contar_criado(sender, instance, created, **kwargs):
+    if created:
+        _somar_ao_contador(instance, 1)
+
+
+@receiver(post_delete, sender="pedidos.Pedido")
+@receiver(post_delete, sender="produtos.Produto")
+def descontar_removido(sender, instance, origin=None, **kwargs):
+    if getattr(origin, "model", type(origin)) is Empresa:
+        return  # a própria empresa está sendo removida
+    _somar_ao_contador(instance, -1)
+
+
+@receiver(post_save, sender="pedidos.Pedido")
+@receiver(post_delete, sender="pedidos.Pedido")
+@receiver(post_save, sender="produtos.Produto")
+@receiver(post_delete, sender="produtos.Produto")
+@receiver(post_save, sender="moeda.Carteira")
+@receiver(post_delete, sender="moeda.Carteira")
+def invalidar_dashboard_da_empresa(sender, instance, **kwargs):
+    dashboard_cache.invalidar(instance.empresa_id)
+
+
+@receiver(post_save, sender="users.Empresa")
+def invalidar_dashboard_da_propria_empresa(sender, instance, **kwargs):
+    # a meta da empresa aparece nos dashboards
+    dashboard_cache.invalidar(instance.pk)
+
+
+@receiver(post_save, sender="pedidos.ItemPedido")
+@receiver(post_delete, sender="pedidos.ItemPedido")
+def invalidar_dashboard_do_item(sender, instance, origin=None, **kwargs):
+    if origin is not None and getattr(origin, "model", type(origin)) is not sender:
+        return  # cascade vindo do pedido ou do produto: o signal deles já invalida
+    # pedido e produto são sempre da mesma empresa; o produto já vem carregado no save
+    dashboard_cache.invalidar(instance.produto.empresa_id)
+
+
+@receiver(post_save, sender="users.User")
+@receiver(post_delete, sender="users.User")
+def invalidar_perfil_do_usuario(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return  # o login não muda nada do que o /me devolve
+    perfil_cache.invalidar(instance.pk)
+
+
+@receiver(post_save, sender="users.Empresa")
+@receiver(post_delete, sender="users.Empresa")
+def invalidar_perfil_da_empresa(sender, instance, **kwargs):
+    perfil_cache.invalidar(instance.user_id)
+
+
+@receiver(post_save, sender="users.FotoEmpresa")
+@receiver(post_delete, sender="users.FotoEmpresa")
+def invalidar_perfil_da_foto(sender, instance, origin=None, **kwargs):
+    if getattr(origin, "model", type(origin)) in (Empresa, get_user_model()):
+        return  # cascade: o signal da empresa já invalida
+    perfil_cache.invalidar(Empresa.objects.filter(pk=instance.empresa_id).values_list("user_id", flat=True).first())
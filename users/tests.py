@@ -1,12 +1,36 @@
+import os
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 from rest_framework.test import APITestCase
 from rest_framework import status
+from django.db import connection
+from django.db.models import Sum
+from django.test import override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from .models import Empresa
+from django.contrib.auth.models import update_last_login
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+from django.core.management import call_command
+from django.core.cache import cache
+from django.utils import timezone
+from pedidos.models import Pedido, ItemPedido, VendaDiaria
+from pedidos.services import criar_pedido, transicionar_status
+from produtos.models import Produto
+from .dashboard import GRANULARIDADES, NOMES_DIAS, semana_de, vendas_da_semana_e_anterior, produto_mais_vendido
+from .models import Empresa, FotoEmpresa
+from .serializers_jwt import CustomTokenObtainPairSerializer
+from .throttling import em_memoria
+from .tokens import RefreshTokenRevogavel, revogados
 
 User = get_user_model()
 class AuthTests(APITestCase):
     def setUp(self):
+        cache.clear()  # contadores de tentativas de login
         # usuário válido já cadastrado no sistema
         self.email = "usuario@teste.com"
         self.password = "senhasegura123"
@@ -365,4 +389,663 @@ class LojaTestsSet_us004(APITestCase):
         # Verifica persistência
         empresa = Empresa.objects.get(user=user_loja)
         self.assertEqual(empresa.categoria, 2)
-        self.assertEqual(empresa.descricao, "Loja Dados Teste")
\ No newline at end of file
+        self.assertEqual(empresa.descricao, "Loja Dados Teste")
+
+class DashboardTestMixin:
+    """Empresa com dois produtos e helpers para criar vendas em datas arbitrárias."""
+
+    def setUp(self):
+        cache.clear()
+        dono = User.objects.create_user(email="loja@teste.com", password="123", name="Loja", usertype=2)
+        self.empresa = Empresa.objects.create(user=dono)
+        self.comprador = User.objects.create_user(email="cliente@teste.com", password="123", name="Cliente")
+        self.bolo = Produto.objects.create(
+            empresa=self.empresa, nome="Bolo", descricao="Bolo", preco=Decimal("10.00"),
+            quantidade=1000, imagem="produtos/teste.jpg",
+        )
+        self.torta = Produto.objects.create(
+            empresa=self.empresa, nome="Torta", descricao="Torta", preco=Decimal("5.00"),
+            quantidade=1000, imagem="produtos/teste.jpg",
+        )
+        self.client.force_authenticate(user=User.objects.get(pk=dono.pk))
+
+    def vender(self, quando, status_pedido="pago", **quantidades):
+        itens = [
+            {"produto_id": getattr(self, nome).id, "quantidade": quantidade}
+            for nome, quantidade in quantidades.items()
+        ]
+        pedido = criar_pedido(usuario=self.comprador, itens_data=itens)
+        Pedido.objects.filter(pk=pedido.pk).update(created_at=quando)
+        for proximo in ["processando", "pago", "concluido"]:
+            if pedido.status == status_pedido:
+                break
+            transicionar_status(self.empresa, [pedido.pk], proximo)
+            pedido.status = proximo
+        return pedido
+
+
+class DashboardStatsTest(DashboardTestMixin, APITestCase):
+    def test_estatisticas_da_semana(self):
+        agora = timezone.now()
+        self.vender(agora, bolo=3, torta=1)                     # 35,00
+        self.vender(agora, torta=2)                             # 10,00
+        self.vender(agora, status_pedido="pendente", torta=50)  # não conta
+        self.vender(agora - timedelta(weeks=1), bolo=3)         # 30,00 na semana anterior
+
+        self.client.force_authenticate(user=User.objects.get(pk=self.empresa.user.pk))
+        with self.assertNumQueries(3):  # empresa, totais das duas semanas, produto mais vendido
+            response = self.client.get(reverse("empresa-dashboard-stats"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["vendas_semana"]["total_vendas"], 45)
+        self.assertEqual(response.data["vendas_semana"]["percentual_variacao"], "50.00")
+        self.assertEqual(response.data["produto_mais_vendido"], {"nome": "Bolo", "porcentagem_total": "50.00"})
+        self.assertEqual(response.data["media_diaria_semana"]["valor_medio_diario"], "6.43")
+
+    def test_semana_sem_vendas(self):
+        response = self.client.get(reverse("empresa-dashboard-stats"))
+
+        self.assertEqual(response.data["vendas_semana"]["total_vendas"], 0)
+        self.assertEqual(response.data["produto_mais_vendido"]["nome"], "Nenhum")
+
+
+class WeeklyDashboardSummaryTest(DashboardTestMixin, APITestCase):
+    url = reverse("empresa-weekly-dashboard-summary")
+
+    def test_semana_atual_com_dias_zerados(self):
+        hoje = timezone.localdate()
+        self.vender(timezone.now(), bolo=2)
+        self.vender(timezone.now(), torta=1)
+
+        self.client.force_authenticate(user=User.objects.get(pk=self.empresa.user.pk))
+        with self.assertNumQueries(3):  # empresa, vendas por dia, produto mais vendido
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total_venda_semana"], "25.00")
+        self.assertEqual(response.data["produto_mais_vendido_semana"]["nome"], "Bolo")
+        dias = response.data["vendas_por_dia"]
+        self.assertEqual(len(dias), 7)
+        self.assertEqual(dias[0]["data"], semana_de(hoje)[0].isoformat())
+        self.assertEqual({d["data"]: d["total"] for d in dias}[hoje.isoformat()], "25.00")
+        self.assertEqual(sum(Decimal(d["total"]) for d in dias), Decimal("25.00"))
+        self.assertEqual(list(response.data["vendas_por_dia_semana"]), NOMES_DIAS)
+
+    def test_periodo_personalizado(self):
+        hoje = timezone.localdate()
+        self.vender(timezone.now() - timedelta(days=3), bolo=1)
+        self.vender(timezone.now() - timedelta(days=20), bolo=5)  # fora do período
+        Empresa.objects.filter(pk=self.empresa.pk).update(meta=15)
+
+        self.client.force_authenticate(user=User.objects.get(pk=self.empresa.user.pk))
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {"inicio": (hoje - timedelta(days=9)).isoformat(), "fim": hoje.isoformat()})
+
+        self.assertEqual(len(response.data["vendas_por_dia"]), 10)
+        self.assertEqual(response.data["total_venda_semana"], "10.00")
+        self.assertEqual(response.data["vendas_por_dia"][6], {"data": (hoje - timedelta(days=3)).isoformat(), "total": "10.00"})
+        self.assertEqual(response.data["meta_diaria"], 15)
+        self.assertEqual(response.data["meta_semanal"], 150)  # meta do período de 10 dias
+
+    def test_periodo_invalido(self):
+        for params in ({"inicio": "2025-02-10", "fim": "2025-02-01"}, {"inicio": "ontem"}, {"inicio": "2020-01-01", "fim": "2025-01-01"}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class DashboardCacheTest(DashboardTestMixin, APITestCase):
+    def autenticar(self):
+        self.client.force_authenticate(user=User.objects.get(pk=self.empresa.user.pk))
+
+    def test_respostas_em_cache_ate_a_empresa_mudar(self):
+        self.vender(timezone.now(), bolo=1)
+        url = reverse("empresa-dashboard-stats")
+        self.autenticar()
+        self.client.get(url)
+
+        self.autenticar()
+        with self.assertNumQueries(1):  # só a empresa do usuário
+            response = self.client.get(url)
+        self.assertEqual(response.data["vendas_semana"]["total_vendas"], 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vender(timezone.now(), torta=2)
+        response = self.client.get(url)
+        self.assertEqual(response.data["vendas_semana"]["total_vendas"], 20)
+
+    def test_invalidacao_por_produto_carteira_e_meta(self):
+        self.autenticar()
+        stats = self.client.get(reverse("empresa-stats")).data
+        self.assertEqual(stats["total_produtos"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Produto.objects.create(
+                empresa=self.empresa, nome="Pão", descricao="Pão", preco=Decimal("1.00"),
+                quantidade=10, imagem="produtos/teste.jpg",
+            )
+        self.assertEqual(self.client.get(reverse("empresa-stats")).data["total_produtos"], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            carteira = self.empresa.carteira
+            carteira.saldo_moeda = Decimal("7.00")
+            carteira.save()
+        self.assertEqual(Decimal(self.client.get(reverse("empresa-stats")).data["moedas"]), Decimal("7.00"))
+
+        self.client.get(reverse("empresa-dashboard"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("empresa-meta"), {"meta": 50}, format="json")
+        self.assertEqual(self.client.get(reverse("empresa-dashboard")).data["meta"], 50)
+
+    def test_frases_sorteadas_mesmo_com_numeros_em_cache(self):
+        url = reverse("empresa-weekly-dashboard-summary")
+        self.autenticar()
+        self.client.get(url)
+
+        with mock.patch("users.views.random.sample", side_effect=lambda frases, k: frases[:k]) as sorteio:
+            self.autenticar()
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+
+        self.assertEqual(sorteio.call_count, 2)
+        self.assertEqual(len(response.data["frases_dra_clara"]), 3)
+        self.assertEqual(len(response.data["vendas_por_dia"]), 7)
+
+
+class SerieVendasTest(DashboardTestMixin, APITestCase):
+    url = reverse("empresa-sales-series")
+
+    def serie(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [(p["inicio"], p["receita"], p["pedidos"], p["unidades"]) for p in response.data["pontos"]]
+
+    def test_por_dia_semana_e_mes(self):
+        fuso = timezone.get_default_timezone()
+        self.vender(timezone.datetime(2025, 3, 3, 10, tzinfo=fuso), bolo=2)  # segunda
+        self.vender(timezone.datetime(2025, 3, 5, 23, 30, tzinfo=fuso), torta=1)
+        self.vender(timezone.datetime(2025, 3, 10, 9, tzinfo=fuso), bolo=1, torta=2)
+        self.vender(timezone.datetime(2025, 3, 4, 9, tzinfo=fuso), "pendente", bolo=9)
+
+        por_dia = self.serie(granularidade="dia", inicio="2025-03-03", fim="2025-03-05")
+        self.assertEqual(por_dia, [
+            ("2025-03-03", "20.00", 1, 2),
+            ("2025-03-04", "0.00", 0, 0),
+            ("2025-03-05", "5.00", 1, 1),
+        ])
+
+        por_semana = self.serie(granularidade="semana", inicio="2025-03-01", fim="2025-03-16")
+        self.assertEqual(por_semana, [
+            ("2025-02-24", "0.00", 0, 0),
+            ("2025-03-03", "25.00", 2, 3),
+            ("2025-03-10", "20.00", 1, 3),
+        ])
+
+        por_mes = self.serie(granularidade="mes", inicio="2025-02-15", fim="2025-03-31")
+        self.assertEqual(por_mes, [("2025-02-01", "0.00", 0, 0), ("2025-03-01", "45.00", 3, 6)])
+
+    def test_por_hora_no_fuso_do_projeto(self):
+        fuso = timezone.get_default_timezone()
+        self.vender(timezone.datetime(2025, 3, 5, 23, 10, tzinfo=fuso), bolo=1)
+        self.vender(timezone.datetime(2025, 3, 5, 23, 50, tzinfo=fuso), torta=3)
+
+        por_hora = self.serie(granularidade="hora", inicio="2025-03-05", fim="2025-03-05")
+        self.assertEqual(len(por_hora), 24)
+        self.assertEqual(por_hora[23], ("2025-03-05T23:00:00-03:00", "25.00", 2, 4))
+        self.assertEqual(sum(pedidos for _, _, pedidos, _ in por_hora), 2)
+
+    def test_granularidade_e_tamanho_validados(self):
+        response = self.client.get(self.url, {"granularidade": "minuto"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(self.url, {"granularidade": "hora", "inicio": "2025-01-01", "fim": "2025-03-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("periodo", response.data)
+
+        # períodos longos valem em granularidades maiores
+        self.assertEqual(len(self.serie(granularidade="mes", inicio="2020-01-01", fim="2025-12-31")), 72)
+
+    def test_periodos_extremos_sao_400(self):
+        with mock.patch("users.dashboard._pontos_da_serie") as pontos:
+            for granularidade in GRANULARIDADES:
+                response = self.client.get(
+                    self.url, {"granularidade": granularidade, "inicio": "1900-01-01", "fim": "2999-12-31"}
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, granularidade)
+        self.assertFalse(pontos.called)
+
+        for granularidade in ["hora", "mes"]:
+            response = self.client.get(
+                self.url, {"granularidade": granularidade, "inicio": "9999-12-31", "fim": "9999-12-31"}
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, granularidade)
+            self.assertIn("periodo", response.data)
+
+
+class CoortesClientesTest(DashboardTestMixin, APITestCase):
+    def mes(self, meses_atras):
+        """Dia 10, meio-dia, `meses_atras` meses antes do mês atual."""
+        dia = timezone.localdate().replace(day=1)
+        for _ in range(meses_atras):
+            dia = (dia - timedelta(days=1)).replace(day=1)
+        return timezone.make_aware(timezone.datetime(dia.year, dia.month, 10, 12))
+
+    def vender_para(self, email, quando, status_pedido="pago", **quantidades):
+        self.comprador, _ = User.objects.get_or_create(email=email, defaults={"name": email.split("@")[0]})
+        return self.vender(quando, status_pedido, **quantidades)
+
+    def test_matriz_de_retencao_e_clientes_recorrentes(self):
+        self.vender_para("ana@teste.com", self.mes(2), bolo=1)
+        self.vender_para("ana@teste.com", self.mes(0), bolo=3)
+        self.vender_para("bia@teste.com", self.mes(2), torta=1)
+        self.vender_para("caio@teste.com", self.mes(1), torta=2)
+        self.vender_para("caio@teste.com", self.mes(1), "pendente", bolo=5)
+
+        saida = StringIO()
+        call_command("calcular_clientes_empresas", stdout=saida)
+        self.assertIn("3 cliente(s)", saida.getvalue())
+
+        response = self.client.get(reverse("empresa-customer-cohorts"), {"meses": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        dados = response.data
+        self.assertEqual((dados["clientes"], dados["clientes_recorrentes"]), (3, 1))
+        self.assertEqual(dados["taxa_recorrencia"], "33.33")
+        self.assertIsNotNone(dados["calculado_em"])
+
+        coortes = [(c["clientes"], c["retencao"], c["receita"]) for c in dados["coortes"]]
+        self.assertEqual(coortes, [
+            (2, ["100.00", "0.00", "50.00"], ["15.00", "0.00", "30.00"]),
+            (1, ["100.00", "0.00"], ["10.00", "0.00"]),
+        ])
+        self.assertEqual(
+            [(c["email"], c["pedidos"], c["valor_total"]) for c in dados["melhores_clientes"]],
+            [("ana@teste.com", 2, "40.00")],
+        )
+
+    def test_meses_validado(self):
+        response = self.client.get(reverse("empresa-customer-cohorts"), {"meses": 99})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ContadoresEmpresaTest(DashboardTestMixin, APITestCase):
+    def contadores(self):
+        return tuple(Empresa.objects.filter(pk=self.empresa.pk).values_list("total_produtos", "total_pedidos").get())
+
+    def test_contadores_acompanham_produtos_e_pedidos(self):
+        pedido = self.vender(timezone.now(), bolo=1)
+        self.vender(timezone.now(), torta=1)
+        self.assertEqual(self.contadores(), (2, 2))
+
+        pedido.delete()
+        self.torta.delete()  # o cascade leva os itens da torta, não o pedido
+        self.assertEqual(self.contadores(), (1, 1))
+
+        # salvar a instância antiga (contadores zerados em memória) não sobrescreve
+        self.empresa.meta = 50
+        self.empresa.save()
+        self.assertEqual(self.contadores(), (1, 1))
+
+    def test_stats_le_uma_linha(self):
+        self.vender(timezone.now(), bolo=1)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("empresa-stats"))
+        self.assertEqual(response.data["total_produtos"], 2)
+        self.assertEqual(response.data["total_pedidos"], 1)
+
+    def test_reconciliacao_corrige_desvios(self):
+        self.vender(timezone.now(), bolo=1)
+        Empresa.objects.filter(pk=self.empresa.pk).update(total_produtos=9, total_pedidos=0)
+        saida = StringIO()
+
+        call_command("reconciliar_contadores_empresas", stdout=saida)
+
+        self.assertEqual(self.contadores(), (2, 1))
+        self.assertIn("1 corrigida(s)", saida.getvalue())
+
+
+@skipUnless(os.getenv("RODAR_BENCHMARKS"), "benchmark: rode com RODAR_BENCHMARKS=1")
+class DashboardStatsBenchmark(DashboardTestMixin, APITestCase):
+    """Compara as queries antigas do dashboard_stats com as atuais numa empresa com 100 mil pedidos."""
+
+    TOTAL_PEDIDOS = 100_000
+    RODADAS = 5
+
+    def setUp(self):
+        super().setUp()
+        agora = timezone.now()
+        pedidos = Pedido.objects.bulk_create(
+            (
+                Pedido(usuario=self.comprador, empresa=self.empresa, status="pago", valor_total=Decimal("10.00"))
+                for _ in range(self.TOTAL_PEDIDOS)
+            ),
+            batch_size=5000,
+        )
+        ItemPedido.objects.bulk_create(
+            (
+                ItemPedido(pedido=pedido, produto=self.bolo if i % 3 else self.torta, quantidade=1,
+                           preco_unitario=Decimal("10.00"))
+                for i, pedido in enumerate(pedidos)
+            ),
+            batch_size=5000,
+        )
+        # metade nas duas últimas semanas, o resto espalhado pelo ano
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE pedidos_pedido SET created_at = %s - (id %% 730) * interval '12 hours'", [agora]
+            )
+            cursor.execute("ANALYZE pedidos_pedido")
+            cursor.execute("ANALYZE pedidos_itempedido")
+        VendaDiaria.reconstruir()
+
+    def consultas_antigas(self, inicio, fim):
+        inicio_anterior, fim_anterior = inicio - timedelta(weeks=1), fim - timedelta(weeks=1)
+        vendas = Pedido.objects.filter(empresa=self.empresa, status__in=["pago", "concluido"])
+        itens = ItemPedido.objects.filter(
+            pedido__empresa=self.empresa,
+            pedido__created_at__date__range=[inicio, fim],
+            pedido__status__in=["pago", "concluido"],
+        )
+        vendas.filter(created_at__date__range=[inicio, fim]).aggregate(total=Sum("valor_total"))
+        vendas.filter(created_at__date__range=[inicio_anterior, fim_anterior]).aggregate(total=Sum("valor_total"))
+        por_produto = itens.values("produto__nome").annotate(q=Sum("quantidade")).order_by("-q")
+        if por_produto.exists():
+            por_produto.first()
+            itens.aggregate(total_q=Sum("quantidade"))
+        vendas.filter(created_at__date__range=[inicio, fim]).dates("created_at", "day").count()
+
+    def consultas_atuais(self, inicio, fim):
+        vendas_da_semana_e_anterior(self.empresa, inicio)
+        produto_mais_vendido(self.empresa, inicio, fim)
+
+    def medir(self, funcao, *args):
+        tempos = []
+        for _ in range(self.RODADAS):
+            inicio = time.perf_counter()
+            funcao(*args)
+            tempos.append(time.perf_counter() - inicio)
+        return min(tempos)
+
+    def test_benchmark(self):
+        inicio, fim = semana_de(timezone.localdate())
+        antigo = self.medir(self.consultas_antigas, inicio, fim)
+        atual = self.medir(self.consultas_atuais, inicio, fim)
+        print(f"\ndashboard_stats com {self.TOTAL_PEDIDOS} pedidos: antes {antigo * 1000:.1f} ms, agora {atual * 1000:.1f} ms")
+        self.assertLess(atual, antigo)
+
+
+class LoginTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.email = "usuario@teste.com"
+        self.password = "senhasegura123"
+        User.objects.create_user(email=self.email, password=self.password, name="Usuário Teste")
+        self.url = reverse("token_obtain_pair")
+
+    def test_login_busca_o_usuario_e_confere_a_senha_uma_vez(self):
+        with mock.patch.object(User, "check_password", autospec=True, side_effect=User.check_password) as conferir:
+            # a busca do usuário e o registro do refresh emitido (blacklist)
+            with self.assertNumQueries(2):
+                response = self.client.post(self.url, {"email": self.email, "password": self.password}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(conferir.call_count, 1)
+        self.assertIn("access", response.data)
+        self.assertIn("refresh", response.data)
+
+    def test_conta_inativa(self):
+        User.objects.filter(email=self.email).update(is_active=False)
+        response = self.client.post(self.url, {"email": self.email, "password": self.password}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(str(response.data["detail"][0]), "Esta conta está inativa. Contate o suporte.")
+
+
+class ContextoAutenticacaoTest(DashboardTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=None)
+        response = self.client.post(
+            reverse("token_obtain_pair"), {"email": "loja@teste.com", "password": "123"}, format="json"
+        )
+        self.access = response.data["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+
+    def test_claims_do_token(self):
+        claims = AccessToken(self.access)
+        self.assertEqual(claims["empresa_id"], self.empresa.pk)
+        self.assertEqual(claims["carteira_id"], self.empresa.carteira.pk)
+        self.assertEqual(claims["usertype"], 2)
+
+    def test_usuario_empresa_e_carteira_numa_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("empresa-stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("carteira-empresa"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_autenticacao_por_sessao(self):
+        self.client.credentials()
+        self.client.login(email="loja@teste.com", password="123")
+        for url in ["empresa-stats", "empresa-dashboard", "carteira-empresa"]:
+            response = self.client.get(reverse(url))
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+
+
+class BlacklistTokensTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        revogados.limpar()
+        User.objects.create_user(email="usuario@teste.com", password="senhasegura123", name="Usuário Teste")
+        response = self.client.post(
+            reverse("token_obtain_pair"), {"email": "usuario@teste.com", "password": "senhasegura123"}, format="json"
+        )
+        self.refresh = response.data["refresh"]
+        self.jti = RefreshTokenRevogavel(self.refresh)["jti"]
+
+    def renovar(self, refresh):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse("jwt-refresh"), {"refresh": refresh}, format="json")
+
+    def test_rotacao_revoga_o_refresh_usado(self):
+        response = self.renovar(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        novo = response.data["refresh"]
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=self.jti).exists())
+        self.assertTrue(
+            OutstandingToken.objects.filter(jti=RefreshTokenRevogavel(novo)["jti"], user__email="usuario@teste.com").exists()
+        )
+
+        self.assertEqual(self.renovar(self.refresh).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.renovar(novo).status_code, status.HTTP_200_OK)
+
+    def test_revogado_conhecido_nao_consulta_o_banco(self):
+        self.renovar(self.refresh)
+        with self.assertNumQueries(0):
+            with self.assertRaises(TokenError):
+                RefreshTokenRevogavel(self.refresh)
+
+        # revogado por outro processo: a primeira consulta vai ao banco e fica em memória
+        revogados.limpar()
+        with self.assertNumQueries(1):
+            with self.assertRaises(TokenError):
+                RefreshTokenRevogavel(self.refresh)
+        with self.assertNumQueries(0):
+            with self.assertRaises(TokenError):
+                RefreshTokenRevogavel(self.refresh)
+
+    def test_logout_revoga_o_refresh(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("token_blacklist"), {"refresh": self.refresh}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.renovar(self.refresh).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_poda_dos_expirados(self):
+        self.renovar(self.refresh)
+        OutstandingToken.objects.filter(jti=self.jti).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        call_command("podar_tokens_expirados", "--lote", "1", stdout=StringIO())
+
+        self.assertFalse(OutstandingToken.objects.filter(jti=self.jti).exists())
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertEqual(OutstandingToken.objects.count(), 1)  # o refresh novo, ainda válido
+
+
+@override_settings(LOGIN_TENTATIVAS_POR_EMAIL=(3, 300), LOGIN_TENTATIVAS_POR_IP=(5, 60))
+class LimiteTentativasLoginTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        em_memoria.limpar()
+        User.objects.create_user(email="usuario@teste.com", password="senhasegura123", name="Usuário Teste")
+        self.url = reverse("token_obtain_pair")
+
+    def tentar(self, email, password="SenhaErrada", ip="10.0.0.1"):
+        return self.client.post(self.url, {"email": email, "password": password}, format="json", REMOTE_ADDR=ip)
+
+    def test_barrado_antes_do_banco_e_do_hash(self):
+        for _ in range(3):
+            self.assertEqual(self.tentar("usuario@teste.com").status_code, status.HTTP_400_BAD_REQUEST)
+
+        with mock.patch.object(User, "check_password", autospec=True) as conferir:
+            with self.assertNumQueries(0):
+                # nem a senha certa passa, e o email não diferencia maiúsculas
+                response = self.tentar(" Usuario@Teste.com", "senhasegura123")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertFalse(conferir.called)
+        self.assertIn("Retry-After", response)
+
+        # outro email, de outro IP, segue normal
+        self.assertEqual(self.tentar("outro@teste.com", ip="10.0.0.2").status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_limite_por_ip_com_emails_diferentes(self):
+        for i in range(5):
+            self.assertEqual(self.tentar(f"naoexiste{i}@teste.com").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.tentar("usuario@teste.com", "senhasegura123").status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(
+            self.tentar("usuario@teste.com", "senhasegura123", ip="10.0.0.2").status_code, status.HTTP_200_OK
+        )
+
+    def test_x_forwarded_for_nao_troca_o_contador_do_ip(self):
+        for i in range(5):
+            response = self.client.post(
+                self.url, {"email": f"naoexiste{i}@teste.com", "password": "x"}, format="json",
+                REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR=f"203.0.113.{i}",
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            self.url, {"email": "naoexiste9@teste.com", "password": "x"}, format="json",
+            REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="203.0.113.99",
+        )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_conta_em_memoria_sem_o_cache(self):
+        with mock.patch("users.throttling.cache.incr", side_effect=ConnectionError):
+            respostas = [self.tentar("usuario@teste.com").status_code for _ in range(4)]
+        self.assertEqual(respostas[-1], status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertNotIn(status.HTTP_429_TOO_MANY_REQUESTS, respostas[:-1])
+
+
+class MeViewTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.dono = User.objects.create_user(email="loja@teste.com", password="123", name="Loja", usertype=2)
+        self.empresa = Empresa.objects.create(user=self.dono, descricao="Doces")
+        FotoEmpresa.objects.create(empresa=self.empresa, imagem="fotos_empresa/vitrine.jpg")
+        self.client.force_authenticate(user=User.objects.get(pk=self.dono.pk))
+        self.url = reverse("user-me")
+
+    def buscar(self, **headers):
+        return self.client.get(self.url, headers=headers)
+
+    def test_payload_em_cache_e_304_sem_serializar(self):
+        response = self.buscar()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["empresa"]["descricao"], "Doces")
+        self.assertEqual(len(response.data["empresa"]["fotos"]), 1)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        etag, modificado = response["ETag"], response["Last-Modified"]
+
+        with self.assertNumQueries(0):
+            repetida = self.buscar()
+        self.assertEqual(repetida.data, response.data)
+        self.assertEqual(repetida["ETag"], etag)
+
+        with mock.patch("users.views.CustomUserSerializer") as serializer, self.assertNumQueries(0):
+            response = self.buscar(if_none_match=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(serializer.called)
+        self.assertEqual(response["ETag"], etag)
+
+        response = self.buscar(if_modified_since=modificado)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.assertEqual(self.buscar(if_none_match='"outra"').status_code, status.HTTP_200_OK)
+
+    def test_invalidado_por_usuario_empresa_e_fotos(self):
+        etag = self.buscar()["ETag"]
+
+        def mudou():
+            nonlocal etag
+            # como numa requisição real, o usuário vem de novo do banco
+            self.client.force_authenticate(user=User.objects.get(pk=self.dono.pk))
+            response = self.buscar(if_none_match=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response["ETag"]
+            return response.data
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(pk=self.dono.pk)
+            user.name = "Loja Nova"
+            user.save()
+        self.assertEqual(mudou()["name"], "Loja Nova")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.empresa.descricao = "Bolos"
+            self.empresa.save()
+        self.assertEqual(mudou()["empresa"]["descricao"], "Bolos")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            FotoEmpresa.objects.create(empresa=self.empresa, imagem="fotos_empresa/balcao.jpg")
+        self.assertEqual(len(mudou()["empresa"]["fotos"]), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.empresa.fotos.first().delete()
+        self.assertEqual(len(mudou()["empresa"]["fotos"]), 1)
+
+        # o login só grava last_login, que o /me não mostra
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, User.objects.get(pk=self.dono.pk))
+        self.assertEqual(self.buscar(if_none_match=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class LoginAntigoSerializer(CustomTokenObtainPairSerializer):
+    """O login de antes: confere a senha e depois chama o validate() do simplejwt (authenticate de novo)."""
+
+    def validate(self, attrs):
+        user = User.objects.get(email=attrs["email"])
+        if not user.check_password(attrs["password"]):
+            raise AssertionError("senha errada no benchmark")
+        return super(CustomTokenObtainPairSerializer, self).validate(attrs)
+
+
+@skipUnless(os.getenv("RODAR_BENCHMARKS"), "benchmark: rode com RODAR_BENCHMARKS=1")
+class LoginBenchmark(APITestCase):
+    """Logins por segundo num núcleo (uma thread), com o hasher de senha configurado no projeto."""
+
+    LOGINS = 10
+
+    def setUp(self):
+        self.dados = {"email": "usuario@teste.com", "password": "senhasegura123"}
+        User.objects.create_user(name="Usuário Teste", **self.dados)
+
+    def logins_por_segundo(self, serializer_class):
+        inicio = time.perf_counter()
+        for _ in range(self.LOGINS):
+            serializer = serializer_class(data=self.dados)
+            serializer.is_valid(raise_exception=True)
+        return self.LOGINS / (time.perf_counter() - inicio)
+
+    def test_benchmark(self):
+        antigo = self.logins_por_segundo(LoginAntigoSerializer)
+        atual = self.logins_por_segundo(CustomTokenObtainPairSerializer)
+        print(f"\nlogin: antes {antigo:.1f} logins/s por núcleo, agora {atual:.1f} logins/s por núcleo")
+        self.assertGreater(atual, antigo * 1.5)
@@ -0,0 +1,101 @@
+"""
+Limite de tentativas de login por email e por IP.
+
+Cada tentativa soma num contador de janela deslizante (aproximada: a janela
+atual mais a anterior, com peso pelo quanto dela ainda cai dentro dos últimos
+`janela` segundos). Os contadores ficam no cache compartilhado, para valer
+entre processos; se o cache estiver fora do ar, cada processo conta na própria
+memória até ele voltar. Tudo roda antes do serializer do login, então a
+tentativa barrada não chega a buscar o usuário nem a calcular o hash da senha.
+"""
+import hashlib
+import time
+from threading import Lock
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+PREFIXO = "login"
+
+
+class ContadoresEmMemoria:
+    """Contadores com validade, no processo: o substituto do cache quando ele falha."""
+
+    def __init__(self):
+        self._contadores = {}
+        self._trava = Lock()
+
+    def somar(self, chave, validade):
+        agora = time.monotonic()
+        with self._trava:
+            valor, expira_em = self._contadores.get(chave, (0, agora + validade))
+            self._contadores[chave] = (valor + 1, expira_em)
+            self._remover_expirados(agora)
+            return valor + 1
+
+    def ler(self, chave):
+        with self._trava:
+            valor, expira_em = self._contadores.get(chave, (0, 0))
+            return valor if expira_em > time.monotonic() else 0
+
+    def _remover_expirados(self, agora):
+        for chave in [chave for chave, (_, expira_em) in self._contadores.items() if expira_em <= agora]:
+            del self._contadores[chave]
+
+    def limpar(self):
+        with self._trava:
+            self._contadores.clear()
+
+
+em_memoria = ContadoresEmMemoria()
+
+
+def registrar_tentativa(chave, janela):
+    """Soma a tentativa e devolve quantas houve nos últimos `janela` segundos (estimativa)."""
+    agora = time.time()
+    numero = int(agora // janela)
+    atual = f"{PREFIXO}:{chave}:{numero}"
+    anterior = f"{PREFIXO}:{chave}:{numero - 1}"
+    try:
+        # a chave da janela atual precisa durar até deixar de ser a "anterior"
+        cache.add(atual, 0, janela * 2)
+        tentativas = cache.incr(atual)
+        anteriores = cache.get(anterior, 0)
+    except Exception:
+        # cache fora do ar: o login não pode parar por isso
+        tentativas = em_memoria.somar(atual, janela * 2)
+        anteriores = em_memoria.ler(anterior)
+    decorrido = (agora % janela) / janela
+    return anteriores * (1 - decorrido) + tentativas
+
+
+def _resumo(texto):
+    # chave curta e sem caracteres problemáticos para o cache
+    return hashlib.sha256(texto.encode()).hexdigest()[:32]
+
+
+class TentativasLoginThrottle(BaseThrottle):
+    """
+    Barra o login quando o email (LOGIN_TENTATIVAS_POR_EMAIL) ou o IP
+    (LOGIN_TENTATIVAS_POR_IP) passou do limite de tentativas na janela.
+    Conta todas as tentativas, inclusive as barradas: quem insiste continua
+    bloqueado até parar.
+    """
+
+    def allow_request(self, request, view):
+        # REMOTE_ADDR e não get_ident(): sem NUM_PROXIES ele usaria o X-Forwarded-For
+        # que o próprio cliente manda, e trocar o header zeraria o contador
+        ip = request.META.get("REMOTE_ADDR") or ""
+        limites = [(f"ip:{_resumo(ip)}", *settings.LOGIN_TENTATIVAS_POR_IP)]
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        if isinstance(email, str) and email.strip():
+            limites.append((f"email:{_resumo(email.strip().lower())}", *settings.LOGIN_TENTATIVAS_POR_EMAIL))
+
+        self.espera = None
+        for chave, limite, janela in limites:
+            if registrar_tentativa(chave, janela) > limite:
+                self.espera = max(self.espera or 0, janela)
+        return self.espera is None
+
+    def wait(self):
+        return self.espera
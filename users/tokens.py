@@ -0,0 +1,108 @@
+from collections import OrderedDict
+from threading import Lock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+
+class JtisRevogados:
+    """
+    LRU limitado, em memória do processo, dos jti que já se sabe estarem na
+    blacklist. Só guarda positivos: token revogado não volta a valer, então o
+    acerto aqui dispensa o banco. A ausência não prova nada (outro processo
+    pode ter revogado), por isso o negativo sempre confere a tabela.
+    """
+
+    def __init__(self, tamanho):
+        self.tamanho = tamanho
+        self._jtis = OrderedDict()
+        self._trava = Lock()
+
+    def __contains__(self, jti):
+        with self._trava:
+            if jti not in self._jtis:
+                return False
+            self._jtis.move_to_end(jti)
+            return True
+
+    def adicionar(self, jti):
+        with self._trava:
+            self._jtis[jti] = None
+            self._jtis.move_to_end(jti)
+            while len(self._jtis) > self.tamanho:
+                self._jtis.popitem(last=False)
+
+    def limpar(self):
+        with self._trava:
+            self._jtis.clear()
+
+
+revogados = JtisRevogados(settings.JWT_REVOGADOS_EM_MEMORIA)
+
+
+def _tabela(modelo):
+    return connection.ops.quote_name(modelo._meta.db_table)
+
+
+# Registra o token como emitido; o usuário vem por subselect para não virar uma
+# query a mais (e fica NULL se já foi apagado, como no simplejwt).
+SQL_EMITIDO = f"""
+    INSERT INTO {_tabela(OutstandingToken)} (jti, token, user_id, created_at, expires_at)
+    VALUES (%s, %s, (SELECT id FROM {_tabela(get_user_model())} WHERE id = %s), %s, %s)
+"""
+
+
+class RefreshTokenRevogavel(RefreshToken):
+    """
+    RefreshToken da blacklist do simplejwt com menos idas ao banco por refresh:
+    a consulta passa antes pelo LRU de jtis revogados, e revogar/registrar o
+    token é um INSERT ... ON CONFLICT cada, sem buscar o usuário nem os
+    get_or_create (SELECT + INSERT em savepoint) do BlacklistMixin.
+    """
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if jti in revogados:
+            raise TokenError(_("Token is blacklisted"))
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            revogados.adicionar(jti)
+            raise TokenError(_("Token is blacklisted"))
+
+    def _parametros_emitido(self):
+        return [
+            self.payload[api_settings.JTI_CLAIM],
+            str(self),
+            self.payload.get(api_settings.USER_ID_CLAIM),
+            self.current_time,
+            datetime_from_epoch(self.payload["exp"]),
+        ]
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH emitido AS (
+                    {SQL_EMITIDO}
+                    ON CONFLICT (jti) DO UPDATE SET jti = EXCLUDED.jti
+                    RETURNING id
+                )
+                INSERT INTO {_tabela(BlacklistedToken)} (token_id, blacklisted_at)
+                SELECT id, %s FROM emitido
+                ON CONFLICT (token_id) DO NOTHING
+                """,
+                self._parametros_emitido() + [timezone.now()],
+            )
+        # só depois do commit: se a transação voltar, o token continua válido
+        transaction.on_commit(lambda: revogados.adicionar(jti))
+
+    def outstand(self):
+        with connection.cursor() as cursor:
+            cursor.execute(SQL_EMITIDO + " ON CONFLICT (jti) DO NOTHING", self._parametros_emitido())
@@ -1,21 +1,39 @@
 import random
 from rest_framework import viewsets, permissions, generics, status
 from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError
 from rest_framework.decorators import action
 from rest_framework.response import Response # Added this import
 from django.contrib.auth import get_user_model
 from .serializers import UserCreateSerializer, EmpresaSerializer, EmpresaMetaSerializer, EmpresaAvaliacaoSerializer, CustomUserSerializer, EmpresaStatsSerializer, EmpresaDashboardSerializer
 from .serializers_dashboard import DashboardStatsSerializer
-from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiResponse
-from django.db.models import Sum # Added this import
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiResponse, OpenApiParameter
 from datetime import timedelta # Added this import
 from .models import Empresa
-from produtos.models import Produto
+from .authentication import empresa_do_usuario
 from moeda.models import Carteira
 from django.utils import timezone
-from pedidos.models import ItemPedido, Pedido
-from django.db.models import Count, F
-from .serializers_dashboard import WeeklyDashboardStatsSerializer
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.db.models import Count, F, prefetch_related_objects
+from .serializers_dashboard import CoortesClientesSerializer, SerieVendasSerializer, WeeklyDashboardStatsSerializer
+from . import dashboard_cache, perfil_cache
+from .dashboard import (
+    GRANULARIDADES,
+    MAX_MESES_COORTES,
+    MAX_PONTOS_SERIE,
+    MESES_COORTES,
+    NOMES_DIAS,
+    ler_periodo,
+    semana_de,
+    vendas_por_dia,
+    vendas_do_dia,
+    vendas_da_semana_e_anterior,
+    produto_mais_vendido,
+    serie_de_vendas,
+    coortes_de_clientes,
+)
 
 
 DRA_CLARA_PHRASES = [
@@ -58,26 +76,21 @@ class EmpresaViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], serializer_class=EmpresaStatsSerializer)
     def stats(self, request):
-        empresa = self.get_queryset().first()
+        # os totais são contadores da empresa e a carteira vem junto com ela
+        empresa = empresa_do_usuario(request.user)
         if not empresa:
             return Response({"error": "Empresa não encontrada."}, status=404)
 
-        total_produtos = Produto.objects.filter(empresa=empresa).count()
-        total_pedidos = Pedido.objects.filter(empresa=empresa).count()
-        
         try:
-            carteira = empresa.carteira
-            moedas = carteira.saldo_moeda
+            moedas = empresa.carteira.saldo_moeda
         except Carteira.DoesNotExist:
             moedas = 0
 
-        data = {
-            'total_produtos': total_produtos,
-            'total_pedidos': total_pedidos,
+        serializer = self.get_serializer({
+            'total_produtos': empresa.total_produtos,
+            'total_pedidos': empresa.total_pedidos,
             'moedas': moedas,
-        }
-        
-        serializer = self.get_serializer(data)
+        })
         return Response(serializer.data)
 
     @extend_schema(
@@ -87,7 +100,7 @@ class EmpresaViewSet(viewsets.ModelViewSet):
     )
     @action(detail=False, methods=['get', 'post'], url_path='meta')
     def meta(self, request):
-        empresa = self.get_queryset().first()
+        empresa = empresa_do_usuario(request.user)
         if not empresa:
             return Response({"error": "Empresa não encontrada."}, status=404)
 
@@ -108,7 +121,7 @@ class EmpresaViewSet(viewsets.ModelViewSet):
     )
     @action(detail=False, methods=['get'], url_path='avaliacao')
     def avaliacao(self, request):
-        empresa = self.get_queryset().first()
+        empresa = empresa_do_usuario(request.user)
         if not empresa:
             return Response({"error": "Empresa não encontrada."}, status=404)
 
@@ -121,21 +134,15 @@ class EmpresaViewSet(viewsets.ModelViewSet):
     )
     @action(detail=False, methods=['get'], url_path='dashboard')
     def dashboard(self, request):
-        empresa = self.get_queryset().first()
+        empresa = empresa_do_usuario(request.user)
         if not empresa:
             return Response({"error": "Empresa não encontrada."}, status=404)
 
-        today = timezone.now().date()
-        vendas_hoje = Pedido.objects.filter(
-            empresa=empresa,
-            created_at__date=today,
-            status__in=['pago', 'concluido']
-        ).aggregate(total=Sum('valor_total'))['total'] or 0
-
-        data = {
+        hoje = timezone.localdate()
+        data = dashboard_cache.em_cache(empresa.pk, 'dashboard', hoje, lambda: {
             'meta': empresa.meta,
-            'vendas_hoje': vendas_hoje
-        }
+            'vendas_hoje': vendas_do_dia(empresa, hoje),
+        })
 
         serializer = EmpresaDashboardSerializer(data)
         return Response(serializer.data)
@@ -146,198 +153,221 @@ class EmpresaViewSet(viewsets.ModelViewSet):
     )
     @action(detail=False, methods=['get'], url_path='dashboard-stats')
     def dashboard_stats(self, request):
-        empresa = self.get_queryset().first()
+        empresa = empresa_do_usuario(request.user)
         if not empresa:
             return Response({"error": "Empresa não encontrada."}, status=404)
 
-        # Date calculations
-        today = timezone.now().date()
-        # Assuming week starts on Monday (isoweekday 1)
-        start_of_current_week = today - timedelta(days=today.weekday())
-        end_of_current_week = start_of_current_week + timedelta(days=6)
-        start_of_previous_week = start_of_current_week - timedelta(weeks=1)
-        end_of_previous_week = end_of_current_week - timedelta(weeks=1)
-
-        # 1. Vendas da Semana
-        current_week_sales_queryset = Pedido.objects.filter(
-            empresa=empresa,
-            created_at__date__range=[start_of_current_week, end_of_current_week],
-            status__in=['pago', 'concluido']
-        )
-        total_sales_current_week = current_week_sales_queryset.aggregate(
-            total=Sum('valor_total')
-        )['total'] or 0
-
-        previous_week_sales_queryset = Pedido.objects.filter(
-            empresa=empresa,
-            created_at__date__range=[start_of_previous_week, end_of_previous_week],
-            status__in=['pago', 'concluido']
-        )
-        total_sales_previous_week = previous_week_sales_queryset.aggregate(
-            total=Sum('valor_total')
-        )['total'] or 0
-
-        percentual_variacao = 0
-        if total_sales_previous_week > 0:
-            percentual_variacao = ((total_sales_current_week - total_sales_previous_week) / total_sales_previous_week) * 100
-        elif total_sales_current_week > 0:
-            percentual_variacao = 100
-
-        vendas_semana_data = {
-            "total_vendas": total_sales_current_week,
-            "percentual_variacao": round(percentual_variacao, 2),
-        }
+        # Semana começando na segunda
+        start_of_current_week, end_of_current_week = semana_de(timezone.localdate())
+
+        def calcular():
+            # 1. Vendas da Semana (semana atual e anterior numa query só)
+            total_sales_current_week, total_sales_previous_week = vendas_da_semana_e_anterior(
+                empresa, start_of_current_week
+            )
 
-        # 2. Produto Mais Vendido
-        # Get total quantity sold per product in the current week
-        products_sold_current_week = ItemPedido.objects.filter(
-            pedido__empresa=empresa,
-            pedido__created_at__date__range=[start_of_current_week, end_of_current_week],
-            pedido__status__in=['pago', 'concluido']
-        ).values('produto__nome').annotate(
-            total_quantidade_vendida=Sum('quantidade')
-        ).order_by('-total_quantidade_vendida')
-
-        produto_mais_vendido_data = {"nome": "Nenhum", "porcentagem_total": 0}
-        
-        if products_sold_current_week.exists():
-            most_sold_product = products_sold_current_week.first()
-            total_all_products_quantity = ItemPedido.objects.filter(
-                pedido__empresa=empresa,
-                pedido__created_at__date__range=[start_of_current_week, end_of_current_week],
-                pedido__status__in=['pago', 'concluido']
-            ).aggregate(total_q=Sum('quantidade'))['total_q'] or 0
-
-            if total_all_products_quantity > 0:
-                porcentagem = (most_sold_product['total_quantidade_vendida'] / total_all_products_quantity) * 100
+            percentual_variacao = 0
+            if total_sales_previous_week > 0:
+                percentual_variacao = ((total_sales_current_week - total_sales_previous_week) / total_sales_previous_week) * 100
+            elif total_sales_current_week > 0:
+                percentual_variacao = 100
+
+            vendas_semana_data = {
+                "total_vendas": total_sales_current_week,
+                "percentual_variacao": round(percentual_variacao, 2),
+            }
+
+            # 2. Produto Mais Vendido
+            produto_mais_vendido_data = {"nome": "Nenhum", "porcentagem_total": 0}
+            mais_vendido = produto_mais_vendido(empresa, start_of_current_week, end_of_current_week)
+            if mais_vendido:
                 produto_mais_vendido_data = {
-                    "nome": most_sold_product['produto__nome'],
-                    "porcentagem_total": round(porcentagem, 2),
+                    "nome": mais_vendido["nome"],
+                    "porcentagem_total": mais_vendido["porcentagem_total"],
                 }
 
-        # 3. Média Diária da Semana
-        # Sum of valor_total for the current week (already calculated as total_sales_current_week)
-        # Number of days in the current week for which there were sales
-        distinct_sale_days = Pedido.objects.filter(
-            empresa=empresa,
-            created_at__date__range=[start_of_current_week, end_of_current_week],
-            status__in=['pago', 'concluido']
-        ).dates('created_at', 'day').count()
-        
-        # Consider all 7 days of the week for the average, even if no sales on some days
-        days_in_week = 7 
-        
-        media_diaria = 0
-        if days_in_week > 0:
+            # 3. Média Diária da Semana
+            # Considera os 7 dias da semana, mesmo os sem vendas
+            days_in_week = 7
             media_diaria = total_sales_current_week / days_in_week
 
-        media_diaria_semana_data = {
-            "valor_medio_diario": round(media_diaria, 2),
-            "periodo_referencia": f"{start_of_current_week.strftime('%d/%m')} - {end_of_current_week.strftime('%d/%m')}",
-        }
+            media_diaria_semana_data = {
+                "valor_medio_diario": round(media_diaria, 2),
+                "periodo_referencia": f"{start_of_current_week.strftime('%d/%m')} - {end_of_current_week.strftime('%d/%m')}",
+            }
 
-        dashboard_data = {
-            "vendas_semana": vendas_semana_data,
-            "produto_mais_vendido": produto_mais_vendido_data,
-            "media_diaria_semana": media_diaria_semana_data,
-        }
+            return {
+                "vendas_semana": vendas_semana_data,
+                "produto_mais_vendido": produto_mais_vendido_data,
+                "media_diaria_semana": media_diaria_semana_data,
+            }
+
+        dashboard_data = dashboard_cache.em_cache(empresa.pk, 'dashboard-stats', start_of_current_week, calcular)
 
         serializer = DashboardStatsSerializer(dashboard_data)
         return Response(serializer.data)
 
     @extend_schema(
         summary="Obter resumo semanal do dashboard da empresa",
+        parameters=[
+            OpenApiParameter('inicio', OpenApiTypes.DATE, description="Início de um período personalizado (inclusive)."),
+            OpenApiParameter('fim', OpenApiTypes.DATE, description="Fim de um período personalizado (inclusive)."),
+        ],
+        description=(
+            "Sem inicio/fim o período é a semana atual, de segunda a domingo. "
+            "meta_semanal é a meta diária vezes o número de dias do período."
+        ),
         responses={200: WeeklyDashboardStatsSerializer}
     )
     @action(detail=False, methods=['get'], url_path='weekly-dashboard-summary')
     def weekly_dashboard_summary(self, request):
-        empresa = self.get_queryset().first()
+        empresa = empresa_do_usuario(request.user)
         if not empresa:
             return Response({"error": "Empresa não encontrada."}, status=404)
 
-        # Date calculations
-        today = timezone.now().date()
-        start_of_current_week = today - timedelta(days=today.weekday())
-        end_of_current_week = start_of_current_week + timedelta(days=6)
+        inicio, fim = ler_periodo(request.query_params, semana_de(timezone.localdate()))
+
+        def calcular():
+            # 1. Vendas de cada dia do período (uma query agrupada; o total sai da soma)
+            vendas_diarias = vendas_por_dia(empresa, inicio, fim)
+            total_sales = sum(total for _, total in vendas_diarias)
+
+            # 2. Best-Selling Product of the period
+            produto_mais_vendido_data = {"nome": "Nenhum", "porcentagem_total": 0}
+            mais_vendido = produto_mais_vendido(empresa, inicio, fim)
+            if mais_vendido:
+                produto_mais_vendido_data = {"nome": mais_vendido["nome"]}
+
+            # 3. Meta do período: a diária vezes os dias (7 na semana padrão)
+            weekly_sales_target = empresa.meta * ((fim - inicio).days + 1)
+
+            # 4. Vendas por dia da semana (somadas por dia da semana em períodos maiores que uma semana)
+            sales_by_day = {}
+            for dia, total in vendas_diarias:
+                nome = NOMES_DIAS[dia.weekday()]
+                sales_by_day[nome] = sales_by_day.get(nome, 0) + total
+
+            return {
+                "periodo_inicio": inicio,
+                "periodo_fim": fim,
+                "total_venda_semana": total_sales,
+                "produto_mais_vendido_semana": produto_mais_vendido_data,
+                "meta_diaria": empresa.meta,
+                "meta_semanal": weekly_sales_target,
+                "vendas_por_dia_semana": sales_by_day,
+                "vendas_por_dia": [{"data": dia, "total": total} for dia, total in vendas_diarias],
+            }
+
+        # Os números vêm do cache; as frases são sorteadas a cada requisição
+        response_data = {
+            **dashboard_cache.em_cache(empresa.pk, 'weekly-dashboard-summary', f'{inicio}:{fim}', calcular),
+            # 5. Random "Dra. Clara" Phrases
+            "frases_dra_clara": random.sample(DRA_CLARA_PHRASES, min(3, len(DRA_CLARA_PHRASES))),
+            # 6. Random "Intelligent Alert" Phrases
+            "alertas_inteligentes": random.sample(ALERT_PHRASES, min(2, len(ALERT_PHRASES))),
+        }
 
-        # 1. Weekly Sales Total
-        current_week_sales_queryset = Pedido.objects.filter(
-            empresa=empresa,
-            created_at__date__range=[start_of_current_week, end_of_current_week],
-            status__in=['pago', 'concluido']
+        serializer = WeeklyDashboardStatsSerializer(response_data)
+        return Response(serializer.data)
+    
+    @extend_schema(
+        summary="Série temporal de vendas da empresa",
+        parameters=[
+            OpenApiParameter('granularidade', OpenApiTypes.STR, enum=list(GRANULARIDADES), description="Padrão: dia."),
+            OpenApiParameter('inicio', OpenApiTypes.DATE, description="Início do período (inclusive)."),
+            OpenApiParameter('fim', OpenApiTypes.DATE, description="Fim do período (inclusive)."),
+        ],
+        description=(
+            "Receita, pedidos e unidades vendidas por ponto da série. Sem inicio/fim, o período "
+            f"termina hoje (hora: 1 dia, dia: 30, semana: 12 semanas, mes: 1 ano). No máximo {MAX_PONTOS_SERIE} pontos."
+        ),
+        responses={200: SerieVendasSerializer}
+    )
+    @action(detail=False, methods=['get'], url_path='sales-series')
+    def sales_series(self, request):
+        empresa = empresa_do_usuario(request.user)
+        if not empresa:
+            return Response({"error": "Empresa não encontrada."}, status=404)
+
+        granularidade = request.query_params.get('granularidade', 'dia')
+        if granularidade not in GRANULARIDADES:
+            raise ValidationError({"granularidade": f"Use uma de: {', '.join(GRANULARIDADES)}."})
+        hoje = timezone.localdate()
+        padrao = (hoje - timedelta(days=GRANULARIDADES[granularidade] - 1), hoje)
+        inicio, fim = ler_periodo(request.query_params, padrao, max_dias=None)
+
+        data = dashboard_cache.em_cache(
+            empresa.pk, 'sales-series', f'{granularidade}:{inicio}:{fim}',
+            lambda: {
+                "granularidade": granularidade,
+                "periodo_inicio": inicio,
+                "periodo_fim": fim,
+                "pontos": [
+                    {**ponto, "inicio": ponto["inicio"].isoformat()}
+                    for ponto in serie_de_vendas(empresa, inicio, fim, granularidade)
+                ],
+            },
         )
-        total_sales_current_week = current_week_sales_queryset.aggregate(
-            total=Sum('valor_total')
-        )['total'] or 0
-
-        # 2. Best-Selling Product of the Week
-        products_sold_current_week = ItemPedido.objects.filter(
-            pedido__empresa=empresa,
-            pedido__created_at__date__range=[start_of_current_week, end_of_current_week],
-            pedido__status__in=['pago', 'concluido']
-        ).values('produto__nome').annotate(
-            total_quantidade_vendida=Sum('quantidade')
-        ).order_by('-total_quantidade_vendida')
-
-        produto_mais_vendido_data = {"nome": "Nenhum", "porcentagem_total": 0}
-
-        if products_sold_current_week.exists():
-            most_sold_product = products_sold_current_week.first()
-            total_all_products_quantity = ItemPedido.objects.filter(
-                pedido__empresa=empresa,
-                pedido__created_at__date__range=[start_of_current_week, end_of_current_week],
-                pedido__status__in=['pago', 'concluido']
-            ).aggregate(total_q=Sum('quantidade'))['total_q'] or 0
-
-            if total_all_products_quantity > 0:
-                produto_mais_vendido_data = {
-                    "nome": most_sold_product['produto__nome'],
-        
-                }
 
-        # 3. Weekly Sales Target
-        weekly_sales_target = empresa.meta * 7
+        serializer = SerieVendasSerializer(data)
+        return Response(serializer.data)
 
-        # 4. Random "Dra. Clara" Phrases
-        random_dra_clara_phrases = random.sample(DRA_CLARA_PHRASES, min(3, len(DRA_CLARA_PHRASES)))
+    @extend_schema(
+        summary="Clientes recorrentes e retenção por coorte",
+        parameters=[
+            OpenApiParameter(
+                'meses', OpenApiTypes.INT,
+                description=f"Coortes dos últimos N meses (padrão {MESES_COORTES}, máximo {MAX_MESES_COORTES}).",
+            ),
+        ],
+        description="Lê o último cálculo do comando calcular_clientes_empresas (calculado_em).",
+        responses={200: CoortesClientesSerializer}
+    )
+    @action(detail=False, methods=['get'], url_path='customer-cohorts')
+    def customer_cohorts(self, request):
+        empresa = empresa_do_usuario(request.user)
+        if not empresa:
+            return Response({"error": "Empresa não encontrada."}, status=404)
 
-        # 5. Random "Intelligent Alert" Phrases
-        random_alert_phrases = random.sample(ALERT_PHRASES, min(2, len(ALERT_PHRASES)))
+        try:
+            meses = int(request.query_params.get('meses', MESES_COORTES))
+        except ValueError:
+            meses = 0
+        if not 1 <= meses <= MAX_MESES_COORTES:
+            raise ValidationError({"meses": f"Informe um inteiro de 1 a {MAX_MESES_COORTES}."})
 
-        # 6. Daily Sales Value (Monday to Friday)
-        sales_by_day = {}
-        day_names = {
-            1: 'segunda', 2: 'terca', 3: 'quarta', 4: 'quinta', 5: 'sexta'
-        }
-        for i in range(1, 6): # Monday to Friday
-            day = start_of_current_week + timedelta(days=i - 1)
-            daily_sales_total = Pedido.objects.filter(
-                empresa=empresa,
-                created_at__date=day,
-                status__in=['pago', 'concluido']
-            ).aggregate(total=Sum('valor_total'))['total'] or 0
-            sales_by_day[day_names[i]] = daily_sales_total
-
-        # Prepare the response data
-        response_data = {
-            "total_venda_semana": total_sales_current_week,
-            "produto_mais_vendido_semana": produto_mais_vendido_data,
-            "meta_diaria": empresa.meta, # Added this line
-            "meta_semanal": weekly_sales_target,
-            "frases_dra_clara": random_dra_clara_phrases,
-            "alertas_inteligentes": random_alert_phrases,
-            "vendas_por_dia_semana": sales_by_day,
-        }
-        
-        serializer = WeeklyDashboardStatsSerializer(response_data)
+        serializer = CoortesClientesSerializer(coortes_de_clientes(empresa, meses))
         return Response(serializer.data)
-    
+
 class MeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @extend_schema(responses=CustomUserSerializer)
     def get(self, request):
-        serializer = CustomUserSerializer(request.user)
-        return Response(serializer.data)
+        """
+        Perfil do usuário logado, em cache por versão (ver users.perfil_cache).
+        Com If-None-Match/If-Modified-Since da versão atual responde 304 sem
+        serializar nada.
+        """
+        user = request.user
+        token, criada_em = perfil_cache.versao(user.pk)
+        etag = f'"{token}"'
+        condicional = get_conditional_response(request, etag=etag, last_modified=criada_em)
+        if condicional is None:
+            def serializar():
+                # empresa já vem da autenticação; as fotos numa query só
+                prefetch_related_objects([user], "empresa__fotos")
+                return CustomUserSerializer(user).data
+
+            response = Response(perfil_cache.em_cache(user.pk, token, serializar))
+        else:
+            # 304 (ou 412 num If-Match que não bate)
+            response = Response(status=condicional.status_code)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(criada_em)
+        # o perfil é de um usuário só, e o cliente revalida a cada uso
+        response["Cache-Control"] = "private, no-cache"
+        return response
 
 class MotivacionalView(APIView):
     @extend_schema(        summary="Obter frases motivacionais aleatórias",
@@ -372,8 +402,15 @@ class MotivacionalView(APIView):
 
 # app/auth/views.py
 from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework.exceptions import Throttled
 from .serializers_jwt import CustomTokenObtainPairSerializer
+from .throttling import TentativasLoginThrottle
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    # checado no initial(), antes do serializer: sem query nem hash de senha
+    throttle_classes = [TentativasLoginThrottle]
+
+    def throttled(self, request, wait):
+        raise Throttled(wait, detail="Muitas tentativas de login. Tente novamente mais tarde.")
 